@@ -0,0 +1,191 @@
+# analytics.py (Item analysis over recorded answers)
+"""
+Classical test theory statistics for a quiz, computed with numpy over the
+answer matrix (one row per attempt, one column per question).
+
+Attempts need not have been given the same questions: a quiz drawing samples
+from a bank, or one that gained questions after some attempts were made,
+leaves ABSENT cells. Each question's statistics cover the attempts that were
+given it, against scores expressed as a share of the points each attempt
+could earn, so attempts with different question sets stay comparable.
+
+The answers come back from Postgres as one packed binary column per question
+(8 bytes per answer: attempt id, graded correctness and a hash of the chosen
+answer), so a quiz with millions of answer rows is a handful of bytea values
+that numpy decodes without a Python loop over rows. The answer hashes are
+matched against the hashes of each question's options to recover which
+option was picked.
+"""
+import json
+
+import numpy as np
+
+# Matrix cell codes: ord('A') + i / ord('a') + i is option i answered
+# correctly / incorrectly; BLANK and OTHER stand for no answer and an answer
+# outside the option list. ABSENT marks a question the attempt was not given.
+MAX_OPTIONS = 24
+BLANK = 24
+OTHER = 25
+ABSENT = 0
+
+# Share of attempts in the upper and lower groups used for discrimination
+GROUP_SHARE = 0.27
+
+ANSWER_COLUMNS_SQL = """
+    SELECT ua.question_id,
+           string_agg(int8send((ua.attempt_id::int8 << 33)
+                               | (COALESCE(ua.is_correct, false)::int::int8 << 32)
+                               | (hashtext(COALESCE(ua.selected_answer, '')) & 4294967295)), ''::bytea)
+    FROM user_answers ua
+    WHERE ua.question_id = ANY(%s::int[])
+    GROUP BY ua.question_id
+"""
+ANSWER_HASHES_SQL = """
+    SELECT hashtext(answer) & 4294967295 FROM unnest(%s::text[]) WITH ORDINALITY AS a(answer, n) ORDER BY n
+"""
+
+
+def question_options(question):
+    options = question.get('options') or []
+    if isinstance(options, str):
+        try:
+            options = json.loads(options)
+        except ValueError:
+            options = []
+    if not options and question.get('question_type') == 'true_false':
+        options = ['True', 'False']
+    return [str(o) for o in options][:MAX_OPTIONS]
+
+
+def load_answer_matrix(cur, questions):
+    """uint8 matrix of cell codes, one row per attempt that answered any of
+    ``questions``; questions an attempt was not given are ABSENT"""
+    k = len(questions)
+    labels = [question_options(q) for q in questions]
+    cur.execute(ANSWER_HASHES_SQL, ([o for options in labels for o in options] + [''],))
+    hashes = [row[0] for row in cur.fetchall()]
+    blank_hash = hashes.pop()
+
+    cur.execute(ANSWER_COLUMNS_SQL, ([q['id'] for q in questions],))
+    columns = {row[0]: np.frombuffer(row[1], dtype='>i8').astype(np.int64) for row in cur.fetchall()}
+    if not columns:
+        return np.zeros((0, k), dtype=np.uint8)
+
+    attempt_ids = np.unique(np.concatenate([v >> 33 for v in columns.values()]))
+    codes = np.full((len(attempt_ids), k), ABSENT, dtype=np.uint8)
+    offset = 0
+    for j, question in enumerate(questions):
+        option_hashes = hashes[offset:offset + len(labels[j])]
+        offset += len(labels[j])
+        packed = columns.get(question['id'])
+        if packed is None:
+            continue
+        answer_hash = packed & 0xFFFFFFFF
+        choice = np.full(len(packed), OTHER, dtype=np.uint8)
+        choice[answer_hash == blank_hash] = BLANK
+        # Reversed so the first of two identical options wins
+        for i in reversed(range(len(option_hashes))):
+            choice[answer_hash == option_hashes[i]] = i
+        base = np.where((packed >> 32) & 1, ord('A'), ord('a')).astype(np.uint8)
+        codes[np.searchsorted(attempt_ids, packed >> 33), j] = base + choice
+    return codes
+
+
+def _ratio(numerator, denominator):
+    return float(numerator / denominator) if denominator else None
+
+
+def _correlation(x, y):
+    """Pearson correlation of two float arrays, None when either is constant"""
+    x = x - x.mean()
+    y = y - y.mean()
+    denominator = float(np.sqrt((x @ x) * (y @ y)))
+    return float(x @ y) / denominator if denominator > 1e-12 else None
+
+
+def item_statistics(codes, questions):
+    """Per-question and whole-quiz statistics for an answer matrix"""
+    attempts, k = codes.shape
+    present = codes != ABSENT
+    correct = present & (codes < ord('a'))
+    points = np.array([q['points'] or 0 for q in questions], dtype=np.float64)
+
+    # Column by column: a matrix product would first copy the answers to float64
+    total = np.zeros(attempts)
+    possible = np.zeros(attempts)
+    for j in range(k):
+        total[correct[:, j]] += points[j]
+        possible[present[:, j]] += points[j]
+    score = np.divide(total, possible, out=np.zeros(attempts), where=possible > 0)
+    order = np.argsort(score, kind='stable')
+
+    results = []
+    for j, question in enumerate(questions):
+        given = present[:, j]
+        n = int(given.sum())
+        x = correct[given, j].astype(np.float64)
+        w = points[j]
+        p = float(x.mean()) if n else None
+
+        # Point-biserial against the rest score (the attempt's share of its
+        # other questions' points), so the item is not correlated with itself
+        # (attempts given no other question have no rest score)
+        point_biserial = None
+        rest_possible = possible[given] - w
+        rest = rest_possible > 0
+        if rest.sum() > 1:
+            point_biserial = _correlation(x[rest], (total[given][rest] - w * x[rest]) / rest_possible[rest])
+
+        # Upper and lower groups among the attempts that were given the item
+        discrimination = None
+        group = int(np.ceil(n * GROUP_SHARE))
+        if group:
+            ranked = correct[order[given[order]], j]
+            discrimination = float(ranked[n - group:].mean() - ranked[:group].mean())
+
+        choices = codes[given, j]
+        options = np.where(choices < ord('a'), choices - ord('A'), choices - ord('a'))
+        counts = np.bincount(options, minlength=OTHER + 1)
+        labels = question_options(question)
+        results.append({
+            'question_id': question['id'],
+            'position': j + 1,
+            'points': question['points'],
+            'attempts': n,
+            'difficulty': p,
+            'discrimination': discrimination,
+            'point_biserial': point_biserial,
+            'options': [{'option': label, 'count': int(counts[i]), 'share': _ratio(counts[i], n),
+                         'correct': label == question['correct_answer']}
+                        for i, label in enumerate(labels)],
+            'blank': int(counts[BLANK]),
+            'other': int(counts[OTHER]),
+        })
+
+    # Cronbach's alpha on points-weighted item scores. It assumes every
+    # attempt took the same items, so it only covers the attempts that were
+    # given every question: none on a sampled quiz, and only the later ones on
+    # a quiz that gained questions
+    complete = present.all(axis=1)
+    alpha_attempts = int(complete.sum())
+    alpha = None
+    total_var = float(total[complete].var()) if alpha_attempts else 0.0
+    if alpha_attempts > 1 and k > 1 and total_var > 0:
+        p = correct[complete].mean(axis=0)
+        item_vars = p * (1 - p) * points * points
+        alpha = float(k / (k - 1) * (1 - item_vars.sum() / total_var))
+
+    return {
+        'attempts': attempts,
+        'mean_score': float(score.mean() * 100) if attempts else None,
+        'cronbach_alpha': alpha,
+        'alpha_attempts': alpha_attempts,
+        'questions': results,
+    }
+
+
+def analyze_quiz(cur, quiz, questions):
+    if not questions:
+        return {'quiz_id': quiz['id'], **item_statistics(np.zeros((0, 0), dtype=np.uint8), [])}
+    codes = load_answer_matrix(cur, questions)
+    return {'quiz_id': quiz['id'], **item_statistics(codes, questions)}
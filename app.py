@@ -1,172 +1,587 @@
 # app.py (Main Flask Application)
-from flask import Flask, request, jsonify, session, render_template, redirect, url_for, flash
+from flask import Flask, request, jsonify, session, render_template, redirect, url_for, flash, Response, g, make_response, has_request_context, send_from_directory, current_app
 from flask_cors import CORS
+import click
 import psycopg2
 import psycopg2.extras
 from datetime import datetime
 import os
 import json
-from dotenv import load_dotenv
-from flask import Flask
-from flask_bcrypt import Bcrypt
+import time
+import hashlib
+import functools
+from werkzeug.local import LocalProxy
+# First: loads .env before the modules below read their settings
+from config import load_config
+from db import get_pool, PoolTimeout, replicas_from_config
+from grading import grade_submission, clean_answers
+from quiz_cache import QuizCache
+from pagination import fetch_page, page_from_rows, serialize_rows
+from streaming import copy_chunks, csv_chunks, cursor_rows, gzip_chunks
+from passwords import HasherBusy
+import passwords
+import instrumentation
+import quiz_transfer
+import mutations
+import leaderboard
+import sampling
+import search
+import student_stats
+import assets
+import partitions
 
-app = Flask(__name__)
-bcrypt = Bcrypt(app)
-bcrypt.init_app(app)
-load_dotenv()
+# Routes and request hooks are declared on this registry and attached to each
+# app by create_app. It works like a Blueprint, except that endpoints keep
+# their bare names (url_for('login')), which the templates share with the
+# async serving mode (asgi.py).
+class Routes:
+    def __init__(self):
+        self._setup = []
 
-app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key')
-app.config['SESSION_TYPE'] = 'filesystem'
-CORS(app)
+    def _defer(self, register):
+        def decorator(f):
+            self._setup.append(lambda app: register(app, f))
+            return f
+        return decorator
+
+    def route(self, rule, **options):
+        return self._defer(lambda app, f: app.add_url_rule(rule, view_func=f, **options))
+
+    def before_request(self, f):
+        return self._defer(lambda app, f: app.before_request(f))(f)
+
+    def after_request(self, f):
+        return self._defer(lambda app, f: app.after_request(f))(f)
+
+    def teardown_request(self, f):
+        return self._defer(lambda app, f: app.teardown_request(f))(f)
+
+    def errorhandler(self, exception):
+        return self._defer(lambda app, f: app.register_error_handler(exception, f))
+
+    def init_app(self, app):
+        for setup in self._setup:
+            setup(app)
+
+routes = Routes()
+
+# Application factory. ``config`` is a config object from config.py or its
+# name (default: $APP_CONFIG). Building an app touches neither the database
+# nor any thread or process: connection pools and the password hasher are
+# created per process on first use, so the app can be built once in a
+# gunicorn --preload master and shared by the forked workers.
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.from_object(load_config(config) if config is None or isinstance(config, str) else config)
+    CORS(app)
+    routes.init_app(app)
+
+    # Static files: url_for resolves build output (assets.py), which is served
+    # pre-compressed when the client accepts it and cached as immutable
+    app.url_defaults(assets.resolve_static)
+    app.jinja_env.globals['has_asset'] = assets.has_asset
+    app.view_functions['static'] = send_static
+
+    app.cli.add_command(init_db_command)
+
+    if app.config.get('PRECOMPILE_TEMPLATES'):
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+    return app
+
+# Per-app objects, built from the app's config on first use (so settings
+# changed on app.config after create_app still apply) and kept in
+# app.extensions. Building one opens no connection, like the pools.
+APP_OBJECTS = {
+    # Quiz definitions (quiz row + questions) cached per worker process
+    'quiz_cache': lambda config: QuizCache(max_entries=config['QUIZ_CACHE_SIZE']),
+    # Question pools of sampled quizzes (sampling.py), per worker process
+    'question_pools': lambda config: QuizCache(max_entries=config['QUIZ_CACHE_SIZE']),
+    # Item analysis results cached per worker, reused until the quiz changes
+    # or a new attempt arrives
+    'item_analysis_cache': lambda config: QuizCache(max_entries=config['ITEM_ANALYSIS_CACHE_SIZE']),
+    # Read replicas for @read_only routes (none configured: all reads go to
+    # the primary)
+    'replicas': replicas_from_config,
+}
+
+def app_object(name, app=None):
+    # ``app`` defaults to current_app; asgi.py passes its fallback app
+    app = app or current_app._get_current_object()
+    obj = app.extensions.get(name)
+    if obj is None:
+        obj = app.extensions.setdefault(name, APP_OBJECTS[name](app.config))
+    return obj
+
+quiz_cache = LocalProxy(lambda: app_object('quiz_cache'))
+question_pools = LocalProxy(lambda: app_object('question_pools'))
+item_analysis_cache = LocalProxy(lambda: app_object('item_analysis_cache'))
+replicas = LocalProxy(lambda: app_object('replicas'))
+
+# This process's password hasher for the app's BCRYPT_ROUNDS and
+# PASSWORD_HASH_* settings
+def get_hasher():
+    return passwords.get_hasher(current_app.config)
 
 # Database connection
-def get_db_connection():
-    conn = psycopg2.connect(
-        host=os.getenv('DB_HOST', 'localhost'),
-        database=os.getenv('DB_NAME', 'quiz_db'),
-        user=os.getenv('DB_USER', 'postgres'),
-        password=os.getenv('DB_PASSWORD', 'password'),
-        port=os.getenv('DB_PORT', '5432')
-    )
-    return conn
+def get_db_connection(read_only=None):
+    # Borrow a pooled connection: `with get_db_connection() as conn:`
+    # The connection goes back to the pool when the block exits, including
+    # early returns and exceptions; any uncommitted transaction is rolled back.
+    # The wait for it and every statement run on it are charged to the request.
+    # read_only=True borrows from a replica when one is usable; by default
+    # that is up to the route (see read_only below).
+    if read_only is None:
+        read_only = replica_reads()
+    if read_only and replicas:
+        return instrumentation.timed_checkout(replicas)
+    return instrumentation.timed_checkout(get_pool())
+
+# ``seconds`` is the app's REPLICA_STICKY_SECONDS (asgi.py shares this)
+def pin_reads_to_primary(sess, seconds):
+    sess['primary_until'] = time.time() + seconds
+
+def reads_pinned(sess):
+    return sess.get('primary_until', 0) > time.time()
+
+def replica_reads():
+    return has_request_context() and g.get('replica_reads', False)
+
+# Connection factory for a streamed response body, which is read after the
+# view has returned and outside the request context, so the replica router
+# is looked up now
+def streaming_connection():
+    if replica_reads() and replicas:
+        return functools.partial(instrumentation.timed_checkout, replicas._get_current_object())
+    return functools.partial(get_db_connection, read_only=False)
+
+# Route decorator: the view only reads, so its GET/HEAD requests may be served
+# by a replica, unless the user has just written something
+def read_only(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_reads = request.method in ('GET', 'HEAD') and not reads_pinned(session)
+        return view(*args, **kwargs)
+    return wrapper
+
+@routes.before_request
+def start_request_stats():
+    g.request_started = time.perf_counter()
+    instrumentation.begin_request(request.endpoint or 'unmatched')
+
+@routes.after_request
+def pin_after_write(response):
+    if replicas and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400 and 'user_id' in session:
+        pin_reads_to_primary(session, current_app.config['REPLICA_STICKY_SECONDS'])
+    return response
+
+@routes.after_request
+def record_request_stats(response):
+    stats = instrumentation.current_request()
+    if stats is not None:
+        instrumentation.metrics.record_request(stats, request.method, response.status_code,
+                                               time.perf_counter() - g.request_started)
+    return response
 
-# Initialize database tables
+# Registered after record_request_stats so it runs before it: after_request
+# hooks run in reverse order, and the timings should include compression
+@routes.after_request
+def compress_response(response):
+    min_size = current_app.config['COMPRESS_MIN_SIZE']
+    if min_size < 0 or response.direct_passthrough or response.is_streamed or not assets.should_compress(response):
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = assets.choose_encoding(request.accept_encodings)
+    if encoding:
+        response.set_data(assets.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+# Replaces Flask's static view (see create_app)
+def send_static(filename):
+    encodings = assets.hashed_file(filename)
+    if encodings is None:
+        return current_app.send_static_file(filename)
+    encoding = assets.choose_encoding(request.accept_encodings, encodings)
+    response = send_from_directory(current_app.static_folder, filename + dict(assets.ENCODINGS).get(encoding, ''),
+                                   mimetype=assets.content_type(filename), max_age=assets.IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@routes.teardown_request
+def end_request_stats(exc):
+    instrumentation.end_request()
+
+@routes.errorhandler(PoolTimeout)
+@routes.errorhandler(HasherBusy)
+def handle_pool_timeout(e):
+    response = jsonify({'error': 'Server busy, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+# Schema bootstrap: pending migrations, the attempt partitions for this month
+# and the months ahead, then the default admin if there is no admin yet.
+# Idempotent, so a deploy can run it every time (flask --app app init-db);
+# returns the migration versions applied, the partitions created and whether
+# the admin was created. Never run at import or app creation.
 def init_db():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # Create users table
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            username VARCHAR(80) UNIQUE NOT NULL,
-            email VARCHAR(120) UNIQUE NOT NULL,
-            password VARCHAR(255) NOT NULL,
-            role VARCHAR(20) NOT NULL DEFAULT 'student',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create quizzes table
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS quizzes (
-            id SERIAL PRIMARY KEY,
-            title VARCHAR(255) NOT NULL,
-            description TEXT,
-            created_by INTEGER REFERENCES users(id),
-            passing_score INTEGER DEFAULT 60,
-            duration_minutes INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    # Ensure duration column exists for older DBs
-    try:
-        cur.execute("ALTER TABLE quizzes ADD COLUMN IF NOT EXISTS duration_minutes INTEGER DEFAULT 0")
-    except Exception:
-        pass
-    
-    # Create questions table
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS questions (
-            id SERIAL PRIMARY KEY,
-            quiz_id INTEGER REFERENCES quizzes(id) ON DELETE CASCADE,
-            question_text TEXT NOT NULL,
-            question_type VARCHAR(20) DEFAULT 'multiple_choice',
-            options JSONB,
-            correct_answer VARCHAR(255) NOT NULL,
-            points INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create attempts table
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS quiz_attempts (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER REFERENCES users(id),
-            quiz_id INTEGER REFERENCES quizzes(id),
-            score INTEGER,
-            passed BOOLEAN,
-            attempted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Ensure ON DELETE CASCADE on quiz_attempts.quiz_id (best-effort for existing DBs)
+    from migrations import migrate
+
+    created_admin = False
+    with get_db_connection() as conn:
+        # Pending schema migrations (a single version probe once current)
+        applied = migrate(conn)
+        cur = conn.cursor()
+
+        # Not only in migration 9: months run out unless something creates them
+        created_partitions = partitions.ensure_partitions(cur)
+
+        # Create admin user if not exists
+        cur.execute("SELECT COUNT(*) FROM users WHERE role = 'admin'")
+        if cur.fetchone()[0] == 0:
+            hashed_password = get_hasher().hash('admin123')
+            cur.execute(
+                "INSERT INTO users (username, email, password, role) VALUES (%s, %s, %s, %s)",
+                ('admin', 'admin@quiz.com', hashed_password, 'admin')
+            )
+            created_admin = True
+
+        conn.commit()
+        cur.close()
+    return applied, created_partitions, created_admin
+
+@click.command('init-db')
+def init_db_command():
+    """Create or upgrade the schema and the default admin (safe to re-run)."""
+    applied, created_partitions, created_admin = init_db()
+    if applied:
+        click.echo(f"Applied migrations {', '.join(map(str, applied))}")
+    else:
+        click.echo("Schema is up to date")
+    if created_partitions:
+        click.echo(f"Created partitions {', '.join(created_partitions)}")
+    if created_admin:
+        click.echo("Created the default admin (admin / admin123); change its password")
+
+# Statements shared with the async serving mode (asgi.py), which runs them
+# through asyncpg. Keep them to plain %s placeholders.
+# Explicit columns: the search vectors (migration 11) stay out of the cache
+QUIZ_DEFINITION_SQL = """
+    SELECT z.id, z.title, z.description, z.created_by, z.passing_score, z.duration_minutes,
+           z.created_at, z.updated_at, z.sample_size, z.sample_by, z.shuffle,
+           (SELECT COALESCE(json_agg(to_jsonb(q) - 'search_vector' ORDER BY q.id), '[]'::json)
+            FROM questions q WHERE q.quiz_id = z.id) AS questions
+    FROM quizzes z
+    WHERE z.id = %s
+"""
+QUIZ_VERSION_SQL = "SELECT updated_at FROM quizzes WHERE id = %s"
+SAVE_ATTEMPT_SQL = """
+    WITH attempt AS (
+        INSERT INTO quiz_attempts (user_id, quiz_id, score, passed)
+        VALUES (%s, %s, %s::numeric, %s)
+        RETURNING id, attempted_at
+    ), answers AS (
+        INSERT INTO user_answers (attempt_id, question_id, selected_answer, is_correct, attempted_at)
+        SELECT attempt.id, a.question_id, a.selected_answer, a.is_correct, attempt.attempted_at
+        FROM attempt,
+             unnest(%s::int[], %s::varchar[], %s::boolean[]) AS a(question_id, selected_answer, is_correct)
+    )
+    SELECT id FROM attempt
+"""
+# Attempt sessions. Timestamps are LOCALTIMESTAMP to match the TIMESTAMP
+# columns; the grace period absorbs network latency around the deadline. A
+# resumed session keeps the seed and question ids it was opened with.
+OPEN_SESSION_SQL = """
+    INSERT INTO attempt_sessions (user_id, quiz_id, deadline, seed, question_ids)
+    VALUES (%s, %s, CASE WHEN %s::int > 0 THEN LOCALTIMESTAMP + make_interval(mins => %s::int) END,
+            %s, %s::int[])
+    ON CONFLICT (user_id, quiz_id) WHERE sealed_at IS NULL
+    DO UPDATE SET user_id = EXCLUDED.user_id
+    RETURNING id, answers, seed, question_ids, deadline,
+              EXTRACT(EPOCH FROM deadline - LOCALTIMESTAMP)::float8 AS remaining_seconds
+"""
+AUTOSAVE_SQL = """
+    UPDATE attempt_sessions
+    SET answers = answers || %s::jsonb, saved_at = LOCALTIMESTAMP
+    WHERE user_id = %s AND quiz_id = %s AND sealed_at IS NULL
+      AND (deadline IS NULL OR LOCALTIMESTAMP <= deadline + make_interval(secs => %s::float8))
+    RETURNING EXTRACT(EPOCH FROM deadline - LOCALTIMESTAMP)::float8 AS remaining_seconds
+"""
+# Answers arriving after deadline + grace are ignored; the stored ones count
+SEAL_SESSION_SQL = """
+    UPDATE attempt_sessions
+    SET answers = CASE WHEN deadline IS NULL OR LOCALTIMESTAMP <= deadline + make_interval(secs => %s::float8)
+                       THEN answers || %s::jsonb ELSE answers END,
+        sealed_at = LOCALTIMESTAMP
+    WHERE user_id = %s AND quiz_id = %s AND sealed_at IS NULL
+    RETURNING id, answers, seed, question_ids, deadline IS NOT NULL AND LOCALTIMESTAMP >= deadline AS expired
+"""
+LINK_SESSION_SQL = "UPDATE attempt_sessions SET attempt_id = %s WHERE id = %s"
+# Everything the quiz page shows, as versions: the definition, the newest
+# attempt on the quiz, the attempt total (which drops when attempts are
+# deleted) and the latest user change (usernames are listed). All index
+# probes; no row when the quiz does not exist.
+QUIZ_PAGE_VERSION_SQL = """
+    SELECT z.updated_at,
+           (SELECT a.id FROM quiz_attempts a WHERE a.quiz_id = z.id
+            ORDER BY a.attempted_at DESC, a.id DESC LIMIT 1) AS latest_attempt,
+           (SELECT SUM(value) FROM dashboard_counters WHERE name = 'attempts') AS attempts,
+           (SELECT MAX(updated_at) FROM users) AS users_updated_at
+    FROM quizzes z
+    WHERE z.id = %s
+"""
+
+# ``pools`` is the caller's sampling cache (question_pools here)
+def open_session_params(user_id, quiz, questions, pools):
+    # The draw is wasted when an open session is resumed, but it costs no
+    # query: sampling works on the cached definition
+    duration = quiz['duration_minutes'] or 0
+    seed = sampling.new_seed()
+    return (user_id, quiz['id'], duration, duration, seed, sampling.draw_questions(pools, quiz, questions, seed))
+
+def save_attempt_params(user_id, quiz_id, result):
+    return (user_id, quiz_id, result['score'], result['passed'],
+            result['question_ids'], result['selected_answers'], result['is_correct'])
+
+# Conditional GET. Validators are weak ETags derived from row versions plus
+# whatever else shapes the response; a request that presents the current one
+# gets an empty 304 before any serialisation or rendering. Responses are
+# private to the signed-in user and revalidated on every use.
+def etag_for(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:24]
+
+def is_fresh(req, etag):
+    return req.if_none_match.contains_weak(etag)
+
+def cache_privately(response, etag):
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+def not_modified(etag):
+    return cache_privately(Response(status=304), etag)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+_template_versions = {}
+
+# Digest of a template's source, so a deploy that changes the markup also
+# changes the ETags of pages rendered from it. Read from the templates
+# directory rather than through an app, since asgi.py calls it too.
+def template_version(name):
+    version = _template_versions.get(name)
+    if version is None:
+        with open(os.path.join(TEMPLATE_DIR, name), 'rb') as f:
+            version = _template_versions[name] = hashlib.sha1(f.read()).hexdigest()[:12]
+    return version
+
+# Shared with asgi.py: the same versions and session give the same ETag in
+# both serving modes. The asset build is part of it, since the page links
+# hashed file names.
+def quiz_page_etag(sess, quiz_id, version):
+    return etag_for('view_quiz', template_version('view_quiz.html'), assets.version(), sess.get('user_id'),
+                    sess.get('role'), sess.get('username'), quiz_id, *version)
+
+# Load a quiz row and all of its questions in one round trip.
+# Returns (None, []) when the quiz does not exist.
+def load_quiz_with_questions(cur, quiz_id):
+    cur.execute(QUIZ_DEFINITION_SQL, (quiz_id,))
+    row = cur.fetchone()
+    if row is None:
+        return None, []
+    quiz = dict(row)
+    questions = quiz.pop('questions')
+    return quiz, questions
+
+# Cached variant of load_quiz_with_questions. The primary-key probe on
+# quizzes.updated_at catches edits made through any worker, so a stale
+# definition is reloaded rather than served.
+def get_quiz_definition(cur, quiz_id):
+    cur.execute(QUIZ_VERSION_SQL, (quiz_id,))
+    row = cur.fetchone()
+    if row is None:
+        quiz_cache.invalidate(quiz_id)
+        return None, []
+    cached = quiz_cache.get(quiz_id, row[0])
+    if cached is not None:
+        return cached
+
+    quiz, questions = load_quiz_with_questions(cur, quiz_id)
+    if quiz is not None:
+        quiz_cache.put(quiz_id, quiz['updated_at'], (quiz, questions))
+    return quiz, questions
+
+# get_quiz_definition on a replica when the route may read from one, or None
+# when it may not (the caller then reads it on its own cursor). Call it before
+# borrowing the route's primary connection, not while holding it: one request
+# holding two pooled connections can exhaust a small pool under exam load.
+def get_replica_quiz_definition(quiz_id):
+    if not (replica_reads() and replicas):
+        return None
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        return get_quiz_definition(cur, quiz_id)
+
+# Item analysis for a quiz, recomputed only when the definition changed or a
+# newer attempt exists (an index probe on the quiz's latest attempt)
+def get_item_analysis(cur, quiz, questions):
+    cur.execute("""
+        SELECT id FROM quiz_attempts WHERE quiz_id = %s ORDER BY attempted_at DESC, id DESC LIMIT 1
+    """, (quiz['id'],))
+    latest = cur.fetchone()
+    version = (quiz['updated_at'], latest[0] if latest else None)
+    analysis = item_analysis_cache.get(quiz['id'], version)
+    if analysis is None:
+        # Imported here: numpy is only needed once a quiz is analysed
+        from analytics import analyze_quiz
+        analysis = analyze_quiz(cur, quiz, questions)
+        analysis['computed_at'] = datetime.now().isoformat()
+        item_analysis_cache.put(quiz['id'], version, analysis)
+    return analysis
+
+# Get or create the student's open attempt session; refreshing the page
+# resumes it with the same deadline, questions and saved answers
+def open_attempt_session(cur, user_id, quiz, questions):
+    cur.execute(OPEN_SESSION_SQL, open_session_params(user_id, quiz, questions, question_pools))
+    return cur.fetchone()
+
+# Seal the open attempt session, merging in the final answers ``delta``.
+# Returns (attempt_session, result); attempt_session is None when no attempt
+# is open. While time remains an incomplete submission is refused: result
+# has 'missing' set, nothing is recorded and the caller should roll back.
+def seal_attempt_session(cur, user_id, quiz, questions, delta):
+    cur.execute(SEAL_SESSION_SQL, (current_app.config['ATTEMPT_GRACE_SECONDS'], psycopg2.extras.Json(delta), user_id, quiz['id']))
+    attempt_session = cur.fetchone()
+    if attempt_session is None:
+        return None, None
+    # Only the questions this attempt was given
+    questions = sampling.attempt_questions(question_pools, quiz, questions, attempt_session['seed'], attempt_session['question_ids'])
+    answers = attempt_session['answers']
+    result = grade_submission(questions, lambda question_id: answers.get(str(question_id)), quiz['passing_score'])
+    if result['missing'] and not attempt_session['expired']:
+        return attempt_session, result
+    attempt_id = save_attempt(cur, user_id, quiz['id'], result)
+    cur.execute(LINK_SESSION_SQL, (attempt_id, attempt_session['id']))
+    return attempt_session, result
+
+# Answers posted by the attempt form (question_<id> fields). The form is
+# read as posted rather than question by question, which for a question bank
+# would mean the whole bank; grading only reads the attempt's own questions.
+def form_answers(form):
+    answers = clean_answers({name[len('question_'):]: value for name, value in form.items()
+                             if name.startswith('question_') and value})
+    return answers or {}
+
+# Persist an attempt and every answer with a single statement
+def save_attempt(cur, user_id, quiz_id, result):
+    cur.execute(SAVE_ATTEMPT_SQL, save_attempt_params(user_id, quiz_id, result))
+    return cur.fetchone()[0]
+
+# Keyset-paginated listings, newest first. The *_page_args helpers return
+# the (select, where, params, sort) arguments of page_query so the async
+# serving mode can run the same listings; list_* return (rows, next_cursor).
+QUIZ_LIST_COLUMNS = "id, title, description, created_by, passing_score, duration_minutes, created_at, updated_at"
+
+def users_page_args():
+    return ("SELECT id, username, email, role, created_at FROM users",
+            None, (), ('created_at', 'id', 'created_at', 'id'))
+
+def quizzes_page_args(created_by=None):
+    return (f"SELECT {QUIZ_LIST_COLUMNS} FROM quizzes",
+            "created_by = %s" if created_by is not None else None,
+            (created_by,) if created_by is not None else (),
+            ('created_at', 'id', 'created_at', 'id'))
+
+def user_attempts_page_args(user_id):
+    return ("""
+        SELECT qa.id, qa.quiz_id, q.title, qa.score, qa.passed, qa.attempted_at
+        FROM quiz_attempts qa
+        JOIN quizzes q ON qa.quiz_id = q.id
+    """, "qa.user_id = %s", (user_id,), ('qa.attempted_at', 'qa.id', 'attempted_at', 'id'))
+
+def quiz_attempts_page_args(quiz_id):
+    return ("""
+        SELECT qa.id, u.username, qa.score, qa.passed, qa.attempted_at
+        FROM quiz_attempts qa
+        JOIN users u ON qa.user_id = u.id
+    """, "qa.quiz_id = %s", (quiz_id,), ('qa.attempted_at', 'qa.id', 'attempted_at', 'id'))
+
+def list_users_page(cur, cursor=None, limit=None):
+    return fetch_page(cur, *users_page_args(), cursor, limit or current_app.config['PAGE_SIZE'])
+
+def list_quizzes_page(cur, created_by=None, cursor=None, limit=None):
+    return fetch_page(cur, *quizzes_page_args(created_by), cursor, limit or current_app.config['PAGE_SIZE'])
+
+def list_user_attempts_page(cur, user_id, cursor=None, limit=None):
+    return fetch_page(cur, *user_attempts_page_args(user_id), cursor, limit or current_app.config['PAGE_SIZE'])
+
+def list_quiz_attempts_page(cur, quiz_id, cursor=None, limit=None):
+    return fetch_page(cur, *quiz_attempts_page_args(quiz_id), cursor, limit or current_app.config['PAGE_SIZE'])
+
+# Page size requested through ?limit=, clamped to a sane range
+def requested_limit():
+    page_size = current_app.config['PAGE_SIZE']
     try:
-        cur.execute("""
-            DO $$
-            BEGIN
-                IF EXISTS (
-                    SELECT 1 FROM information_schema.table_constraints tc
-                    WHERE tc.constraint_name = 'quiz_attempts_quiz_id_fkey'
-                      AND tc.table_name = 'quiz_attempts'
-                ) THEN
-                    ALTER TABLE quiz_attempts DROP CONSTRAINT quiz_attempts_quiz_id_fkey;
-                END IF;
-            END$$;
-        """)
-        cur.execute("""
-            ALTER TABLE quiz_attempts
-            ADD CONSTRAINT quiz_attempts_quiz_id_fkey
-            FOREIGN KEY (quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE
-        """)
-    except Exception:
-        pass
-    
-    # Ensure ON DELETE CASCADE on quiz_attempts.user_id (best-effort for existing DBs)
+        limit = int(request.args.get('limit', page_size))
+    except ValueError:
+        limit = page_size
+    return max(1, min(limit, 100))
+
+def page_response(fetch, *args):
     try:
-        cur.execute("""
-            DO $$
-            BEGIN
-                IF EXISTS (
-                    SELECT 1 FROM information_schema.table_constraints tc
-                    WHERE tc.constraint_name = 'quiz_attempts_user_id_fkey'
-                      AND tc.table_name = 'quiz_attempts'
-                ) THEN
-                    ALTER TABLE quiz_attempts DROP CONSTRAINT quiz_attempts_user_id_fkey;
-                END IF;
-            END$$;
-        """)
-        cur.execute("""
-            ALTER TABLE quiz_attempts
-            ADD CONSTRAINT quiz_attempts_user_id_fkey
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        """)
-    except Exception:
-        pass
-    
-    # Create answers table
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS user_answers (
-            id SERIAL PRIMARY KEY,
-            attempt_id INTEGER REFERENCES quiz_attempts(id) ON DELETE CASCADE,
-            question_id INTEGER REFERENCES questions(id),
-            selected_answer VARCHAR(255),
-            is_correct BOOLEAN
-        )
-    ''')
-    
-    # Create admin user if not exists
-    cur.execute("SELECT COUNT(*) FROM users WHERE role = 'admin'")
-    if cur.fetchone()[0] == 0:
-        hashed_password = bcrypt.generate_password_hash('admin123').decode('utf-8')
-        cur.execute(
-            "INSERT INTO users (username, email, password, role) VALUES (%s, %s, %s, %s)",
-            ('admin', 'admin@quiz.com', hashed_password, 'admin')
-        )
-    
-    conn.commit()
-    cur.close()
-    conn.close()
+        with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+            rows, next_cursor = fetch(cur, *args, cursor=request.args.get('cursor'), limit=requested_limit())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'items': serialize_rows(rows), 'next_cursor': next_cursor}), 200
+
+# Rows built with json_agg carry timestamps as ISO strings; restore them so
+# templates can keep calling strftime
+def parse_timestamps(rows, *fields):
+    for row in rows:
+        for field in fields:
+            if isinstance(row.get(field), str):
+                row[field] = datetime.fromisoformat(row[field])
+    return rows
+
+# Attempt export, newest first. Both export modes share the same column
+# formatting so the files are identical whichever one is configured.
+ATTEMPTS_CSV_HEADER = ['Username', 'Email', 'Score (%)', 'Passed', 'Attempted At']
+ATTEMPTS_CSV_SQL = """
+    SELECT u.username, u.email, COALESCE(qa.score, 0) AS score,
+           CASE WHEN qa.passed THEN 'Yes' ELSE 'No' END AS passed,
+           to_char(qa.attempted_at, 'YYYY-MM-DD HH24:MI:SS.US') AS attempted_at
+    FROM quiz_attempts qa
+    JOIN users u ON qa.user_id = u.id
+    WHERE qa.quiz_id = %s
+    ORDER BY qa.attempted_at DESC
+"""
+ATTEMPTS_CSV_COPY_SQL = """
+    COPY (
+        SELECT u.username AS "Username", u.email AS "Email", COALESCE(qa.score, 0) AS "Score (%%)",
+               CASE WHEN qa.passed THEN 'Yes' ELSE 'No' END AS "Passed",
+               to_char(qa.attempted_at, 'YYYY-MM-DD HH24:MI:SS.US') AS "Attempted At"
+        FROM quiz_attempts qa
+        JOIN users u ON qa.user_id = u.id
+        WHERE qa.quiz_id = %s
+        ORDER BY qa.attempted_at DESC
+    ) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
 
 # Routes
-@app.route('/')
+@routes.route('/')
 def home():
     # Always show login as the landing page
     return redirect(url_for('login'))
 
-@app.route('/register', methods=['GET', 'POST'])
+@routes.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -175,45 +590,47 @@ def register():
         # Enforce student role on self-registration
         role = 'student'
         
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        hashed_password = get_hasher().hash(password)
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        try:
-            cur.execute(
-                "INSERT INTO users (username, email, password, role) VALUES (%s, %s, %s, %s)",
-                (username, email, hashed_password, role)
-            )
-            conn.commit()
-            flash('Registration successful! Please login.', 'success')
-            return redirect(url_for('login'))
-        except psycopg2.IntegrityError:
-            flash('Username or email already exists.', 'error')
-            return render_template('register.html')
-        finally:
-            cur.close()
-            conn.close()
+        with get_db_connection() as conn, conn.cursor() as cur:
+            try:
+                cur.execute(
+                    "INSERT INTO users (username, email, password, role) VALUES (%s, %s, %s, %s)",
+                    (username, email, hashed_password, role)
+                )
+                conn.commit()
+                flash('Registration successful! Please login.', 'success')
+                return redirect(url_for('login'))
+            except psycopg2.IntegrityError:
+                conn.rollback()
+                flash('Username or email already exists.', 'error')
+                return render_template('register.html')
     
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@routes.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         portal = request.form.get('portal', 'student')
         
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        
-        cur.execute("SELECT * FROM users WHERE username = %s", (username,))
-        user = cur.fetchone()
+        with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+            cur.execute("SELECT * FROM users WHERE username = %s", (username,))
+            user = cur.fetchone()
         
-        cur.close()
-        conn.close()
+        valid = False
+        if user:
+            valid, new_hash = get_hasher().verify(user['password'], password)
+            if new_hash:
+                # BCRYPT_ROUNDS changed since this hash was made; upgrade it
+                # unless the password was changed in the meantime
+                with get_db_connection() as conn, conn.cursor() as cur:
+                    cur.execute("UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                                (new_hash, user['id'], user['password']))
+                    conn.commit()
         
-        if user and bcrypt.check_password_hash(user['password'], password):
+        if valid:
             # Enforce role based on chosen portal
             if portal == 'admin' and user['role'] != 'admin':
                 flash('Invalid portal for this account. Please use the Student portal.', 'error')
@@ -236,49 +653,51 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/logout')
+@routes.route('/logout')
 def logout():
     session.clear()
     flash('You have been logged out successfully.', 'success')
     return redirect(url_for('login'))
 
-@app.route('/admin/dashboard')
+@routes.route('/admin/dashboard')
+@read_only
 def admin_dashboard():
     if 'user_id' not in session or session['role'] != 'admin':
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    
-    # Get all quizzes created by this admin
-    cur.execute("SELECT * FROM quizzes WHERE created_by = %s ORDER BY created_at DESC", (session['user_id'],))
-    quizzes = cur.fetchall()
-    
-    # Get all users
-    cur.execute("SELECT id, username, email, role, created_at FROM users ORDER BY created_at DESC")
-    users = cur.fetchall()
-    
-    # Get statistics
-    cur.execute("SELECT COUNT(*) FROM quizzes")
-    total_quizzes = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM users WHERE role = 'student'")
-    total_students = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM quiz_attempts")
-    total_attempts = cur.fetchone()[0]
-    
-    cur.close()
-    conn.close()
+    page_size = current_app.config['PAGE_SIZE']
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        # First page of this admin's quizzes and of all users, plus the
+        # maintained statistics counters, in a single round trip
+        cur.execute(f"""
+            SELECT
+                (SELECT COALESCE(json_agg(z ORDER BY z.created_at DESC, z.id DESC), '[]'::json)
+                 FROM (SELECT {QUIZ_LIST_COLUMNS} FROM quizzes WHERE created_by = %s
+                       ORDER BY created_at DESC, id DESC LIMIT %s) z) AS quizzes,
+                (SELECT COALESCE(json_agg(u ORDER BY u.created_at DESC, u.id DESC), '[]'::json)
+                 FROM (SELECT id, username, email, role, created_at FROM users
+                       ORDER BY created_at DESC, id DESC LIMIT %s) u) AS users,
+                (SELECT COALESCE(json_object_agg(name, total), '{{}}'::json)
+                 FROM (SELECT name, SUM(value) AS total FROM dashboard_counters GROUP BY name) c) AS counters
+        """, (session['user_id'], page_size + 1, page_size + 1))
+        row = cur.fetchone()
+        quizzes, quizzes_cursor = page_from_rows(parse_timestamps(row['quizzes'], 'created_at', 'updated_at'), page_size, 'created_at')
+        users, users_cursor = page_from_rows(parse_timestamps(row['users'], 'created_at'), page_size, 'created_at')
+        counters = row['counters']
+        total_quizzes = counters.get('quizzes', 0)
+        total_students = counters.get('students', 0)
+        total_attempts = counters.get('attempts', 0)
     
     return render_template('admin_dashboard.html', 
                          quizzes=quizzes, 
                          users=users, 
+                         quizzes_cursor=quizzes_cursor,
+                         users_cursor=users_cursor,
                          total_quizzes=total_quizzes,
                          total_students=total_students,
                          total_attempts=total_attempts)
 
-@app.route('/admin/quiz/new', methods=['GET', 'POST'])
+@routes.route('/admin/quiz/new', methods=['GET', 'POST'])
 def create_quiz():
     if 'user_id' not in session or session['role'] != 'admin':
         return redirect(url_for('login'))
@@ -288,218 +707,335 @@ def create_quiz():
         description = request.form['description']
         passing_score = int(request.form['passing_score'])
         duration_minutes = int(request.form.get('duration_minutes', 0) or 0)
+        # Question bank settings: blank sample size serves every question
+        sample_size = int(request.form.get('sample_size') or 0) or None
+        sample_by = request.form.get('sample_by') if request.form.get('sample_by') in sampling.SAMPLE_BY else None
+        shuffle = bool(request.form.get('shuffle'))
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        try:
-            # Create quiz
-            cur.execute(
-                """
-                INSERT INTO quizzes (title, description, created_by, passing_score, duration_minutes) 
-                VALUES (%s, %s, %s, %s, %s) RETURNING id
-                """,
-                (title, description, session['user_id'], passing_score, duration_minutes)
-            )
-            quiz_id = cur.fetchone()[0]
-            
-            # Collect question-related data
-            questions = request.form.getlist('question_text')
-            question_types = request.form.getlist('question_type')
-            options_list = request.form.getlist('options')
-            correct_answers = request.form.getlist('correct_answer')
-            points_list = request.form.getlist('points')
-
-            # Insert questions by index to avoid zip truncation
-            total = max(len(questions), len(question_types), len(options_list), len(correct_answers), len(points_list))
-            for i in range(total):
-                question = (questions[i] if i < len(questions) else '').strip()
-                if not question:
-                    continue
-                q_type = question_types[i] if i < len(question_types) else 'multiple_choice'
-                option_str = options_list[i] if i < len(options_list) else ''
-                correct = correct_answers[i] if i < len(correct_answers) else ''
-                points = int(points_list[i]) if i < len(points_list) and points_list[i] else 1
-
-                # Auto-fill options for true/false
-                if q_type == 'true_false':
-                    options = ['True', 'False']
-                else:
-                    options = [o.strip() for o in (option_str.split('|') if option_str else []) if o.strip()]
-
+        with get_db_connection() as conn, conn.cursor() as cur:
+            try:
+                # Create quiz
                 cur.execute(
                     """
-                    INSERT INTO questions 
-                    (quiz_id, question_text, question_type, options, correct_answer, points) 
-                    VALUES (%s, %s, %s, %s, %s, %s)
+                    INSERT INTO quizzes (title, description, created_by, passing_score, duration_minutes,
+                                         sample_size, sample_by, shuffle)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
                     """,
-                    (quiz_id, question, q_type, json.dumps(options), correct, points)
+                    (title, description, session['user_id'], passing_score, duration_minutes,
+                     sample_size, sample_by, shuffle)
                 )
+                quiz_id = cur.fetchone()[0]
             
-            conn.commit()
-            flash('Quiz created successfully!', 'success')
-            return redirect(url_for('admin_dashboard'))
+                # Collect question-related data
+                questions = request.form.getlist('question_text')
+                question_types = request.form.getlist('question_type')
+                options_list = request.form.getlist('options')
+                correct_answers = request.form.getlist('correct_answer')
+                points_list = request.form.getlist('points')
+                tags = request.form.getlist('question_tag')
+
+                # Insert questions by index to avoid zip truncation
+                total = max(len(questions), len(question_types), len(options_list), len(correct_answers), len(points_list))
+                for i in range(total):
+                    question = (questions[i] if i < len(questions) else '').strip()
+                    if not question:
+                        continue
+                    q_type = question_types[i] if i < len(question_types) else 'multiple_choice'
+                    option_str = options_list[i] if i < len(options_list) else ''
+                    correct = correct_answers[i] if i < len(correct_answers) else ''
+                    points = int(points_list[i]) if i < len(points_list) and points_list[i] else 1
+                    tag = (tags[i] if i < len(tags) else '').strip() or None
+
+                    # Auto-fill options for true/false
+                    if q_type == 'true_false':
+                        options = ['True', 'False']
+                    else:
+                        options = [o.strip() for o in (option_str.split('|') if option_str else []) if o.strip()]
+
+                    cur.execute(
+                        """
+                        INSERT INTO questions 
+                        (quiz_id, question_text, question_type, options, correct_answer, points, tag) 
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        """,
+                        (quiz_id, question, q_type, json.dumps(options), correct, points, tag)
+                    )
             
-        except Exception as e:
-            conn.rollback()
-            flash(f'Error creating quiz: {str(e)}', 'error')
-            return render_template('create_quiz.html')
-        finally:
-            cur.close()
-            conn.close()
+                conn.commit()
+                quiz_cache.invalidate(quiz_id)
+                flash('Quiz created successfully!', 'success')
+                return redirect(url_for('admin_dashboard'))
+            
+            except Exception as e:
+                conn.rollback()
+                flash(f'Error creating quiz: {str(e)}', 'error')
+                return render_template('create_quiz.html')
     
     return render_template('create_quiz.html')
 
-@app.route('/quiz/<int:quiz_id>')
+@routes.route('/quiz/<int:quiz_id>')
+@read_only
 def view_quiz(quiz_id):
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    
-    # Get quiz details
-    cur.execute("SELECT * FROM quizzes WHERE id = %s", (quiz_id,))
-    quiz = cur.fetchone()
-    
-    if quiz is None:
-        flash('Quiz not found.', 'error')
-        return redirect(url_for('student_dashboard' if session['role'] == 'student' else 'admin_dashboard'))
-    
-    # Get questions
-    cur.execute("SELECT * FROM questions WHERE quiz_id = %s", (quiz_id,))
-    questions = cur.fetchall()
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        # Unchanged since the browser's copy: no definition or attempt queries
+        etag = None
+        cur.execute(QUIZ_PAGE_VERSION_SQL, (quiz_id,))
+        version = cur.fetchone()
+        if version is not None:
+            etag = quiz_page_etag(session, quiz_id, version)
+            if is_fresh(request, etag):
+                return not_modified(etag)
+
+        # Get quiz details and questions
+        quiz, questions = get_quiz_definition(cur, quiz_id)
     
-    # Get attempts
-    cur.execute("""
-        SELECT u.username, qa.score, qa.passed, qa.attempted_at 
-        FROM quiz_attempts qa 
-        JOIN users u ON qa.user_id = u.id 
-        WHERE qa.quiz_id = %s 
-        ORDER BY qa.attempted_at DESC
-    """, (quiz_id,))
-    attempts = cur.fetchall()
+        if quiz is None:
+            flash('Quiz not found.', 'error')
+            return redirect(url_for('student_dashboard' if session['role'] == 'student' else 'admin_dashboard'))
     
-    cur.close()
-    conn.close()
+        # Get the first page of attempts; the rest load on demand
+        attempts, attempts_cursor = list_quiz_attempts_page(cur, quiz_id)
     
-    return render_template('view_quiz.html', quiz=quiz, questions=questions, attempts=attempts)
+    response = make_response(render_template('view_quiz.html', quiz=quiz, questions=questions, attempts=attempts, attempts_cursor=attempts_cursor))
+    return cache_privately(response, etag) if etag else response
 
-@app.route('/admin/quiz/<int:quiz_id>/attempts.csv')
+@routes.route('/admin/quiz/<int:quiz_id>/attempts.csv')
+@read_only
 def export_quiz_attempts_csv(quiz_id):
     if 'user_id' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    try:
-        # Ensure admin owns the quiz
-        cur.execute("SELECT id, title FROM quizzes WHERE id = %s AND created_by = %s", (quiz_id, session['user_id']))
-        quiz = cur.fetchone()
-        if not quiz:
-            return jsonify({'error': 'Quiz not found or unauthorized'}), 404
+    with get_db_connection() as conn, conn.cursor() as cur:
+        try:
+            # Ensure admin owns the quiz
+            cur.execute("SELECT id, title FROM quizzes WHERE id = %s AND created_by = %s", (quiz_id, session['user_id']))
+            if not cur.fetchone():
+                return jsonify({'error': 'Quiz not found or unauthorized'}), 404
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
 
-        cur.execute(
-            """
-            SELECT u.username, u.email, qa.score, qa.passed, qa.attempted_at
-            FROM quiz_attempts qa
-            JOIN users u ON qa.user_id = u.id
-            WHERE qa.quiz_id = %s
-            ORDER BY qa.attempted_at DESC
-            """,
-            (quiz_id,)
-        )
-        rows = cur.fetchall()
-
-        # Build CSV
-        import csv
-        from io import StringIO
-        si = StringIO()
-        writer = csv.writer(si)
-        writer.writerow(['Username', 'Email', 'Score (%)', 'Passed', 'Attempted At'])
-        for r in rows:
-            writer.writerow([r['username'], r['email'], round(r['score'] or 0, 2), 'Yes' if r['passed'] else 'No', r['attempted_at']])
-
-        output = si.getvalue()
-        from flask import Response
-        filename = f"quiz_{quiz_id}_attempts.csv"
-        return Response(
-            output,
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition': f'attachment; filename={filename}'
-            }
-        )
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
+    # The body is streamed: rows are read in chunks on a connection borrowed
+    # for the duration of the download, so memory stays flat for any quiz size
+    if current_app.config['CSV_EXPORT_MODE'] == 'copy':
+        chunks = copy_chunks(streaming_connection(), ATTEMPTS_CSV_COPY_SQL, (quiz_id,))
+    else:
+        rows = cursor_rows(streaming_connection(), ATTEMPTS_CSV_SQL, (quiz_id,))
+        chunks = csv_chunks(rows, ATTEMPTS_CSV_HEADER)
 
-@app.route('/admin/quiz/<int:quiz_id>/questions', methods=['GET'])
-def get_questions_for_quiz(quiz_id):
+    filename = f"quiz_{quiz_id}_attempts.csv"
+    headers = {'Content-Disposition': f'attachment; filename={filename}'}
+    if current_app.config['CSV_EXPORT_GZIP'] and request.accept_encodings['gzip']:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    return Response(chunks, mimetype='text/csv', headers=headers)
+
+def quiz_export_response(quiz_ids, fmt, filename):
+    if fmt not in quiz_transfer.FORMATS:
+        return jsonify({'error': 'Unsupported format'}), 400
+
+    # Streamed like the attempt export: rows are read in chunks on a
+    # connection borrowed for the duration of the download
+    params = quiz_transfer.export_params(session['user_id'], quiz_ids)
+    if fmt == 'csv' and current_app.config['CSV_EXPORT_MODE'] == 'copy':
+        chunks = copy_chunks(streaming_connection(), quiz_transfer.EXPORT_COPY_SQL, params)
+    else:
+        rows = cursor_rows(streaming_connection(), quiz_transfer.EXPORT_SQL, params,
+                           cursor_factory=psycopg2.extras.DictCursor)
+        if fmt == 'csv':
+            chunks = csv_chunks(rows, quiz_transfer.CSV_HEADER, quiz_transfer.csv_row)
+        else:
+            chunks = quiz_transfer.json_chunks(rows)
+
+    headers = {'Content-Disposition': f'attachment; filename={filename}.{fmt}'}
+    if current_app.config['CSV_EXPORT_GZIP'] and request.accept_encodings['gzip']:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/json'
+    return Response(chunks, mimetype=mimetype, headers=headers)
+
+@routes.route('/admin/quizzes/export.<fmt>', methods=['GET'])
+@read_only
+def export_quizzes(fmt):
     if 'user_id' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    try:
-        # Ensure quiz belongs to admin
+    # Every quiz of this admin, or only ?quiz_id=...&quiz_id=...
+    quiz_ids = request.args.getlist('quiz_id', type=int)
+    return quiz_export_response(quiz_ids, fmt, 'quizzes')
+
+@routes.route('/admin/quiz/<int:quiz_id>/export.<fmt>', methods=['GET'])
+@read_only
+def export_quiz(quiz_id, fmt):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    with get_db_connection() as conn, conn.cursor() as cur:
         cur.execute("SELECT id FROM quizzes WHERE id = %s AND created_by = %s", (quiz_id, session['user_id']))
         if not cur.fetchone():
             return jsonify({'error': 'Quiz not found or unauthorized'}), 404
 
-        cur.execute("SELECT id, question_text, question_type, options, correct_answer, points FROM questions WHERE quiz_id = %s ORDER BY id ASC", (quiz_id,))
-        questions = cur.fetchall()
-        # Convert options JSON to list if needed
-        result = []
-        for q in questions:
+    return quiz_export_response([quiz_id], fmt, f'quiz_{quiz_id}')
+
+# Uploaded file (multipart "file") or the raw request body, and its format
+def import_payload():
+    if request.content_length and request.content_length > current_app.config['IMPORT_MAX_BYTES']:
+        return None, None
+    upload = request.files.get('file')
+    if upload:
+        data, filename, mimetype = upload.read(), upload.filename, upload.mimetype
+    else:
+        data, filename, mimetype = request.get_data(), None, request.mimetype
+    fmt = request.args.get('format') or quiz_transfer.guess_format(filename, mimetype)
+    return data, fmt
+
+@routes.route('/admin/quizzes/import', methods=['POST'])
+def import_quizzes():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    data, fmt = import_payload()
+    if data is None:
+        return jsonify({'error': 'Import too large'}), 413
+    try:
+        quizzes = quiz_transfer.read_quizzes(data, fmt)
+    except quiz_transfer.InvalidImport as e:
+        return jsonify({'error': 'Invalid import', 'errors': e.errors}), 400
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        try:
+            quiz_ids = quiz_transfer.insert_quizzes(cur, quizzes, session['user_id'])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'message': 'Quizzes imported successfully',
+        'quiz_ids': quiz_ids,
+        'questions': sum(len(z['questions']) for z in quizzes),
+    }), 201
+
+@routes.route('/admin/quiz/<int:quiz_id>/questions/import', methods=['POST'])
+def import_questions(quiz_id):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    data, fmt = import_payload()
+    if data is None:
+        return jsonify({'error': 'Import too large'}), 413
+    try:
+        questions = quiz_transfer.read_questions(data, fmt)
+    except quiz_transfer.InvalidImport as e:
+        return jsonify({'error': 'Invalid import', 'errors': e.errors}), 400
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        try:
+            # Ensure admin owns the quiz; the row lock orders concurrent imports
+            cur.execute("SELECT id FROM quizzes WHERE id = %s AND created_by = %s FOR UPDATE",
+                        (quiz_id, session['user_id']))
+            if not cur.fetchone():
+                return jsonify({'error': 'Quiz not found or unauthorized'}), 404
+            quiz_transfer.append_questions(cur, quiz_id, questions)
+            conn.commit()
+            quiz_cache.invalidate(quiz_id)
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'error': str(e)}), 500
+
+    return jsonify({'message': 'Questions imported successfully', 'questions': len(questions)}), 201
+
+@routes.route('/admin/quiz/<int:quiz_id>/questions', methods=['GET'])
+@read_only
+def get_questions_for_quiz(quiz_id):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        try:
+            # Ensure quiz belongs to admin; its version covers the questions,
+            # which bump it when edited
+            cur.execute("SELECT updated_at FROM quizzes WHERE id = %s AND created_by = %s", (quiz_id, session['user_id']))
+            row = cur.fetchone()
+            if not row:
+                return jsonify({'error': 'Quiz not found or unauthorized'}), 404
+            etag = etag_for('questions', quiz_id, row['updated_at'])
+            if is_fresh(request, etag):
+                return not_modified(etag)
+
+            quiz, questions = get_quiz_definition(cur, quiz_id)
+            if quiz is None:
+                return jsonify({'error': 'Quiz not found or unauthorized'}), 404
+
+            # Convert options JSON to list if needed
+            result = []
+            for q in questions:
+                row = {key: q[key] for key in ('id', 'question_text', 'question_type', 'options', 'correct_answer', 'points')}
+                # If options is stored as JSON text, psycopg2 may return as list already due to JSONB
+                if isinstance(row.get('options'), str):
+                    try:
+                        row['options'] = json.loads(row['options'])
+                    except Exception:
+                        row['options'] = []
+                result.append(row)
+            return cache_privately(jsonify(result), etag), 200
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+@routes.route('/admin/quiz/<int:quiz_id>/analysis', methods=['GET'])
+@read_only
+def quiz_item_analysis(quiz_id):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        quiz, questions = get_quiz_definition(cur, quiz_id)
+        if quiz is None or quiz['created_by'] != session['user_id']:
+            return jsonify({'error': 'Quiz not found or unauthorized'}), 404
+
+        # Difficulty, discrimination, point-biserial and distractor counts per
+        # question over the attempts that were given it, plus Cronbach's alpha
+        # over the attempts that were given every question
+        analysis = get_item_analysis(cur, quiz, questions)
+    return jsonify(analysis), 200
+
+@routes.route('/admin/question/get/<int:question_id>', methods=['GET'])
+@read_only
+def get_question(question_id):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        try:
+            cur.execute("""
+                SELECT q.id, q.quiz_id, q.question_text, q.question_type, q.options, q.correct_answer, q.points,
+                       q.updated_at
+                FROM questions q
+                JOIN quizzes z ON q.quiz_id = z.id
+                WHERE q.id = %s AND z.created_by = %s
+            """, (question_id, session['user_id']))
+            q = cur.fetchone()
+            if not q:
+                return jsonify({'error': 'Question not found or unauthorized'}), 404
+            etag = etag_for('question', question_id, q['updated_at'])
+            if is_fresh(request, etag):
+                return not_modified(etag)
             row = dict(q)
-            # If options is stored as JSON text, psycopg2 may return as list already due to JSONB
+            row['updated_at'] = mutations.version_of(row)
             if isinstance(row.get('options'), str):
                 try:
                     row['options'] = json.loads(row['options'])
                 except Exception:
                     row['options'] = []
-            result.append(row)
-        return jsonify(result), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
-
-@app.route('/admin/question/get/<int:question_id>', methods=['GET'])
-def get_question(question_id):
-    if 'user_id' not in session or session.get('role') != 'admin':
-        return jsonify({'error': 'Unauthorized'}), 403
-
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    try:
-        cur.execute("""
-            SELECT q.id, q.quiz_id, q.question_text, q.question_type, q.options, q.correct_answer, q.points
-            FROM questions q
-            JOIN quizzes z ON q.quiz_id = z.id
-            WHERE q.id = %s AND z.created_by = %s
-        """, (question_id, session['user_id']))
-        q = cur.fetchone()
-        if not q:
-            return jsonify({'error': 'Question not found or unauthorized'}), 404
-        row = dict(q)
-        if isinstance(row.get('options'), str):
-            try:
-                row['options'] = json.loads(row['options'])
-            except Exception:
-                row['options'] = []
-        return jsonify(row), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
+            return cache_privately(jsonify(row), etag), 200
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
 
-@app.route('/admin/question/edit/<int:question_id>', methods=['POST'])
+@routes.route('/admin/question/edit/<int:question_id>', methods=['POST'])
 def edit_question(question_id):
     if 'user_id' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -520,81 +1056,58 @@ def edit_question(question_id):
     if question_type == 'multiple_choice' and not isinstance(options, list):
         return jsonify({'error': 'Options must be a list for multiple_choice'}), 400
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # Ensure question belongs to a quiz owned by current admin
-        cur.execute("""
-            SELECT q.id FROM questions q
-            JOIN quizzes z ON q.quiz_id = z.id
-            WHERE q.id = %s AND z.created_by = %s
-        """, (question_id, session['user_id']))
-        if not cur.fetchone():
-            return jsonify({'error': 'Question not found or unauthorized'}), 404
-
-        cur.execute(
-            """
-            UPDATE questions
-            SET question_text = %s,
-                question_type = %s,
-                options = %s,
-                correct_answer = %s,
-                points = %s
-            WHERE id = %s
-            """,
-            (
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        try:
+            # Ownership check, version check and write in one statement, which
+            # also bumps the quiz version so every worker drops its cached
+            # definition
+            row = mutations.update_question(
+                cur, question_id, session['user_id'],
                 question_text,
                 question_type,
                 json.dumps(options) if options else json.dumps([]),
                 correct_answer,
                 int(points) if points is not None else 1,
-                question_id
+                mutations.expected_version(data)
             )
-        )
-        conn.commit()
-        return jsonify({'message': 'Question updated successfully'}), 200
-    except Exception as e:
-        conn.rollback()
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
+            conn.commit()
+            quiz_cache.invalidate(row['quiz_id'])
+            return jsonify({'message': 'Question updated successfully', 'updated_at': mutations.version_of(row)}), 200
+        except mutations.Rejected as e:
+            conn.rollback()
+            return jsonify(e.body()), e.status
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'error': str(e)}), 500
 
-@app.route('/admin/quiz/delete/<int:quiz_id>', methods=['DELETE'])
+@routes.route('/admin/quiz/delete/<int:quiz_id>', methods=['DELETE'])
 def delete_quiz(quiz_id):
     if 'user_id' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
-        # Check if quiz exists and belongs to this admin
-        cur.execute("SELECT id FROM quizzes WHERE id = %s AND created_by = %s", (quiz_id, session['user_id']))
-        if not cur.fetchone():
-            return jsonify({'error': 'Quiz not found or unauthorized'}), 404
-        
-        # First delete attempts explicitly to avoid FK issues on older schemas
-        cur.execute("DELETE FROM quiz_attempts WHERE quiz_id = %s", (quiz_id,))
-        # Delete quiz (questions are removed via ON DELETE CASCADE on questions.quiz_id)
-        cur.execute("DELETE FROM quizzes WHERE id = %s", (quiz_id,))
-        conn.commit()
+    with get_db_connection() as conn, conn.cursor() as cur:
+        try:
+            # Only this admin's quiz; questions, attempts and sessions go with
+            # it through ON DELETE CASCADE
+            mutations.delete_quiz(cur, quiz_id, session['user_id'])
+            conn.commit()
+            quiz_cache.invalidate(quiz_id)
         
-        return jsonify({'message': 'Quiz deleted successfully'}), 200
+            return jsonify({'message': 'Quiz deleted successfully'}), 200
         
-    except Exception as e:
-        conn.rollback()
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
+        except mutations.Rejected as e:
+            conn.rollback()
+            return jsonify(e.body()), e.status
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'error': str(e)}), 500
 
-@app.route('/admin/quiz/delete/<int:quiz_id>', methods=['POST'])
+@routes.route('/admin/quiz/delete/<int:quiz_id>', methods=['POST'])
 def delete_quiz_post(quiz_id):
     # POST fallback for environments that block DELETE
     return delete_quiz(quiz_id)
 
-@app.route('/admin/quiz/edit/<int:quiz_id>', methods=['POST'])
+@routes.route('/admin/quiz/edit/<int:quiz_id>', methods=['POST'])
 def edit_quiz(quiz_id):
     if 'user_id' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -604,53 +1117,48 @@ def edit_quiz(quiz_id):
     description = data.get('description')
     passing_score = data.get('passing_score')
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
-        # Check if quiz exists and belongs to this admin
-        cur.execute("SELECT id FROM quizzes WHERE id = %s AND created_by = %s", (quiz_id, session['user_id']))
-        if not cur.fetchone():
-            return jsonify({'error': 'Quiz not found or unauthorized'}), 404
-
-        cur.execute(
-            "UPDATE quizzes SET title = %s, description = %s, passing_score = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
-            (title, description, passing_score, quiz_id)
-        )
-        conn.commit()
-        return jsonify({'message': 'Quiz updated successfully'}), 200
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        try:
+            # Applies only to this admin's quiz, and only at the version the
+            # client loaded when it sends expected_updated_at
+            row = mutations.update_quiz(cur, quiz_id, session['user_id'], title, description, passing_score,
+                                        mutations.expected_version(data))
+            conn.commit()
+            quiz_cache.invalidate(quiz_id)
+            return jsonify({'message': 'Quiz updated successfully', 'updated_at': mutations.version_of(row)}), 200
         
-    except Exception as e:
-        conn.rollback()
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
+        except mutations.Rejected as e:
+            conn.rollback()
+            return jsonify(e.body()), e.status
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'error': str(e)}), 500
 
-@app.route('/admin/quiz/get/<int:quiz_id>', methods=['GET'])
+@routes.route('/admin/quiz/get/<int:quiz_id>', methods=['GET'])
+@read_only
 def get_quiz(quiz_id):
     if 'user_id' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
     
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    
-    try:
-        cur.execute("SELECT id, title, description, passing_score FROM quizzes WHERE id = %s AND created_by = %s", (quiz_id, session['user_id']))
-        quiz = cur.fetchone()
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        try:
+            cur.execute("SELECT id, title, description, passing_score, updated_at FROM quizzes WHERE id = %s AND created_by = %s", (quiz_id, session['user_id']))
+            quiz = cur.fetchone()
         
-        if quiz:
-            return jsonify(dict(quiz)), 200
-        else:
-            return jsonify({'error': 'Quiz not found or unauthorized'}), 404
+            if quiz:
+                etag = etag_for('quiz', quiz_id, quiz['updated_at'])
+                if is_fresh(request, etag):
+                    return not_modified(etag)
+                quiz = dict(quiz)
+                quiz['updated_at'] = mutations.version_of(quiz)
+                return cache_privately(jsonify(quiz), etag), 200
+            else:
+                return jsonify({'error': 'Quiz not found or unauthorized'}), 404
             
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
 
-@app.route('/admin/user/delete/<int:user_id>', methods=['DELETE'])
+@routes.route('/admin/user/delete/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     if 'user_id' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -659,36 +1167,27 @@ def delete_user(user_id):
     if user_id == session.get('user_id'):
         return jsonify({'error': 'Cannot delete your own account'}), 400
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
-        # Check if user exists
-        cur.execute("SELECT id FROM users WHERE id = %s", (user_id,))
-        if not cur.fetchone():
-            return jsonify({'error': 'User not found'}), 404
-
-        # Delete attempts explicitly first to avoid FK issues on older schemas
-        cur.execute("DELETE FROM quiz_attempts WHERE user_id = %s", (user_id,))
-        # Delete user (cascade will handle related data on modern schemas)
-        cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
-        conn.commit()
+    with get_db_connection() as conn, conn.cursor() as cur:
+        try:
+            # Attempts and sessions go with the user through ON DELETE CASCADE
+            mutations.delete_user(cur, user_id)
+            conn.commit()
         
-        return jsonify({'message': 'User deleted successfully'}), 200
+            return jsonify({'message': 'User deleted successfully'}), 200
         
-    except Exception as e:
-        conn.rollback()
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
+        except mutations.Rejected as e:
+            conn.rollback()
+            return jsonify(e.body()), e.status
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'error': str(e)}), 500
 
-@app.route('/admin/user/delete/<int:user_id>', methods=['POST'])
+@routes.route('/admin/user/delete/<int:user_id>', methods=['POST'])
 def delete_user_post(user_id):
     # POST fallback for environments that block DELETE
     return delete_user(user_id)
 
-@app.route('/admin/user/edit/<int:user_id>', methods=['POST'])
+@routes.route('/admin/user/edit/<int:user_id>', methods=['POST'])
 def edit_user(user_id):
     if 'user_id' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -698,177 +1197,337 @@ def edit_user(user_id):
     email = data.get('email')
     role = data.get('role')
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
-        # Check if user exists
-        cur.execute("SELECT id FROM users WHERE id = %s", (user_id,))
-        if not cur.fetchone():
-            return jsonify({'error': 'User not found'}), 404
-
-        cur.execute(
-            "UPDATE users SET username = %s, email = %s, role = %s WHERE id = %s",
-            (username, email, role, user_id)
-        )
-        conn.commit()
-        return jsonify({'message': 'User updated successfully'}), 200
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        try:
+            row = mutations.update_user(cur, user_id, username, email, role, mutations.expected_version(data))
+            conn.commit()
+            return jsonify({'message': 'User updated successfully', 'updated_at': mutations.version_of(row)}), 200
         
-    except Exception as e:
-        conn.rollback()
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
+        except mutations.Rejected as e:
+            conn.rollback()
+            return jsonify(e.body()), e.status
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'error': str(e)}), 500
 
-@app.route('/admin/user/get/<int:user_id>', methods=['GET'])
+@routes.route('/admin/user/get/<int:user_id>', methods=['GET'])
+@read_only
 def get_user(user_id):
     if 'user_id' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
     
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    
-    try:
-        cur.execute("SELECT id, username, email, role FROM users WHERE id = %s", (user_id,))
-        user = cur.fetchone()
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        try:
+            cur.execute("SELECT id, username, email, role, updated_at FROM users WHERE id = %s", (user_id,))
+            user = cur.fetchone()
         
-        if user:
-            return jsonify(dict(user)), 200
-        else:
-            return jsonify({'error': 'User not found'}), 404
+            if user:
+                etag = etag_for('user', user_id, user['updated_at'])
+                if is_fresh(request, etag):
+                    return not_modified(etag)
+                user = dict(user)
+                user['updated_at'] = mutations.version_of(user)
+                return cache_privately(jsonify(user), etag), 200
+            else:
+                return jsonify({'error': 'User not found'}), 404
             
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+def batch_response(apply, applied_status, on_commit=None):
+    """Runs one batch mutation in a single transaction and answers with its
+    per-item results; ``on_commit`` gets the ids that were applied"""
+    with get_db_connection() as conn, conn.cursor() as cur:
+        try:
+            outcome = apply(cur, request.get_json(silent=True))
+            conn.commit()
+        except mutations.Rejected as e:
+            conn.rollback()
+            return jsonify(e.body()), e.status
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'error': str(e)}), 500
+    if on_commit:
+        on_commit([r['id'] for r in outcome['results'] if r['status'] == applied_status])
+    return jsonify(outcome), 200
+
+def invalidate_quizzes(quiz_ids):
+    for quiz_id in quiz_ids:
+        quiz_cache.invalidate(quiz_id)
+
+@routes.route('/admin/users/delete', methods=['POST'])
+def delete_users():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    # {"ids": [...]}: one DELETE for the whole set; self and quiz owners are
+    # reported per item rather than failing the batch
+    return batch_response(lambda cur, data: mutations.delete_users(
+        cur, mutations.batch_ids(data, current_app.config['BATCH_MAX_ITEMS']), session['user_id']), 'deleted')
+
+@routes.route('/admin/users/edit', methods=['POST'])
+def edit_users():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    # {"items": [{"id", "username"?, "email"?, "role"?, "expected_updated_at"?}]}
+    return batch_response(lambda cur, data: mutations.update_users(
+        cur, mutations.batch_items(data, current_app.config['BATCH_MAX_ITEMS']), session['user_id']), 'updated')
+
+@routes.route('/admin/quizzes/delete', methods=['POST'])
+def delete_quizzes():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    return batch_response(lambda cur, data: mutations.delete_quizzes(
+        cur, mutations.batch_ids(data, current_app.config['BATCH_MAX_ITEMS']), session['user_id']), 'deleted', invalidate_quizzes)
+
+@routes.route('/admin/quizzes/edit', methods=['POST'])
+def edit_quizzes():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    # {"items": [{"id", "title"?, "description"?, "passing_score"?, "expected_updated_at"?}]}
+    return batch_response(lambda cur, data: mutations.update_quizzes(
+        cur, mutations.batch_items(data, current_app.config['BATCH_MAX_ITEMS']), session['user_id']), 'updated', invalidate_quizzes)
+
+@routes.route('/admin/users', methods=['GET'])
+@read_only
+def list_users():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    return page_response(list_users_page)
+
+@routes.route('/admin/quizzes', methods=['GET'])
+@read_only
+def list_admin_quizzes():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    return page_response(list_quizzes_page, session['user_id'])
+
+@routes.route('/quizzes', methods=['GET'])
+@read_only
+def list_quizzes():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return page_response(list_quizzes_page)
+
+# Ranked full-text search (search.py): ?q=<text>, paged like the listings
+def search_page(cur, *args, **kwargs):
+    return search.search_page(cur, *args, max_matches=current_app.config['SEARCH_MAX_MATCHES'], **kwargs)
+
+@routes.route('/quizzes/search', methods=['GET'])
+@read_only
+def search_quizzes():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return page_response(search_page, 'quizzes', request.args.get('q', ''))
+
+@routes.route('/admin/quizzes/search', methods=['GET'])
+@read_only
+def search_admin_quizzes():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    return page_response(search_page, 'quizzes', request.args.get('q', ''),
+                         "z.created_by = %s", (session['user_id'],))
+
+@routes.route('/admin/questions/search', methods=['GET'])
+@read_only
+def search_admin_questions():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    return page_response(search_page, 'questions', request.args.get('q', ''),
+                         "z.created_by = %s", (session['user_id'],))
+
+@routes.route('/student/attempts', methods=['GET'])
+@read_only
+def list_student_attempts():
+    if 'user_id' not in session or session.get('role') != 'student':
+        return jsonify({'error': 'Unauthorized'}), 403
+    return page_response(list_user_attempts_page, session['user_id'])
+
+@routes.route('/quiz/<int:quiz_id>/attempts', methods=['GET'])
+@read_only
+def list_quiz_attempts(quiz_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return page_response(list_quiz_attempts_page, quiz_id)
+
+@routes.route('/quiz/<int:quiz_id>/leaderboard', methods=['GET'])
+@read_only
+def quiz_leaderboard(quiz_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    limit = min(max(request.args.get('limit', current_app.config['LEADERBOARD_SIZE'], type=int), 1), 100)
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM quizzes WHERE id = %s", (quiz_id,))
+        if cur.fetchone() is None:
+            return jsonify({'error': 'Quiz not found'}), 404
+        # Top students by best score, the caller's rank and percentile, and
+        # the distribution of best scores, from the trigger-maintained tables
+        board = leaderboard.quiz_leaderboard(cur, quiz_id, session['user_id'], limit)
+    return jsonify(board), 200
+
+@routes.route('/admin/db/pool', methods=['GET'])
+def db_pool_stats():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    # Per-process figures: each gunicorn worker owns its own pool
+    stats = get_pool().stats()
+    stats['pid'] = os.getpid()
+    if replicas:
+        stats.update(replicas.stats())
+    return jsonify(stats), 200
+
+@routes.route('/admin/db/queries', methods=['GET'])
+def db_query_stats():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    # Hottest normalised statements in this process, by total time or ?sort=calls
+    sort = request.args.get('sort', 'seconds')
+    if sort not in ('seconds', 'calls', 'rows', 'max_seconds'):
+        return jsonify({'error': 'Invalid sort'}), 400
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    return jsonify({'statements': instrumentation.metrics.top_statements(limit, sort), 'pid': os.getpid()}), 200
+
+@routes.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    pool = get_pool().stats()
+    gauges = {
+        'quiz_db_pool_size': ('Open pooled connections', pool['size']),
+        'quiz_db_pool_in_use': ('Pooled connections checked out', pool['in_use']),
+    }
+    if replicas:
+        now = time.monotonic()
+        gauges['quiz_db_replicas_usable'] = ('Read replicas currently taking reads',
+                                             sum(r.usable(now) for r in replicas.replicas))
+    return Response(instrumentation.metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@routes.route('/admin/cache/quizzes', methods=['GET'])
+def quiz_cache_stats():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    stats = quiz_cache.stats()
+    stats['pid'] = os.getpid()
+    return jsonify(stats), 200
+
+@routes.route('/admin/cache/item-analysis', methods=['GET'])
+def item_analysis_cache_stats():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
 
-@app.route('/student/dashboard')
+    stats = item_analysis_cache.stats()
+    stats['pid'] = os.getpid()
+    return jsonify(stats), 200
+
+@routes.route('/admin/passwords/hasher', methods=['GET'])
+def password_hasher_stats():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    stats = get_hasher().stats()
+    stats['pid'] = os.getpid()
+    return jsonify(stats), 200
+
+@routes.route('/student/dashboard')
+@read_only
 def student_dashboard():
     if 'user_id' not in session or session['role'] != 'student':
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    
-    # Get all quizzes
-    cur.execute("SELECT * FROM quizzes ORDER BY created_at DESC")
-    quizzes = cur.fetchall()
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        # First page of quizzes and of the user's attempts
+        quizzes, quizzes_cursor = list_quizzes_page(cur)
+        attempts, attempts_cursor = list_user_attempts_page(cur, session['user_id'])
     
-    # Get user's attempts
-    cur.execute("""
-        SELECT q.title, qa.score, qa.passed, qa.attempted_at 
-        FROM quiz_attempts qa 
-        JOIN quizzes q ON qa.quiz_id = q.id 
-        WHERE qa.user_id = %s 
-        ORDER BY qa.attempted_at DESC
-    """, (session['user_id'],))
-    attempts = cur.fetchall()
-    
-    # Get statistics
-    cur.execute("SELECT COUNT(*) FROM quiz_attempts WHERE user_id = %s", (session['user_id'],))
-    total_attempts = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM quiz_attempts WHERE user_id = %s AND passed = true", (session['user_id'],))
-    passed_attempts = cur.fetchone()[0]
-    
-    cur.close()
-    conn.close()
+        # Statistics rollup maintained by triggers (student_stats.py)
+        cur.execute(student_stats.STATS_SQL, (session['user_id'],))
+        stats = student_stats.summary(cur.fetchone())
     
     return render_template('student_dashboard.html', 
                          quizzes=quizzes, 
                          attempts=attempts,
-                         total_attempts=total_attempts,
-                         passed_attempts=passed_attempts)
+                         quizzes_cursor=quizzes_cursor,
+                         attempts_cursor=attempts_cursor,
+                         stats=stats)
 
-@app.route('/quiz/<int:quiz_id>/attempt', methods=['GET', 'POST'])
+@routes.route('/quiz/<int:quiz_id>/attempt', methods=['GET', 'POST'])
+@read_only
 def attempt_quiz(quiz_id):
     if 'user_id' not in session or session['role'] != 'student':
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    
-    if request.method == 'POST':
-        # Calculate score
-        score = 0
-        total_points = 0
-        
-        cur.execute("SELECT * FROM questions WHERE quiz_id = %s", (quiz_id,))
-        questions = cur.fetchall()
-        
-        user_answers = []
-        missing_answer = False
-        for question in questions:
-            selected_answer = request.form.get(f'question_{question["id"]}')
-            if selected_answer is None or str(selected_answer).strip() == "":
-                missing_answer = True
-            is_correct = selected_answer == question['correct_answer']
-            
-            if is_correct:
-                score += question['points']
-            
-            total_points += question['points']
-            
-            user_answers.append({
-                'question_id': question['id'],
-                'selected_answer': selected_answer,
-                'is_correct': is_correct
-            })
-
-        # Deny submission if any question is unanswered
-        if missing_answer:
+    # This month's attempts need a partition (partitions.py); checked once per
+    # process and month, before the request borrows its connection
+    partitions.ensure_current(functools.partial(get_db_connection, read_only=False))
+
+    # The definition may come from a replica; the attempt session is always
+    # read and written on the primary
+    definition = get_replica_quiz_definition(quiz_id)
+    with get_db_connection(read_only=False) as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        quiz, questions = definition or get_quiz_definition(cur, quiz_id)
+        if quiz is None:
+            flash('Quiz not found.', 'error')
+            return redirect(url_for('student_dashboard'))
+
+        if request.method == 'GET':
+            attempt_session = open_attempt_session(cur, session['user_id'], quiz, questions)
+            remaining = attempt_session['remaining_seconds']
+            if remaining is None or remaining > 0:
+                conn.commit()
+                questions = sampling.attempt_questions(question_pools, quiz, questions, attempt_session['seed'],
+                                                       attempt_session['question_ids'])
+                return render_template('attempt_quiz.html', quiz=quiz, questions=questions,
+                                       saved_answers=attempt_session['answers'], remaining_seconds=remaining)
+            # Time ran out while the student was away: seal what was saved
+            delta = {}
+        else:
+            # The final form is one last delta on top of the autosaved answers
+            delta = form_answers(request.form)
+
+        attempt_session, result = seal_attempt_session(cur, session['user_id'], quiz, questions, delta)
+        if attempt_session is None:
+            conn.rollback()
+            flash('This attempt has already been submitted.', 'error')
+            return redirect(url_for('attempt_quiz', quiz_id=quiz_id))
+
+        # Deny submission if any question is unanswered (until time is up)
+        if result['missing'] and not attempt_session['expired']:
+            conn.rollback()
+            cur.execute(AUTOSAVE_SQL, (psycopg2.extras.Json(delta), session['user_id'], quiz_id, current_app.config['ATTEMPT_GRACE_SECONDS']))
+            conn.commit()
             flash('Please answer all questions before submitting the quiz.', 'error')
-            # Re-render attempt page
-            cur.execute("SELECT * FROM quizzes WHERE id = %s", (quiz_id,))
-            quiz = cur.fetchone()
-            cur.execute("SELECT * FROM questions WHERE quiz_id = %s", (quiz_id,))
-            questions = cur.fetchall()
-            cur.close()
-            conn.close()
-            return render_template('attempt_quiz.html', quiz=quiz, questions=questions)
-
-        # Calculate percentage
-        percentage = (score / total_points) * 100 if total_points > 0 else 0
-        
-        # Check if passed
-        cur.execute("SELECT passing_score FROM quizzes WHERE id = %s", (quiz_id,))
-        passing_score = cur.fetchone()['passing_score']
-        passed = percentage >= passing_score
-        
-        # Save attempt
-        cur.execute(
-            "INSERT INTO quiz_attempts (user_id, quiz_id, score, passed) VALUES (%s, %s, %s, %s) RETURNING id",
-            (session['user_id'], quiz_id, percentage, passed)
-        )
-        attempt_id = cur.fetchone()[0]
-        
-        # Save answers
-        for answer in user_answers:
-            cur.execute(
-                "INSERT INTO user_answers (attempt_id, question_id, selected_answer, is_correct) VALUES (%s, %s, %s, %s)",
-                (attempt_id, answer['question_id'], answer['selected_answer'], answer['is_correct'])
-            )
-        
+            return redirect(url_for('attempt_quiz', quiz_id=quiz_id))
+
         conn.commit()
-        cur.close()
-        conn.close()
-        
-        return render_template('quiz_result.html', score=percentage, passed=passed, passing_score=passing_score)
-    
-    # GET request - show quiz
-    cur.execute("SELECT * FROM quizzes WHERE id = %s", (quiz_id,))
-    quiz = cur.fetchone()
-    
-    cur.execute("SELECT * FROM questions WHERE quiz_id = %s", (quiz_id,))
-    questions = cur.fetchall()
-    
-    cur.close()
-    conn.close()
-    
-    return render_template('attempt_quiz.html', quiz=quiz, questions=questions)
 
+    return render_template('quiz_result.html', score=result['score'], passed=result['passed'], passing_score=quiz['passing_score'])
+
+# Answer deltas from the attempt page, debounced and batched client-side
+@routes.route('/quiz/<int:quiz_id>/attempt/autosave', methods=['POST'])
+def autosave_attempt(quiz_id):
+    if 'user_id' not in session or session.get('role') != 'student':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    data = request.get_json(force=True, silent=True) or {}
+    delta = clean_answers(data.get('answers'))
+    if delta is None:
+        return jsonify({'error': 'Invalid answers'}), 400
+
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        cur.execute(AUTOSAVE_SQL, (psycopg2.extras.Json(delta), session['user_id'], quiz_id, current_app.config['ATTEMPT_GRACE_SECONDS']))
+        row = cur.fetchone()
+        conn.commit()
+
+    if row is None:
+        return jsonify({'error': 'Attempt is closed'}), 409
+    return jsonify({'saved': len(delta), 'remaining_seconds': row['remaining_seconds']}), 200
+
+# Development server; production runs wsgi:app under gunicorn (see wsgi.py)
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))  # Render sets $PORT
-    app.run(host="0.0.0.0", port=port, debug=True)
+    create_app(os.getenv('APP_CONFIG', 'development')).run(host="0.0.0.0", port=port, debug=True)
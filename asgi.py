@@ -0,0 +1,422 @@
+# asgi.py (Async serving mode for the hot student endpoints)
+"""
+ASGI entry point: the student dashboard, quiz view and quiz attempt pages run
+on Quart with an asyncpg pool; every other route falls through to the sync
+Flask app in a thread. Run it under an ASGI server, for example
+
+    hypercorn asgi:application --workers 2 --bind 0.0.0.0:5000
+
+While students read questions a request costs a coroutine, not a worker thread
+holding a database connection. Both modes share the schema (migrations.py),
+the SQL statements and grading (grading.py), and the Flask session cookie, so
+the two can serve the same users side by side.
+"""
+import asyncio
+import functools
+import json
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+
+import asyncpg
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from quart import Quart, Response, flash, g, make_response, redirect, render_template, request, session, url_for
+from quart.wrappers.response import DataBody
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+
+import app as sync_app
+import assets
+from config import load_config
+import instrumentation
+from db import REPLICA_LAG_SQL
+from grading import grade_submission, clean_answers
+from pagination import page_from_rows, page_query
+from quiz_cache import QuizCache
+import partitions
+import sampling
+import student_stats
+
+# One config object ($APP_CONFIG) for both apps: same session secret, page
+# sizes and grace period whichever mode serves a request
+config = load_config()
+
+quart_app = Quart(__name__, template_folder='templates', static_folder='static')
+quart_app.config.from_object(config)
+# Same hashed static URLs as the sync app; the files themselves are served by
+# Flask (see _handled_async)
+quart_app.url_defaults(assets.resolve_static)
+quart_app.jinja_env.globals['has_asset'] = assets.has_asset
+
+# Everything else is served by this sync Flask app (see application below).
+# Replica health is tracked by its router, which both apps share.
+flask_app = sync_app.create_app(config)
+replicas = sync_app.app_object('replicas', flask_app)
+
+# Per-process caches, validated against quizzes.updated_at exactly like the sync ones
+quiz_cache = QuizCache(max_entries=quart_app.config['QUIZ_CACHE_SIZE'])
+question_pools = QuizCache(max_entries=quart_app.config['QUIZ_CACHE_SIZE'])
+
+_PLACEHOLDER = re.compile(r'%s')
+
+
+def to_asyncpg(sql, params=()):
+    """Rewrite a %s-style statement (as used with psycopg2) into $n form"""
+    counter = iter(range(1, len(params) + 1))
+    sql = _PLACEHOLDER.sub(lambda m: f'${next(counter)}', sql).replace('%%', '%')
+    return sql, list(params)
+
+
+async def _init_connection(conn):
+    for type_name in ('json', 'jsonb'):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+
+@quart_app.before_serving
+async def open_pool():
+    quart_app.db_pool = await asyncpg.create_pool(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'quiz_db'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'password'),
+        port=int(os.getenv('DB_PORT', '5432')),
+        min_size=int(os.getenv('DB_ASYNC_POOL_MIN', '1')),
+        max_size=int(os.getenv('DB_ASYNC_POOL_MAX', '20')),
+        init=_init_connection,
+    )
+    # Replica pools connect on first use, so a replica that is down does not
+    # stop the server from starting. Health is tracked by ``replicas``,
+    # shared with the routes served by Flask.
+    quart_app.replica_pools = {}
+    for replica in replicas.replicas:
+        quart_app.replica_pools[replica] = await asyncpg.create_pool(
+            dsn=replica.dsn,
+            min_size=0,
+            max_size=int(os.getenv('DB_ASYNC_POOL_MAX', '20')),
+            timeout=replica.connect_timeout,
+            init=_init_connection,
+        )
+
+
+@quart_app.after_serving
+async def close_pool():
+    await quart_app.db_pool.close()
+    for pool in quart_app.replica_pools.values():
+        await pool.close()
+
+
+# A replica that fails like this is treated as down
+REPLICA_ERRORS = (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError,
+                  asyncpg.InternalClientError)
+
+
+async def replica_failed(replica, error):
+    replica.record_failure(error)
+    # Connections opened before an outage are no use after it
+    await quart_app.replica_pools[replica].expire_connections()
+
+
+async def probe_replica(replica):
+    try:
+        async with quart_app.replica_pools[replica].acquire(timeout=replica.connect_timeout) as conn:
+            replica.record_lag(await conn.fetchval(REPLICA_LAG_SQL))
+    except REPLICA_ERRORS as e:
+        await replica_failed(replica, e)
+
+
+def replica_reads():
+    """Same rule as sync_app.read_only: reads only, and not just after a write"""
+    return request.method in ('GET', 'HEAD') and not sync_app.reads_pinned(session)
+
+
+@asynccontextmanager
+async def acquire(read_only=False):
+    started = time.perf_counter()
+    timeout = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+    pool, conn = quart_app.db_pool, None
+    if read_only and replicas:
+        for replica in replicas.due():
+            await probe_replica(replica)
+        while conn is None:
+            replica = replicas.choose()
+            if replica is None:
+                break
+            try:
+                conn = await quart_app.replica_pools[replica].acquire(timeout=timeout)
+                pool = quart_app.replica_pools[replica]
+            except REPLICA_ERRORS as e:
+                await replica_failed(replica, e)
+    if conn is None:
+        conn = await pool.acquire(timeout=timeout)
+    instrumentation.record_acquire(time.perf_counter() - started)
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+# Same per-route figures as the sync app; /metrics (served by Flask) reports both
+@quart_app.before_request
+async def start_request_stats():
+    g.request_started = time.perf_counter()
+    instrumentation.begin_request(request.endpoint or 'unmatched')
+
+
+@quart_app.after_request
+async def pin_after_write(response):
+    if replicas and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400 and 'user_id' in session:
+        sync_app.pin_reads_to_primary(session, quart_app.config['REPLICA_STICKY_SECONDS'])
+    return response
+
+
+@quart_app.after_request
+async def record_request_stats(response):
+    stats = instrumentation.current_request()
+    if stats is not None:
+        instrumentation.metrics.record_request(stats, request.method, response.status_code,
+                                               time.perf_counter() - g.request_started)
+    return response
+
+
+# Mirrors sync_app.compress_response for the pages rendered here
+@quart_app.after_request
+async def compress_response(response):
+    min_size = quart_app.config['COMPRESS_MIN_SIZE']
+    if min_size < 0 or not isinstance(response.response, DataBody) or not assets.should_compress(response):
+        return response
+    data = await response.get_data()
+    if len(data) < min_size:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = assets.choose_encoding(request.accept_encodings)
+    if encoding:
+        response.set_data(assets.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+@quart_app.teardown_request
+async def end_request_stats(exc):
+    instrumentation.end_request()
+
+
+@quart_app.errorhandler(asyncio.TimeoutError)
+async def handle_pool_timeout(e):
+    return {'error': 'Server busy, please retry shortly'}, 503, {'Retry-After': '1'}
+
+
+async def fetch(conn, sql, *params):
+    sql, args = to_asyncpg(sql, params)
+    started = time.perf_counter()
+    rows = []
+    try:
+        rows = await conn.fetch(sql, *args)
+        return rows
+    finally:
+        instrumentation.record_query(sql, started, len(rows))
+
+
+async def fetchrow(conn, sql, *params):
+    sql, args = to_asyncpg(sql, params)
+    started = time.perf_counter()
+    row = None
+    try:
+        row = await conn.fetchrow(sql, *args)
+        return row
+    finally:
+        instrumentation.record_query(sql, started, int(row is not None))
+
+
+async def fetch_page(conn, select_sql, where_sql, params, sort, cursor=None, limit=None):
+    limit = limit or quart_app.config['PAGE_SIZE']
+    sql, params = page_query(select_sql, where_sql, params, sort, cursor, limit)
+    rows = [dict(r) for r in await fetch(conn, sql, *params)]
+    return page_from_rows(rows, limit, sort[2], sort[3])
+
+
+async def get_quiz_definition(conn, quiz_id):
+    row = await fetchrow(conn, sync_app.QUIZ_VERSION_SQL, quiz_id)
+    if row is None:
+        quiz_cache.invalidate(quiz_id)
+        return None, []
+    cached = quiz_cache.get(quiz_id, row[0])
+    if cached is not None:
+        return cached
+
+    row = await fetchrow(conn, sync_app.QUIZ_DEFINITION_SQL, quiz_id)
+    if row is None:
+        return None, []
+    quiz = dict(row)
+    questions = quiz.pop('questions')
+    quiz_cache.put(quiz_id, quiz['updated_at'], (quiz, questions))
+    return quiz, questions
+
+
+async def get_replica_quiz_definition(quiz_id):
+    """get_quiz_definition on a replica when the request may read from one,
+    else None; like sync_app.get_replica_quiz_definition, call it before
+    acquiring the request's primary connection, not while holding it"""
+    if not (replica_reads() and replicas):
+        return None
+    async with acquire(read_only=True) as conn:
+        return await get_quiz_definition(conn, quiz_id)
+
+
+@quart_app.route('/student/dashboard')
+async def student_dashboard():
+    if 'user_id' not in session or session['role'] != 'student':
+        return redirect('/login')
+
+    async with acquire(read_only=replica_reads()) as conn:
+        quizzes, quizzes_cursor = await fetch_page(conn, *sync_app.quizzes_page_args())
+        attempts, attempts_cursor = await fetch_page(conn, *sync_app.user_attempts_page_args(session['user_id']))
+        stats = student_stats.summary(await fetchrow(conn, student_stats.STATS_SQL, session['user_id']))
+
+    return await render_template('student_dashboard.html',
+                                 quizzes=quizzes,
+                                 attempts=attempts,
+                                 quizzes_cursor=quizzes_cursor,
+                                 attempts_cursor=attempts_cursor,
+                                 stats=stats)
+
+
+@quart_app.route('/quiz/<int:quiz_id>')
+async def view_quiz(quiz_id):
+    if 'user_id' not in session:
+        return redirect('/login')
+
+    async with acquire(read_only=replica_reads()) as conn:
+        # Conditional GET, with the same ETags as the sync app
+        etag = None
+        version = await fetchrow(conn, sync_app.QUIZ_PAGE_VERSION_SQL, quiz_id)
+        if version is not None:
+            etag = sync_app.quiz_page_etag(session, quiz_id, tuple(version))
+            if sync_app.is_fresh(request, etag):
+                return sync_app.cache_privately(Response('', status=304), etag)
+
+        quiz, questions = await get_quiz_definition(conn, quiz_id)
+        if quiz is None:
+            await flash('Quiz not found.', 'error')
+            return redirect('/student/dashboard' if session['role'] == 'student' else '/admin/dashboard')
+
+        attempts, attempts_cursor = await fetch_page(conn, *sync_app.quiz_attempts_page_args(quiz_id))
+
+    response = await make_response(await render_template('view_quiz.html', quiz=quiz, questions=questions,
+                                                          attempts=attempts, attempts_cursor=attempts_cursor))
+    return sync_app.cache_privately(response, etag) if etag else response
+
+
+async def seal_attempt_session(conn, user_id, quiz, questions, delta):
+    attempt_session = await fetchrow(conn, sync_app.SEAL_SESSION_SQL,
+                                     quart_app.config['ATTEMPT_GRACE_SECONDS'], delta, user_id, quiz['id'])
+    if attempt_session is None:
+        return None, None
+    questions = sampling.attempt_questions(question_pools, quiz, questions, attempt_session['seed'], attempt_session['question_ids'])
+    answers = attempt_session['answers']
+    result = grade_submission(questions, lambda question_id: answers.get(str(question_id)), quiz['passing_score'])
+    if result['missing'] and not attempt_session['expired']:
+        return attempt_session, result
+    attempt = await fetchrow(conn, sync_app.SAVE_ATTEMPT_SQL, *sync_app.save_attempt_params(user_id, quiz['id'], result))
+    await fetchrow(conn, sync_app.LINK_SESSION_SQL, attempt[0], attempt_session['id'])
+    return attempt_session, result
+
+
+@quart_app.route('/quiz/<int:quiz_id>/attempt', methods=['GET', 'POST'])
+async def attempt_quiz(quiz_id):
+    if 'user_id' not in session or session['role'] != 'student':
+        return redirect('/login')
+
+    # This month's attempts need a partition (partitions.py); the check runs
+    # once per process and month, through the sync pool on a thread
+    if partitions.needs_check():
+        await asyncio.to_thread(partitions.ensure_current,
+                                functools.partial(sync_app.get_db_connection, read_only=False))
+
+    # The definition may come from a replica; the attempt session is always
+    # read and written on the primary
+    definition = await get_replica_quiz_definition(quiz_id)
+    async with acquire() as conn:
+        quiz, questions = definition or await get_quiz_definition(conn, quiz_id)
+        if quiz is None:
+            await flash('Quiz not found.', 'error')
+            return redirect(url_for('student_dashboard'))
+
+        if request.method == 'GET':
+            attempt_session = await fetchrow(conn, sync_app.OPEN_SESSION_SQL,
+                                             *sync_app.open_session_params(session['user_id'], quiz, questions,
+                                                                           question_pools))
+            remaining = attempt_session['remaining_seconds']
+            if remaining is None or remaining > 0:
+                questions = sampling.attempt_questions(question_pools, quiz, questions, attempt_session['seed'],
+                                                       attempt_session['question_ids'])
+                return await render_template('attempt_quiz.html', quiz=quiz, questions=questions,
+                                             saved_answers=attempt_session['answers'], remaining_seconds=remaining)
+            # Time ran out while the student was away: seal what was saved
+            delta = {}
+        else:
+            # The final form is one last delta on top of the autosaved answers
+            delta = sync_app.form_answers(await request.form)
+
+        transaction = conn.transaction()
+        await transaction.start()
+        try:
+            attempt_session, result = await seal_attempt_session(conn, session['user_id'], quiz, questions, delta)
+            incomplete = attempt_session is not None and result['missing'] and not attempt_session['expired']
+            if attempt_session is None or incomplete:
+                await transaction.rollback()
+            else:
+                await transaction.commit()
+        except BaseException:
+            await transaction.rollback()
+            raise
+
+        if attempt_session is None:
+            await flash('This attempt has already been submitted.', 'error')
+            return redirect(url_for('attempt_quiz', quiz_id=quiz_id))
+
+        # Deny submission if any question is unanswered (until time is up)
+        if incomplete:
+            await fetchrow(conn, sync_app.AUTOSAVE_SQL, delta, session['user_id'], quiz_id, quart_app.config['ATTEMPT_GRACE_SECONDS'])
+            await flash('Please answer all questions before submitting the quiz.', 'error')
+            return redirect(url_for('attempt_quiz', quiz_id=quiz_id))
+
+    return await render_template('quiz_result.html', score=result['score'], passed=result['passed'], passing_score=quiz['passing_score'])
+
+
+@quart_app.route('/quiz/<int:quiz_id>/attempt/autosave', methods=['POST'])
+async def autosave_attempt(quiz_id):
+    if 'user_id' not in session or session.get('role') != 'student':
+        return {'error': 'Unauthorized'}, 403
+
+    data = await request.get_json(force=True, silent=True) or {}
+    delta = clean_answers(data.get('answers'))
+    if delta is None:
+        return {'error': 'Invalid answers'}, 400
+
+    async with acquire() as conn:
+        row = await fetchrow(conn, sync_app.AUTOSAVE_SQL, delta, session['user_id'], quiz_id, quart_app.config['ATTEMPT_GRACE_SECONDS'])
+
+    if row is None:
+        return {'error': 'Attempt is closed'}, 409
+    return {'saved': len(delta), 'remaining_seconds': row['remaining_seconds']}, 200
+
+
+# Everything else is served by the sync Flask app on a thread pool
+_wsgi_fallback = AsyncioWSGIMiddleware(flask_app)
+_routes = quart_app.url_map.bind('localhost')
+
+
+def _handled_async(scope):
+    # Static files go to Flask too, which serves the pre-compressed builds
+    try:
+        endpoint, _ = _routes.match(scope['path'], method=scope['method'])
+        return endpoint != 'static'
+    except (NotFound, MethodNotAllowed):
+        return False
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and not _handled_async(scope):
+        await _wsgi_fallback(scope, receive, send)
+    else:
+        await quart_app(scope, receive, send)
@@ -0,0 +1,243 @@
+# assets.py (Static asset build, fingerprinted serving and response compression)
+"""
+``python assets.py build`` copies every file under static/ into static/dist/
+with a content hash in its name (``js/pagination.js`` becomes
+``dist/js/pagination.3f2a1b9c0d.js``). Text assets also get ``.gz`` and, when
+the Brotli package is installed, ``.br`` siblings compressed at the highest
+levels, since that cost is paid once per build. The mapping goes to
+``static/dist/manifest.json``. Build before deploying; files from earlier
+builds are left in place so pages rendered by the previous release keep
+working during a rollout.
+
+If a Tailwind CLI is on the PATH (or given with ``--tailwind``), the build
+also compiles the classes the templates and scripts use into
+``css/tailwind.css``. Pages then link that stylesheet instead of loading the
+Play CDN script, which compiles styles in the browser on every page load.
+
+At runtime, with a manifest present:
+
+- ``url_for('static', filename='js/pagination.js')`` resolves to the hashed
+  file (``resolve_static``, registered as a url_defaults hook), so templates
+  keep naming the source files.
+- Hashed files are served with ``Cache-Control: public, max-age=31536000,
+  immutable``, from the pre-compressed sibling the client accepts.
+- ``version()`` changes with every build that changes an asset; ETags of
+  cached pages include it.
+
+Without a manifest (a development checkout) URLs and serving stay as they
+were. Dynamic responses are compressed on the fly by ``compress``, above a
+size threshold, with brotli when available and accepted and gzip otherwise.
+
+    python assets.py build
+    python assets.py build --tailwind ./bin/tailwindcss
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+BUILD_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# A year, the longest lifetime caches honour; hashed names never change content
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/csv', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'image/svg+xml',
+}
+# Encodings in order of preference, with the file suffix of pre-compressed copies
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# On-the-fly levels trade ratio for latency; builds use the maximum
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+TAILWIND_ASSET = 'css/tailwind.css'
+
+
+def content_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def compress(data, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    # mtime=0 keeps the output a pure function of the input
+    return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def choose_encoding(accept_encodings, available=('br', 'gzip')):
+    """The preferred encoding the client accepts, among ``available``"""
+    for encoding, _ in ENCODINGS:
+        if encoding in available and accept_encodings[encoding] and (encoding != 'br' or brotli is not None):
+            return encoding
+    return None
+
+
+def should_compress(response):
+    """Whether a response may be compressed: successful, of a compressible
+    type and not encoded already (the caller checks the body size)"""
+    return (200 <= response.status_code < 300 and response.status_code != 204
+            and response.mimetype in COMPRESSIBLE_TYPES
+            and 'Content-Encoding' not in response.headers)
+
+
+class Manifest:
+    """Source name -> hashed name, and the encodings built for each hashed file"""
+
+    def __init__(self, files=None, encodings=None, version=''):
+        self.files = files or {}
+        self.encodings = encodings or {}
+        self.version = version
+
+    @classmethod
+    def load(cls, static_dir=STATIC_DIR):
+        path = os.path.join(static_dir, BUILD_DIR, MANIFEST_NAME)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        return cls(data['files'], data['encodings'], data['version'])
+
+
+_manifest = None
+
+
+def manifest():
+    """The build manifest, read once per process"""
+    global _manifest
+    if _manifest is None:
+        _manifest = Manifest.load()
+    return _manifest
+
+
+def version():
+    return manifest().version
+
+
+def has_asset(filename):
+    """Whether the build produced ``filename`` (for optional assets such as
+    the compiled Tailwind stylesheet)"""
+    return filename in manifest().files
+
+
+def resolve_static(endpoint, values):
+    """url_defaults hook: point static URLs at the hashed build output"""
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = manifest().files.get(values['filename'], values['filename'])
+
+
+def hashed_file(filename):
+    """The pre-compressed encodings built for a static path under dist/, or
+    None for anything outside the build"""
+    if not filename.startswith(BUILD_DIR + '/'):
+        return None
+    # Files of an earlier build are still immutable, just not pre-compressed
+    return manifest().encodings.get(filename[len(BUILD_DIR) + 1:], [])
+
+
+# Build
+
+def _hashed_name(relative, data):
+    stem, ext = os.path.splitext(relative)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.partial'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _sources(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.relpath(root, static_dir) == '.':
+            dirs[:] = [d for d in dirs if d != BUILD_DIR]
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, static_dir).replace(os.sep, '/'), path
+
+
+def compile_tailwind(executable, root, output):
+    """Compile the utility classes used by templates and scripts"""
+    content = ','.join([os.path.join(root, 'templates', '**', '*.html'),
+                        os.path.join(root, 'static', 'js', '**', '*.js')])
+    subprocess.run([executable, '--content', content, '--minify', '--output', output], check=True)
+
+
+def build(static_dir=STATIC_DIR, tailwind=None):
+    """Write hashed and pre-compressed copies plus the manifest; returns it"""
+    out_dir = os.path.join(static_dir, BUILD_DIR)
+    sources = list(_sources(static_dir))
+    with tempfile.TemporaryDirectory() as tmp:
+        if tailwind:
+            compiled = os.path.join(tmp, 'tailwind.css')
+            compile_tailwind(tailwind, os.path.dirname(static_dir), compiled)
+            sources.append((TAILWIND_ASSET, compiled))
+        files, encodings = {}, {}
+        for relative, path in sources:
+            with open(path, 'rb') as f:
+                data = f.read()
+            hashed = _hashed_name(relative, data)
+            _write(os.path.join(out_dir, hashed), data)
+            files[relative] = f'{BUILD_DIR}/{hashed}'
+            encodings[hashed] = []
+            if content_type(relative) not in COMPRESSIBLE_TYPES:
+                continue
+            for encoding, suffix in ENCODINGS:
+                if encoding == 'br' and brotli is None:
+                    continue
+                packed = compress(data, encoding, level=11 if encoding == 'br' else 9)
+                if len(packed) < len(data):
+                    _write(os.path.join(out_dir, hashed + suffix), packed)
+                    encodings[hashed].append(encoding)
+    digest = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()[:12]
+    result = {'version': digest, 'files': files, 'encodings': encodings}
+    _write(os.path.join(out_dir, MANIFEST_NAME), json.dumps(result, indent=2, sort_keys=True).encode())
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    build_parser = sub.add_parser('build', help='write hashed, pre-compressed assets and the manifest')
+    build_parser.add_argument('--tailwind', default=shutil.which('tailwindcss'),
+                              help='Tailwind CLI executable (default: tailwindcss on the PATH)')
+    build_parser.add_argument('--no-tailwind', dest='tailwind', action='store_const', const=None,
+                              help='keep loading Tailwind from the CDN')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if not args.tailwind:
+        logger.info("No Tailwind CLI found; pages keep loading the Tailwind CDN script")
+    if brotli is None:
+        logger.info("Brotli is not installed; writing gzip copies only")
+    result = build(tailwind=args.tailwind)
+    for source, hashed in sorted(result['files'].items()):
+        encoded = ', '.join(result['encodings'][hashed[len(BUILD_DIR) + 1:]]) or 'uncompressed'
+        logger.info("%s -> %s (%s)", source, hashed, encoded)
+    logger.info("Manifest version %s", result['version'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Per-endpoint microbenchmarks through the Flask test client.
+
+Runs against a dataset built by benchmarks/seed.py (run it first, with the
+same BCRYPT_ROUNDS). Uses the most attempted seed quiz, its admin and the
+seed student with the most attempts, so listings, the dashboard counters and
+the CSV export see the heaviest realistic rows. Each endpoint is warmed up,
+then timed --repeat times end to end (routing, SQL, templates, the full
+response body); setup requests such as opening the attempt page before a
+submit are not timed. Attempts created by the run are deleted afterwards.
+
+    python benchmarks/bench_endpoints.py --repeat 200 --json endpoints.json
+    python benchmarks/common.py compare before.json endpoints.json
+"""
+
+import argparse
+import sys
+import time
+
+from common import summarize, write_results
+
+
+def load_context(password):
+    import psycopg2.extras
+    from app import get_db_connection
+
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        cur.execute("""
+            SELECT z.id, z.created_by, COUNT(qa.id) AS attempts
+            FROM quizzes z
+            JOIN users u ON u.id = z.created_by
+            LEFT JOIN quiz_attempts qa ON qa.quiz_id = z.id
+            WHERE u.username LIKE 'seed\\_admin\\_%'
+            GROUP BY z.id
+            ORDER BY attempts DESC, z.id
+            LIMIT 1
+        """)
+        quiz = cur.fetchone()
+        if quiz is None:
+            sys.exit('No seed data found, run benchmarks/seed.py first')
+        cur.execute("""
+            SELECT u.id, u.username
+            FROM users u
+            JOIN quiz_attempts qa ON qa.user_id = u.id
+            WHERE u.username LIKE 'seed\\_student\\_%'
+            GROUP BY u.id
+            ORDER BY COUNT(*) DESC, u.id
+            LIMIT 1
+        """)
+        student = cur.fetchone()
+        cur.execute("SELECT id FROM questions WHERE quiz_id = %s ORDER BY id", (quiz['id'],))
+        question_ids = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT LOCALTIMESTAMP")
+        started_at = cur.fetchone()[0]
+    return {
+        'quiz_id': quiz['id'],
+        'quiz_attempts': quiz['attempts'],
+        'admin_id': quiz['created_by'],
+        'student_id': student['id'],
+        'student_name': student['username'],
+        'password': password,
+        'question_ids': question_ids,
+        'started_at': started_at,
+    }
+
+
+def endpoints(ctx):
+    """(name, role, request, expected status, prepare once, before each)"""
+    quiz_id = ctx['quiz_id']
+    attempt_url = f'/quiz/{quiz_id}/attempt'
+    form = {f'question_{qid}': 'A' for qid in ctx['question_ids']}
+    delta = {'answers': {str(ctx['question_ids'][0]): 'B'}} if ctx['question_ids'] else {'answers': {}}
+    open_attempt = lambda c: c.get(attempt_url)  # noqa: E731
+    login = {'username': ctx['student_name'], 'password': ctx['password'], 'portal': 'student'}
+    return [
+        ('login', None, lambda c: c.post('/login', data=login), 302, None, None),
+        ('student_dashboard', 'student', lambda c: c.get('/student/dashboard'), 200, None, None),
+        ('student_attempts_page', 'student', lambda c: c.get('/student/attempts'), 200, None, None),
+        ('quizzes_page', 'student', lambda c: c.get('/quizzes'), 200, None, None),
+        ('search_quizzes', 'student', lambda c: c.get('/quizzes/search?q=seed+qui'), 200, None, None),
+        ('view_quiz', 'student', lambda c: c.get(f'/quiz/{quiz_id}'), 200, None, None),
+        ('attempt_page', 'student', open_attempt, 200, None, None),
+        ('autosave', 'student', lambda c: c.post(f'{attempt_url}/autosave', json=delta), 200, open_attempt, None),
+        ('submit', 'student', lambda c: c.post(attempt_url, data=form), 200, None, open_attempt),
+        ('admin_dashboard', 'admin', lambda c: c.get('/admin/dashboard'), 200, None, None),
+        ('admin_users_page', 'admin', lambda c: c.get('/admin/users'), 200, None, None),
+        ('quiz_attempts_page', 'admin', lambda c: c.get(f'/quiz/{quiz_id}/attempts'), 200, None, None),
+        ('quiz_questions', 'admin', lambda c: c.get(f'/admin/quiz/{quiz_id}/questions'), 200, None, None),
+        ('search_questions', 'admin', lambda c: c.get('/admin/questions/search?q=seed+question+1'), 200, None, None),
+        ('attempts_csv', 'admin', lambda c: c.get(f'/admin/quiz/{quiz_id}/attempts.csv'), 200, None, None),
+    ]
+
+
+def run_endpoint(client, call, expected, prepare, before, repeat, warmup):
+    if prepare:
+        prepare(client)
+    samples = []
+    unexpected = 0
+    for i in range(warmup + repeat):
+        if before:
+            before(client)
+        started = time.perf_counter()
+        response = call(client)
+        # Streamed bodies (the CSV export) are produced while being read
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        response.close()
+        if i >= warmup:
+            samples.append(elapsed)
+            unexpected += response.status_code != expected
+    result = summarize(samples)
+    result['unexpected_status'] = unexpected
+    return result
+
+
+def cleanup(ctx):
+    from app import get_db_connection
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM quiz_attempts WHERE user_id = %s AND attempted_at >= %s",
+                    (ctx['student_id'], ctx['started_at']))
+        cur.execute("DELETE FROM attempt_sessions WHERE user_id = %s AND started_at >= %s",
+                    (ctx['student_id'], ctx['started_at']))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help='comma separated endpoint names')
+    parser.add_argument('--repeat', type=int, default=100, help='timed requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=10, help='untimed requests per endpoint first')
+    parser.add_argument('--password', default='bench-password', help='the password given to seed.py')
+    parser.add_argument('--json', help='write results to this file (default: stdout)')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    app = create_app()
+    ctx = load_context(args.password)
+    selected = set(args.only.split(',')) if args.only else None
+    results = {}
+    try:
+        for name, role, call, expected, prepare, before in endpoints(ctx):
+            if selected and name not in selected:
+                continue
+            client = app.test_client()
+            if role:
+                with client.session_transaction() as sess:
+                    sess['user_id'] = ctx['admin_id'] if role == 'admin' else ctx['student_id']
+                    sess['username'] = 'bench'
+                    sess['role'] = role
+            results[name] = run_endpoint(client, call, expected, prepare, before, args.repeat, args.warmup)
+            row = results[name]
+            print(f"{name:<24} median {row['median_ms']:8.2f} ms  p95 {row['p95_ms']:8.2f} ms"
+                  f"  p99 {row['p99_ms']:8.2f} ms", file=sys.stderr)
+            if row['unexpected_status']:
+                print(f"{name}: {row['unexpected_status']} unexpected responses", file=sys.stderr)
+    finally:
+        cleanup(ctx)
+
+    config = {k: v for k, v in vars(args).items() if k not in ('json', 'password')}
+    config.update(quiz_id=ctx['quiz_id'], quiz_attempts=ctx['quiz_attempts'],
+                  questions=len(ctx['question_ids']), student_id=ctx['student_id'])
+    write_results('endpoints', config, results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark the attempt CSV export: peak RSS and time-to-first-byte.
+
+Runs against the database configured in .env (use a scratch database, the
+script creates and removes its own admin, student, quiz and attempts). Each
+mode is measured in a fresh child process so the peak RSS of one run cannot
+hide another's:
+
+  buffered   the previous implementation (fetchall + StringIO, one body)
+  cursor     server-side cursor feeding the CSV writer, streamed
+  copy       COPY ... TO STDOUT streamed straight through
+  copy+gzip  as above, gzip-compressed on the fly
+
+    python benchmarks/bench_export.py --rows 200000
+"""
+
+import argparse
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ['buffered', 'cursor', 'copy', 'copy+gzip']
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def create_fixture(num_rows):
+    from app import get_db_connection
+    from partitions import ensure_partitions
+
+    tag = uuid.uuid4().hex[:8]
+    with get_db_connection() as conn, conn.cursor() as cur:
+        # Attempts are dated back from now, one second per row
+        ensure_partitions(cur, since=datetime.now() - timedelta(seconds=num_rows))
+        cur.execute(
+            "INSERT INTO users (username, email, password, role) VALUES (%s, %s, 'x', 'admin') RETURNING id",
+            (f'bench_admin_{tag}', f'bench_admin_{tag}@example.com')
+        )
+        admin_id = cur.fetchone()[0]
+        cur.execute(
+            "INSERT INTO users (username, email, password, role) VALUES (%s, %s, 'x', 'student') RETURNING id",
+            (f'bench_student_{tag}', f'bench_student_{tag}@example.com')
+        )
+        student_id = cur.fetchone()[0]
+        cur.execute(
+            "INSERT INTO quizzes (title, description, created_by) VALUES ('bench export', 'benchmark', %s) RETURNING id",
+            (admin_id,)
+        )
+        quiz_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO quiz_attempts (user_id, quiz_id, score, passed, attempted_at)
+            SELECT %s, %s, n %% 101, n %% 101 >= 60, now() - n * interval '1 second'
+            FROM generate_series(1, %s) AS n
+        """, (student_id, quiz_id, num_rows))
+        conn.commit()
+    return admin_id, student_id, quiz_id
+
+
+def drop_fixture(admin_id, student_id, quiz_id):
+    from app import get_db_connection
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM quizzes WHERE id = %s", (quiz_id,))
+        cur.execute("DELETE FROM users WHERE id IN (%s, %s)", (admin_id, student_id))
+        conn.commit()
+
+
+def buffered_export(quiz_id):
+    """The pre-streaming implementation, kept here for comparison"""
+    import psycopg2.extras
+    from app import get_db_connection
+
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        cur.execute("""
+            SELECT u.username, u.email, qa.score, qa.passed, qa.attempted_at
+            FROM quiz_attempts qa
+            JOIN users u ON qa.user_id = u.id
+            WHERE qa.quiz_id = %s
+            ORDER BY qa.attempted_at DESC
+        """, (quiz_id,))
+        rows = cur.fetchall()
+        si = StringIO()
+        writer = csv.writer(si)
+        writer.writerow(['Username', 'Email', 'Score (%)', 'Passed', 'Attempted At'])
+        for r in rows:
+            writer.writerow([r['username'], r['email'], round(r['score'] or 0, 2), 'Yes' if r['passed'] else 'No', r['attempted_at']])
+        yield si.getvalue().encode('utf-8')
+
+
+def run_child(mode, quiz_id, admin_id):
+    """Measure one mode in this process and print a JSON result line"""
+    from app import create_app
+
+    app = create_app()
+    app.config['CSV_EXPORT_MODE'] = 'cursor' if mode == 'cursor' else 'copy'
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin_id
+        sess['role'] = 'admin'
+    headers = {'Accept-Encoding': 'gzip' if mode == 'copy+gzip' else 'identity'}
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    if mode == 'buffered':
+        body = buffered_export(quiz_id)
+    else:
+        response = client.get(f'/admin/quiz/{quiz_id}/attempts.csv', headers=headers, buffered=False)
+        assert response.status_code == 200, response.status_code
+        body = response.response
+    first_byte = None
+    total = 0
+    for chunk in body:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        total += len(chunk)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'mode': mode,
+        'ttfb_ms': round(first_byte * 1000, 2),
+        'total_ms': round(elapsed * 1000, 2),
+        'bytes': total,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'peak_rss_growth_mb': round(peak_rss_mb() - baseline, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='attempt rows to export')
+    parser.add_argument('--modes', default=','.join(MODES), help='comma separated modes to run')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--quiz', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--admin', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.quiz, args.admin)
+        return
+
+    admin_id, student_id, quiz_id = create_fixture(args.rows)
+    results = []
+    try:
+        for mode in args.modes.split(','):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', mode,
+                 '--quiz', str(quiz_id), '--admin', str(admin_id)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        drop_fixture(admin_id, student_id, quiz_id)
+
+    if args.json:
+        print(json.dumps({'rows': args.rows, 'results': results}, indent=2))
+        return
+    print(f"{args.rows} attempt rows")
+    print(f"{'mode':<12}{'ttfb ms':>10}{'total ms':>10}{'MB out':>9}{'peak RSS MB':>13}{'growth MB':>11}")
+    for r in results:
+        print(f"{r['mode']:<12}{r['ttfb_ms']:>10}{r['total_ms']:>10}{r['bytes'] / 1e6:>9.1f}"
+              f"{r['peak_rss_mb']:>13}{r['peak_rss_growth_mb']:>11}")
+
+
+if __name__ == '__main__':
+    main()
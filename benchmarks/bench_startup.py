@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import time, app creation and first-request latency.
+
+Every sample is a fresh process, started one of two ways:
+
+  cold     the process imports app.py and builds the app itself, as a
+           gunicorn worker without --preload or a new container does
+  forked   app.py is imported and the app built once, here, and each sample
+           is a forked child that only serves, as gunicorn --preload workers
+
+A sample then times its first GET /login (routing and a template) and its
+first student dashboard (a new connection pool, SQL and a template), and the
+same two requests again for the warm figures. The dashboard uses the seed
+student with the most attempts; without one only /login is timed. Runs
+against the database configured in .env.
+
+    python benchmarks/bench_startup.py --samples 20 --json startup.json
+    PRECOMPILE_TEMPLATES=false python benchmarks/bench_startup.py
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import summarize, write_results
+
+MODES = ['cold', 'forked']
+
+
+def find_student():
+    from app import get_db_connection
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT u.id FROM users u
+            JOIN quiz_attempts qa ON qa.user_id = u.id
+            WHERE u.role = 'student'
+            GROUP BY u.id
+            ORDER BY COUNT(*) DESC, u.id
+            LIMIT 1
+        """)
+        row = cur.fetchone()
+    return row[0] if row else None
+
+
+def serve(app, student_id):
+    """Time the first and second round of requests; returns durations in seconds"""
+    client = app.test_client()
+    if student_id is not None:
+        with client.session_transaction() as sess:
+            sess['user_id'] = student_id
+            sess['username'] = 'bench'
+            sess['role'] = 'student'
+    timings = {}
+    for round_name in ('first', 'warm'):
+        for name, path in (('login', '/login'), ('dashboard', '/student/dashboard')):
+            if name == 'dashboard' and student_id is None:
+                continue
+            started = time.perf_counter()
+            response = client.get(path)
+            timings[f'{name}_{round_name}'] = time.perf_counter() - started
+            assert response.status_code == 200, (path, response.status_code)
+    return timings
+
+
+def run_cold_child(student_id):
+    """Measure one cold start in this process and print a JSON result line"""
+    started = time.perf_counter()
+    import app as appmod
+    imported = time.perf_counter()
+    app = appmod.create_app()
+    created = time.perf_counter()
+    timings = {'import': imported - started, 'create_app': created - imported}
+    timings.update(serve(app, student_id))
+    print(json.dumps(timings))
+
+
+def run_cold(samples, student_id):
+    results = []
+    for _ in range(samples):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', str(student_id or 0)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def run_forked(samples, student_id):
+    import app as appmod
+
+    app = appmod.create_app()
+    results = []
+    for _ in range(samples):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            status = 1
+            try:
+                with os.fdopen(write_fd, 'w') as out:
+                    out.write(json.dumps(serve(app, student_id)))
+                status = 0
+            finally:
+                os._exit(status)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as source:
+            output = source.read()
+        _, status = os.waitpid(pid, 0)
+        if status != 0:
+            sys.exit('forked sample failed')
+        results.append(json.loads(output))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=10, help='processes started per mode')
+    parser.add_argument('--modes', default=','.join(MODES), help='comma separated modes to run')
+    parser.add_argument('--json', help='write results to this file (default: stdout)')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_cold_child(args.child or None)
+        return
+
+    # Looked up in a child so this process has not imported the app before
+    # the cold samples run
+    student_id = json.loads(subprocess.run(
+        [sys.executable, '-c', 'import json, bench_startup; print(json.dumps(bench_startup.find_student()))'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), check=True, capture_output=True, text=True
+    ).stdout.strip().splitlines()[-1])
+
+    runners = {'cold': run_cold, 'forked': run_forked}
+    results = {}
+    for mode in args.modes.split(','):
+        samples = runners[mode](args.samples, student_id)
+        results[mode] = {metric: summarize([s[metric] for s in samples]) for metric in samples[0]}
+        for metric, row in results[mode].items():
+            print(f"{mode:<8}{metric:<18} median {row['median_ms']:8.2f} ms  p95 {row['p95_ms']:8.2f} ms",
+                  file=sys.stderr)
+
+    config = {'samples': args.samples, 'student_id': student_id,
+              'precompile_templates': os.getenv('PRECOMPILE_TEMPLATES', 'true')}
+    write_results('startup', config, results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark attempt_quiz submissions: per-submission latency vs question count.
+
+Runs against the database configured in .env (use a scratch database, the
+script creates and removes its own quiz and student). For each question count
+it times the real POST /quiz/<id>/attempt through the Flask test client, then
+the database work alone, batched versus the previous row-at-a-time inserts.
+Round trips dominate once the database is across a network, so expect the gap
+to widen well beyond what a localhost run shows.
+
+    python benchmarks/bench_submission.py --sizes 10,50,100,250 --repeat 30
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2.extras  # noqa: E402
+
+from app import create_app, get_db_connection, load_quiz_with_questions, save_attempt  # noqa: E402
+from grading import grade_submission  # noqa: E402
+
+
+def create_fixture(cur, num_questions):
+    tag = uuid.uuid4().hex[:8]
+    cur.execute(
+        "INSERT INTO users (username, email, password, role) VALUES (%s, %s, 'x', 'student') RETURNING id",
+        (f'bench_{tag}', f'bench_{tag}@example.com')
+    )
+    user_id = cur.fetchone()[0]
+    cur.execute(
+        "INSERT INTO quizzes (title, description, passing_score) VALUES (%s, 'benchmark', 60) RETURNING id",
+        (f'bench {num_questions} questions',)
+    )
+    quiz_id = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO questions (quiz_id, question_text, question_type, options, correct_answer, points)
+        SELECT %s, 'Question ' || n, 'multiple_choice', '["A", "B", "C", "D"]', 'A', 1
+        FROM generate_series(1, %s) AS n
+    """, (quiz_id, num_questions))
+    cur.execute("SELECT id FROM questions WHERE quiz_id = %s ORDER BY id", (quiz_id,))
+    question_ids = [r[0] for r in cur.fetchall()]
+    return user_id, quiz_id, question_ids
+
+
+def drop_fixture(cur, user_id, quiz_id):
+    cur.execute("DELETE FROM quiz_attempts WHERE quiz_id = %s", (quiz_id,))
+    cur.execute("DELETE FROM quizzes WHERE id = %s", (quiz_id,))
+    cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+
+
+def batched_submit(cur, user_id, quiz_id, form):
+    quiz, questions = load_quiz_with_questions(cur, quiz_id)
+    result = grade_submission(questions, lambda qid: form.get(f'question_{qid}'), quiz['passing_score'])
+    save_attempt(cur, user_id, quiz_id, result)
+
+
+def legacy_submit(cur, user_id, quiz_id, form):
+    # Mirrors the original handler: two lookups plus one INSERT per answer
+    cur.execute("SELECT id, correct_answer, points FROM questions WHERE quiz_id = %s", (quiz_id,))
+    questions = cur.fetchall()
+    score = total = 0
+    answers = []
+    for qid, correct, points in questions:
+        selected = form.get(f'question_{qid}')
+        ok = selected == correct
+        score += points if ok else 0
+        total += points
+        answers.append((qid, selected, ok))
+    percentage = score / total * 100 if total else 0
+    cur.execute("SELECT passing_score FROM quizzes WHERE id = %s", (quiz_id,))
+    passed = percentage >= cur.fetchone()[0]
+    cur.execute(
+        "INSERT INTO quiz_attempts (user_id, quiz_id, score, passed) VALUES (%s, %s, %s, %s) RETURNING id, attempted_at",
+        (user_id, quiz_id, percentage, passed)
+    )
+    attempt_id, attempted_at = cur.fetchone()
+    for qid, selected, ok in answers:
+        cur.execute(
+            "INSERT INTO user_answers (attempt_id, question_id, selected_answer, is_correct, attempted_at) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (attempt_id, qid, selected, ok, attempted_at)
+        )
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    return {
+        'median_ms': statistics.median(samples) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+    }
+
+
+def run(sizes, repeat):
+    results = []
+    client = create_app().test_client()
+    for size in sizes:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            user_id, quiz_id, question_ids = create_fixture(cur, size)
+            conn.commit()
+        form = {f'question_{qid}': 'A' for qid in question_ids}
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+            sess['username'] = 'bench'
+            sess['role'] = 'student'
+
+        endpoint = []
+        for _ in range(repeat):
+            # Submitting seals the attempt session opened by the page load
+            client.get(f'/quiz/{quiz_id}/attempt')
+            started = time.perf_counter()
+            response = client.post(f'/quiz/{quiz_id}/attempt', data=form)
+            endpoint.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.status_code
+
+        timings = {'batched': [], 'row_at_a_time': []}
+        for _ in range(repeat):
+            for name, submit in (('batched', batched_submit), ('row_at_a_time', legacy_submit)):
+                with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                    started = time.perf_counter()
+                    submit(cur, user_id, quiz_id, form)
+                    conn.commit()
+                    timings[name].append(time.perf_counter() - started)
+
+        with get_db_connection() as conn, conn.cursor() as cur:
+            drop_fixture(cur, user_id, quiz_id)
+            conn.commit()
+
+        row = {
+            'questions': size,
+            'endpoint': summarize(endpoint),
+            'batched_db': summarize(timings['batched']),
+            'row_at_a_time_db': summarize(timings['row_at_a_time']),
+        }
+        results.append(row)
+        print(f"{size:>6} questions"
+              f"  endpoint {row['endpoint']['median_ms']:8.2f} ms (p95 {row['endpoint']['p95_ms']:.2f})"
+              f"  batched db {row['batched_db']['median_ms']:8.2f} ms (p95 {row['batched_db']['p95_ms']:.2f})"
+              f"  row-at-a-time db {row['row_at_a_time_db']['median_ms']:8.2f} ms (p95 {row['row_at_a_time_db']['p95_ms']:.2f})")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,50,100,250', help='comma-separated question counts')
+    parser.add_argument('--repeat', type=int, default=20, help='submissions per size')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = run([int(s) for s in args.sizes.split(',')], args.repeat)
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
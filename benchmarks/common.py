@@ -0,0 +1,176 @@
+"""
+Shared helpers for the benchmark suite: timing summaries, a minimal asyncio
+HTTP client for load scenarios, and the JSON result format.
+
+Every suite script writes the same envelope so runs can be diffed:
+
+    {"benchmark": ..., "started_at": ..., "git_commit": ..., "python": ...,
+     "dataset": {...}, "config": {...}, "results": {...}}
+
+``python benchmarks/common.py compare old.json new.json`` prints the change in
+every latency figure between two runs and exits non-zero when one regressed by
+more than ``--threshold`` percent.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'median_ms': round(statistics.median(samples) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_summary():
+    """Row counts of the tables the benchmarks exercise"""
+    from app import get_db_connection
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT (SELECT COUNT(*) FROM users),
+                   (SELECT COUNT(*) FROM quizzes),
+                   (SELECT COUNT(*) FROM questions),
+                   (SELECT COUNT(*) FROM quiz_attempts),
+                   (SELECT COUNT(*) FROM user_answers)
+        """)
+        users, quizzes, questions, attempts, answers = cur.fetchone()
+    return {'users': users, 'quizzes': quizzes, 'questions': questions,
+            'attempts': attempts, 'answers': answers}
+
+
+def write_results(benchmark, config, results, path=None, dataset=None):
+    report = {
+        'benchmark': benchmark,
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'dataset': dataset if dataset is not None else dataset_summary(),
+        'config': config,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, default=str)
+    if path and path != '-':
+        with open(path, 'w') as fh:
+            fh.write(text + '\n')
+    else:
+        print(text)
+    return report
+
+
+async def http(host, port, method, path, cookie=None, form=None, json_body=None):
+    """Minimal HTTP/1.1 client, one connection per request.
+
+    Returns (status, headers, cookie) where ``cookie`` is the Flask session
+    cookie, updated from Set-Cookie when the server sends a new one.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {host}:{port}', 'Connection: close']
+    body = b''
+    if form is not None:
+        body = urllib.parse.urlencode(form).encode()
+        lines.append('Content-Type: application/x-www-form-urlencoded')
+    elif json_body is not None:
+        body = json.dumps(json_body).encode()
+        lines.append('Content-Type: application/json')
+    if body:
+        lines.append(f'Content-Length: {len(body)}')
+    if cookie:
+        lines.append(f'Cookie: session={cookie}')
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head = response.split(b'\r\n\r\n', 1)[0].decode('latin-1').split('\r\n')
+    status = int(head[0].split()[1])
+    headers = {}
+    for line in head[1:]:
+        name, _, value = line.partition(':')
+        name, value = name.strip().lower(), value.strip()
+        headers[name] = value
+        if name == 'set-cookie' and value.startswith('session='):
+            cookie = value[len('session='):].split(';')[0]
+    return status, headers, cookie
+
+
+def wait_for_port(port, host='127.0.0.1', timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            asyncio.run(http(host, port, 'GET', '/login'))
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f'{prefix}.{key}' if prefix else key, item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+
+def compare(old_path, new_path, threshold):
+    with open(old_path) as fh:
+        old = _flatten('', json.load(fh)['results'], {})
+    with open(new_path) as fh:
+        new = _flatten('', json.load(fh)['results'], {})
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        if not key.endswith('_ms') or not old[key]:
+            continue
+        change = (new[key] - old[key]) / old[key] * 100
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{key:<60}{old[key]:>12.2f}{new[key]:>12.2f}{change:>+9.1f}%{flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    cmp_parser = sub.add_parser('compare', help='compare two result files')
+    cmp_parser.add_argument('old')
+    cmp_parser.add_argument('new')
+    cmp_parser.add_argument('--threshold', type=float, default=10.0, help='percent slowdown that counts as a regression')
+    args = parser.parse_args()
+    sys.exit(1 if compare(args.old, args.new, args.threshold) else 0)
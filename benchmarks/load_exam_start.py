@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Load scenario: the exam-start storm.
+
+A class of --students seed students (from benchmarks/seed.py, run it first)
+take the same quiz at the same moment:
+
+  login     everyone logs in within --ramp seconds (bcrypt-heavy)
+  open      everyone opens the attempt page, starting their attempt session
+  autosave  each answer is autosaved after --think seconds of reading
+  submit    once the whole class has answered, everyone submits at once
+
+503 responses are retried after their Retry-After, as the page does, and
+counted. For every phase the report has the per-request latency, the time
+each student needed to get through it including retries, the phase's wall
+time and its error counts. By default the script starts its own gunicorn
+server; pass --port to use one that is already running against the same
+database instead. Attempts created by the run are deleted afterwards.
+
+    python benchmarks/load_exam_start.py --students 300 --workers 2 --threads 16 --json storm.json
+"""
+
+import argparse
+import asyncio
+import collections
+import os
+import random
+import subprocess
+import sys
+import time
+
+from common import ROOT, http, summarize, wait_for_port, write_results
+
+PHASES = ('login', 'open', 'autosave', 'submit')
+
+
+class Storm:
+    def __init__(self, port, students, quiz_id, question_ids, password, think, ramp, max_retries):
+        self.port = port
+        self.students = students
+        self.quiz_id = quiz_id
+        self.question_ids = question_ids
+        self.password = password
+        self.think = think
+        self.ramp = ramp
+        self.max_retries = max_retries
+        self.latencies = collections.defaultdict(list)
+        self.completion = collections.defaultdict(list)
+        self.counts = collections.defaultdict(collections.Counter)
+        self.spans = {}
+        self.answered = 0
+        self.all_answered = asyncio.Event()
+
+    async def request(self, phase, cookie, method, path, form=None, json_body=None, expect=(200,)):
+        """One logical request with 503 retries; returns (ok, cookie)"""
+        for _ in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                status, headers, cookie = await http('127.0.0.1', self.port, method, path, cookie, form, json_body)
+            except OSError:
+                self.counts[phase]['connection_errors'] += 1
+                return False, cookie
+            self.latencies[phase].append(time.perf_counter() - started)
+            if status != 503:
+                if status not in expect:
+                    self.counts[phase][f'status_{status}'] += 1
+                return status in expect, cookie
+            self.counts[phase]['status_503'] += 1
+            await asyncio.sleep(float(headers.get('retry-after', '1')) * random.uniform(1, 2))
+        self.counts[phase]['gave_up'] += 1
+        return False, cookie
+
+    async def phase(self, name, coro):
+        started = time.perf_counter()
+        first, last = self.spans.get(name, (started, started))
+        ok = await coro
+        finished = time.perf_counter()
+        self.completion[name].append(finished - started)
+        self.spans[name] = (min(first, started), max(last, finished))
+        return ok
+
+    async def autosave_all(self, cookie):
+        url = f'/quiz/{self.quiz_id}/attempt/autosave'
+        for question_id in self.question_ids:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.think)
+            ok, cookie = await self.request('autosave', cookie, 'POST', url,
+                                            json_body={'answers': {str(question_id): random.choice('ABCD')}})
+            if not ok:
+                return False
+        return True
+
+    def mark_answered(self):
+        self.answered += 1
+        if self.answered == len(self.students):
+            self.all_answered.set()
+
+    async def student(self, username):
+        attempt_url = f'/quiz/{self.quiz_id}/attempt'
+        cookie = None
+        try:
+            await asyncio.sleep(random.uniform(0, self.ramp))
+            ok, cookie = await self.phase('login', self.request(
+                'login', cookie, 'POST', '/login',
+                form={'username': username, 'password': self.password, 'portal': 'student'}, expect=(302,)))
+            if not ok:
+                return
+            ok, cookie = await self.phase('open', self.request('open', cookie, 'GET', attempt_url))
+            if not ok or not await self.phase('autosave', self.autosave_all(cookie)):
+                return
+        finally:
+            self.mark_answered()
+
+        await self.all_answered.wait()
+        # The final form repeats every answer, like the page does
+        form = {f'question_{qid}': random.choice('ABCD') for qid in self.question_ids}
+        await self.phase('submit', self.request('submit', cookie, 'POST', attempt_url, form=form))
+
+    async def run(self):
+        started = time.perf_counter()
+        await asyncio.gather(*(self.student(u) for u in self.students))
+        results = {'students': len(self.students), 'wall_s': round(time.perf_counter() - started, 3)}
+        for name in PHASES:
+            first, last = self.spans.get(name, (0.0, 0.0))
+            results[name] = {
+                'requests': summarize(self.latencies[name]),
+                'completion': summarize(self.completion[name]),
+                'wall_s': round(last - first, 3),
+                **self.counts[name],
+            }
+        return results
+
+
+def load_fixture(num_students, quiz_id=None):
+    from app import get_db_connection
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        if quiz_id is None:
+            # Seed quiz 00001 is the most attempted by construction
+            cur.execute("""
+                SELECT z.id FROM quizzes z
+                JOIN users u ON u.id = z.created_by
+                WHERE u.username LIKE 'seed\\_admin\\_%'
+                ORDER BY z.title
+                LIMIT 1
+            """)
+            row = cur.fetchone()
+            if row is None:
+                sys.exit('No seed data found, run benchmarks/seed.py first')
+            quiz_id = row[0]
+        cur.execute("SELECT id FROM questions WHERE quiz_id = %s ORDER BY id", (quiz_id,))
+        question_ids = [r[0] for r in cur.fetchall()]
+        cur.execute("""
+            SELECT username FROM users WHERE username LIKE 'seed\\_student\\_%%'
+            ORDER BY username LIMIT %s
+        """, (num_students,))
+        students = [r[0] for r in cur.fetchall()]
+        if len(students) < num_students:
+            sys.exit(f'Only {len(students)} seed students, re-run seed.py with --users {num_students} or more')
+        cur.execute("SELECT LOCALTIMESTAMP")
+        started_at = cur.fetchone()[0]
+    return quiz_id, question_ids, students, started_at
+
+
+def cleanup(quiz_id, students, started_at):
+    from app import get_db_connection
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            DELETE FROM quiz_attempts
+            WHERE quiz_id = %s AND attempted_at >= %s
+              AND user_id IN (SELECT id FROM users WHERE username = ANY(%s))
+        """, (quiz_id, started_at, students))
+        cur.execute("""
+            DELETE FROM attempt_sessions
+            WHERE quiz_id = %s AND started_at >= %s
+              AND user_id IN (SELECT id FROM users WHERE username = ANY(%s))
+        """, (quiz_id, started_at, students))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--quiz-id', type=int, help='default: the most popular seed quiz')
+    parser.add_argument('--ramp', type=float, default=2.0, help='seconds over which logins arrive')
+    parser.add_argument('--think', type=float, default=0.5, help='mean seconds between autosaves')
+    parser.add_argument('--max-retries', type=int, default=20, help='503 retries per request')
+    parser.add_argument('--password', default='bench-password', help='the password given to seed.py')
+    parser.add_argument('--port', type=int, help='use a server already listening here')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers when starting a server')
+    parser.add_argument('--threads', type=int, default=10, help='gthread threads per worker')
+    parser.add_argument('--json', help='write results to this file (default: stdout)')
+    args = parser.parse_args()
+
+    quiz_id, question_ids, students, started_at = load_fixture(args.students, args.quiz_id)
+    server = None
+    port = args.port
+    if port is None:
+        port = 5098
+        server = subprocess.Popen(['gunicorn', 'app:app', '--workers', str(args.workers),
+                                   '--worker-class', 'gthread', '--threads', str(args.threads),
+                                   '--bind', f'127.0.0.1:{port}'],
+                                  cwd=ROOT, env=dict(os.environ),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        storm = Storm(port, students, quiz_id, question_ids, args.password, args.think, args.ramp, args.max_retries)
+        results = asyncio.run(storm.run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        cleanup(quiz_id, students, started_at)
+
+    for name in PHASES:
+        row = results[name]
+        completion = row['completion']
+        print(f"{name:<9} wall {row['wall_s']:>8.2f} s  request p95 {row['requests'].get('p95_ms', 0):>9.2f} ms"
+              f"  student p95 {completion.get('p95_ms', 0):>9.2f} ms  503s {row.get('status_503', 0)}",
+              file=sys.stderr)
+    config = {k: v for k, v in vars(args).items() if k not in ('json', 'password')}
+    config.update(quiz_id=quiz_id, questions=len(question_ids))
+    write_results('exam_start', config, results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Load test: concurrent students per core, sync (gunicorn) versus async (ASGI).
+
+Runs against the database configured in .env (use a scratch database, the
+script creates and removes its own quiz and students). Each mode is started as
+a single server process, so its capacity is per core:
+
+  sync   gunicorn app:app, one gthread worker with --threads threads
+  async  hypercorn asgi:application, one worker
+
+Every virtual student logs in, then loops: open the dashboard, open the quiz,
+think for --think seconds while "reading", submit. The user count is stepped
+up until p95 latency exceeds --slo-ms or more than 1% of requests fail; the
+last passing step is reported as the capacity of that mode.
+
+    python benchmarks/load_serving_modes.py --steps 25,50,100,200,400 --duration 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import time
+import uuid
+
+from common import ROOT, http, wait_for_port
+
+SERVERS = {
+    'sync': lambda port, threads: ['gunicorn', 'app:app', '--workers', '1', '--worker-class', 'gthread',
+                                   '--threads', str(threads), '--bind', f'127.0.0.1:{port}'],
+    'async': lambda port, threads: ['hypercorn', 'asgi:application', '--workers', '1',
+                                    '--bind', f'127.0.0.1:{port}'],
+}
+
+
+def create_fixture(num_students, num_questions=10):
+    from app import get_db_connection
+    from passwords import _hash
+
+    tag = uuid.uuid4().hex[:8]
+    # Cheapest bcrypt cost: this measures serving, not password hashing
+    hashed = _hash('load-test', 4)
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO quizzes (title, description, passing_score) VALUES (%s, 'load test', 60) RETURNING id",
+            (f'load {tag}',)
+        )
+        quiz_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO questions (quiz_id, question_text, question_type, options, correct_answer, points)
+            SELECT %s, 'Question ' || n, 'multiple_choice', '["A", "B", "C", "D"]', 'A', 1
+            FROM generate_series(1, %s) AS n
+            RETURNING id
+        """, (quiz_id, num_questions))
+        question_ids = [r[0] for r in cur.fetchall()]
+        cur.execute("""
+            INSERT INTO users (username, email, password, role)
+            SELECT %s || n, %s || n || '@example.com', %s, 'student'
+            FROM generate_series(1, %s) AS n
+            RETURNING username
+        """, (f'load_{tag}_', f'load_{tag}_', hashed, num_students))
+        usernames = [r[0] for r in cur.fetchall()]
+        conn.commit()
+    return quiz_id, question_ids, usernames, tag
+
+
+def drop_fixture(quiz_id, tag):
+    from app import get_db_connection
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM quiz_attempts WHERE quiz_id = %s", (quiz_id,))
+        cur.execute("DELETE FROM quizzes WHERE id = %s", (quiz_id,))
+        cur.execute("DELETE FROM users WHERE username LIKE %s", (f'load_{tag}_%',))
+        conn.commit()
+
+
+async def student(port, username, quiz_id, question_ids, think, deadline, latencies, errors):
+    async def timed(method, path, cookie, form=None, expect=(200,)):
+        started = time.perf_counter()
+        try:
+            status, _, cookie = await http('127.0.0.1', port, method, path, cookie, form)
+        except OSError:
+            errors.append(path)
+            return cookie
+        latencies.append(time.perf_counter() - started)
+        if status not in expect:
+            errors.append(path)
+        return cookie
+
+    # Spread logins out so the run starts in steady state
+    await asyncio.sleep(random.uniform(0, think))
+    cookie = await timed('POST', '/login', None,
+                         {'username': username, 'password': 'load-test', 'portal': 'student'}, expect=(302,))
+    answers = {f'question_{qid}': random.choice('ABCD') for qid in question_ids}
+    while time.monotonic() < deadline:
+        cookie = await timed('GET', '/student/dashboard', cookie)
+        cookie = await timed('GET', f'/quiz/{quiz_id}/attempt', cookie)
+        await asyncio.sleep(random.uniform(0.5, 1.5) * think)
+        cookie = await timed('POST', f'/quiz/{quiz_id}/attempt', cookie, answers)
+
+
+async def run_step(port, usernames, quiz_id, question_ids, think, duration):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(student(port, u, quiz_id, question_ids, think, deadline, latencies, errors)
+                           for u in usernames))
+    total = len(latencies) + len(errors)
+    ordered = sorted(latencies) or [0.0]
+    return {
+        'users': len(usernames),
+        'requests': total,
+        'throughput_rps': round(total / duration, 1),
+        'median_ms': round(statistics.median(ordered) * 1000, 2),
+        'p95_ms': round(ordered[int(len(ordered) * 0.95) - 1 if len(ordered) > 1 else 0] * 1000, 2),
+        'error_rate': round(len(errors) / total, 4) if total else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='sync,async', help='comma separated: sync, async')
+    parser.add_argument('--steps', default='25,50,100,200', help='concurrent students per step')
+    parser.add_argument('--duration', type=float, default=15, help='seconds per step')
+    parser.add_argument('--think', type=float, default=2.0, help='mean seconds spent reading the quiz')
+    parser.add_argument('--threads', type=int, default=10, help='gthread threads for the sync worker')
+    parser.add_argument('--slo-ms', type=float, default=500, help='p95 latency budget')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    steps = [int(s) for s in args.steps.split(',')]
+    quiz_id, question_ids, usernames, tag = create_fixture(max(steps))
+    env = dict(os.environ, PASSWORD_HASH_WORKERS='0', BCRYPT_ROUNDS='4')
+    results = {}
+    try:
+        for mode in args.modes.split(','):
+            server = subprocess.Popen(SERVERS[mode](args.port, args.threads), cwd=ROOT, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_for_port(args.port)
+                rows = []
+                for users in steps:
+                    row = asyncio.run(run_step(args.port, usernames[:users], quiz_id, question_ids,
+                                               args.think, args.duration))
+                    row['within_slo'] = row['p95_ms'] <= args.slo_ms and row['error_rate'] <= 0.01
+                    rows.append(row)
+                    print(f"{mode:>5} {users:>5} users  {row['throughput_rps']:>7} req/s"
+                          f"  median {row['median_ms']:>8} ms  p95 {row['p95_ms']:>8} ms"
+                          f"  errors {row['error_rate']:.2%}")
+                    if not row['within_slo']:
+                        break
+                passing = [r['users'] for r in rows if r['within_slo']]
+                results[mode] = {'steps': rows, 'users_per_core': max(passing) if passing else 0}
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        drop_fixture(quiz_id, tag)
+
+    for mode, result in results.items():
+        print(f"{mode}: {result['users_per_core']} concurrent students per core within p95 {args.slo_ms:.0f} ms")
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
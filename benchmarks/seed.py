@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Deterministic benchmark dataset generator.
+
+Builds admins, students, quizzes, questions and any number of graded attempts
+(with their answers) in the database configured in .env. Use a scratch
+database. All rows are generated set-based inside Postgres, so millions of
+attempts take minutes, not hours.
+
+Every choice (who attempts which quiz, which answers are right, scores,
+timestamps) is a hash of --seed and the row's ordinal, so the same arguments
+always produce the same dataset; on a freshly created database even the ids
+match. Quiz popularity is skewed (low-numbered quizzes are attempted far more
+often) so "popular quiz" paths such as the CSV export see realistic volumes.
+
+Seeded accounts are named seed_admin_NNNN / seed_student_NNNNNN and share the
+password given by --password. --reset removes a previous seed first.
+
+    python benchmarks/seed.py --users 20000 --quizzes 200 --questions 20 --attempts 2000000 --reset
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import write_results  # noqa: E402
+
+# Uniform integer in [0, k) from the seed and a row key; stable across runs
+# and independent of the plan Postgres picks
+HASH = "((hashtext(%(seed)s || ':' || {key}) & 2147483647) %% {k})"
+
+
+def h(key, k):
+    return HASH.format(key=key, k=k)
+
+
+def reset(cur):
+    cur.execute("""
+        DELETE FROM quiz_attempts
+        WHERE user_id IN (SELECT id FROM users WHERE username LIKE 'seed\\_%')
+           OR quiz_id IN (SELECT z.id FROM quizzes z JOIN users u ON z.created_by = u.id
+                          WHERE u.username LIKE 'seed\\_admin\\_%')
+    """)
+    cur.execute("""
+        DELETE FROM quizzes WHERE created_by IN (SELECT id FROM users WHERE username LIKE 'seed\\_admin\\_%')
+    """)
+    cur.execute("DELETE FROM users WHERE username LIKE 'seed\\_%'")
+
+
+def seed_users(cur, params):
+    cur.execute(f"""
+        INSERT INTO users (username, email, password, role, created_at)
+        SELECT 'seed_admin_' || lpad(n::text, 4, '0'), 'seed_admin_' || n || '@example.com',
+               %(password_hash)s, 'admin', %(base)s::timestamp - n * interval '1 day'
+        FROM generate_series(1, %(admins)s) AS n
+    """, params)
+    cur.execute(f"""
+        INSERT INTO users (username, email, password, role, created_at)
+        SELECT 'seed_student_' || lpad(n::text, 6, '0'), 'seed_student_' || n || '@example.com',
+               %(password_hash)s, 'student',
+               %(base)s::timestamp - interval '90 days' + {h("'u' || n", 7776000)} * interval '1 second'
+        FROM generate_series(1, %(users)s) AS n
+    """, params)
+
+
+def seed_quizzes(cur, params):
+    cur.execute("SELECT array_agg(id ORDER BY username) FROM users WHERE username LIKE 'seed\\_admin\\_%'")
+    params['admin_ids'] = cur.fetchone()[0]
+    cur.execute(f"""
+        INSERT INTO quizzes (title, description, created_by, passing_score, duration_minutes, created_at, updated_at)
+        SELECT 'Seed quiz ' || lpad(n::text, 5, '0'), 'Benchmark quiz number ' || n,
+               (%(admin_ids)s::int[])[1 + (n - 1) %% %(admins)s],
+               50 + {h("'p' || n", 5)} * 5,
+               ({h("'d' || n", 4)}) * 10,
+               %(base)s::timestamp - interval '120 days' + n * interval '10 minutes',
+               %(base)s::timestamp - interval '120 days' + n * interval '10 minutes'
+        FROM generate_series(1, %(quizzes)s) AS n
+    """, params)
+    cur.execute(f"""
+        INSERT INTO questions (quiz_id, question_text, question_type, options, correct_answer, points)
+        SELECT z.id, 'Seed question ' || q || ' of ' || z.title, 'multiple_choice',
+               '["A", "B", "C", "D"]'::jsonb,
+               chr(65 + {h("z.title || ':c' || q", 4)}),
+               1 + {h("z.title || ':w' || q", 3)}
+        FROM quizzes z
+        CROSS JOIN generate_series(1, %(questions)s) AS q
+        WHERE z.created_by = ANY(%(admin_ids)s::int[])
+        ORDER BY z.id, q
+    """, params)
+
+
+def seed_attempts(cur, params, first, last):
+    """Attempts first..last (ordinals) with their answers, in one transaction"""
+    cur.execute("SELECT array_agg(id ORDER BY username) FROM users WHERE username LIKE 'seed\\_student\\_%'")
+    params['student_ids'] = cur.fetchone()[0]
+    cur.execute("""
+        SELECT array_agg(id ORDER BY title) FROM quizzes WHERE created_by = ANY(%(admin_ids)s::int[])
+    """, params)
+    params['quiz_ids'] = cur.fetchone()[0]
+    params['first'], params['last'] = first, last
+
+    # Popularity skew: squaring a uniform draw favours low quiz ordinals.
+    # Timestamps step back one second per ordinal, so each is unique and the
+    # generated rows can be matched back to their inserted ids.
+    cur.execute(f"""
+        CREATE TEMP TABLE seed_attempt ON COMMIT DROP AS
+        SELECT n, student,
+               (%(student_ids)s::int[])[student] AS user_id,
+               (%(quiz_ids)s::int[])[1 + floor(%(quizzes)s * power({h("'sq' || n", 1000000)} / 1000000.0, 2))::int] AS quiz_id,
+               %(base)s::timestamp - n * interval '1 second' AS attempted_at
+        FROM generate_series(%(first)s, %(last)s) AS n,
+             LATERAL (SELECT 1 + {h("'su' || n", "%(users)s")} AS student) s
+    """, params)
+    # Each student answers correctly with their own probability (40-94%)
+    cur.execute(f"""
+        CREATE TEMP TABLE seed_answer ON COMMIT DROP AS
+        SELECT n, question_id, points, selected_answer, selected_answer = correct_answer AS is_correct
+        FROM (
+            SELECT a.n, q.id AS question_id, q.points, q.correct_answer,
+                   CASE WHEN {h("'r' || a.n || ':' || q.question_text", 100)} < 40 + {h("'a' || a.student", 55)}
+                        THEN q.correct_answer
+                        ELSE chr(65 + (ascii(q.correct_answer) - 65 + 1 + {h("'x' || a.n || ':' || q.question_text", 3)}) %% 4)
+                   END AS selected_answer
+            FROM seed_attempt a
+            JOIN questions q ON q.quiz_id = a.quiz_id
+        ) answered
+    """, params)
+    cur.execute("""
+        INSERT INTO quiz_attempts (user_id, quiz_id, score, passed, attempted_at)
+        SELECT a.user_id, a.quiz_id, s.score, s.score >= z.passing_score, a.attempted_at
+        FROM seed_attempt a
+        JOIN quizzes z ON z.id = a.quiz_id
+        JOIN (SELECT n, round(100.0 * COALESCE(SUM(points) FILTER (WHERE is_correct), 0) / SUM(points))::int AS score
+              FROM seed_answer
+              GROUP BY n) s ON s.n = a.n
+        ORDER BY a.n
+    """)
+    cur.execute("""
+        INSERT INTO user_answers (attempt_id, question_id, selected_answer, is_correct, attempted_at)
+        SELECT qa.id, sa.question_id, sa.selected_answer, sa.is_correct, qa.attempted_at
+        FROM seed_answer sa
+        JOIN seed_attempt a ON a.n = sa.n
+        JOIN quiz_attempts qa ON qa.user_id = a.user_id AND qa.attempted_at = a.attempted_at
+    """)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000, help='students')
+    parser.add_argument('--admins', type=int, default=5)
+    parser.add_argument('--quizzes', type=int, default=50)
+    parser.add_argument('--questions', type=int, default=10, help='questions per quiz')
+    parser.add_argument('--attempts', type=int, default=100000)
+    parser.add_argument('--seed', default='quiz-bench')
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--batch', type=int, default=200000, help='attempts per transaction')
+    parser.add_argument('--reset', action='store_true', help='remove a previous seed first')
+    parser.add_argument('--json', help='write the run summary to this file (default: stdout)')
+    args = parser.parse_args()
+
+    from app import create_app, get_db_connection, get_hasher, init_db
+    from partitions import ensure_partitions
+
+    with create_app().app_context():
+        init_db()
+        password_hash = get_hasher().hash(args.password)
+    params = {
+        'seed': args.seed,
+        'users': args.users,
+        'admins': args.admins,
+        'quizzes': args.quizzes,
+        'questions': args.questions,
+        # Fixed origin so timestamps do not depend on when the seed ran
+        'base': '2025-01-01 00:00:00',
+        'password_hash': password_hash,
+    }
+    timings = {}
+    started = time.perf_counter()
+    with get_db_connection() as conn, conn.cursor() as cur:
+        if args.reset:
+            reset(cur)
+            conn.commit()
+            timings['reset_s'] = round(time.perf_counter() - started, 2)
+
+        step = time.perf_counter()
+        seed_users(cur, params)
+        seed_quizzes(cur, params)
+        # Attempts are dated back from the base, one second per ordinal
+        ensure_partitions(cur, since=datetime.fromisoformat(params['base']) - timedelta(seconds=args.attempts))
+        conn.commit()
+        timings['users_quizzes_s'] = round(time.perf_counter() - step, 2)
+
+        step = time.perf_counter()
+        for first in range(1, args.attempts + 1, args.batch):
+            last = min(first + args.batch - 1, args.attempts)
+            seed_attempts(cur, params, first, last)
+            conn.commit()
+            print(f"attempts {last}/{args.attempts}", file=sys.stderr)
+        timings['attempts_s'] = round(time.perf_counter() - step, 2)
+
+        conn.autocommit = True
+        cur.execute("ANALYZE")
+        conn.autocommit = False
+    timings['total_s'] = round(time.perf_counter() - started, 2)
+
+    config = {k: v for k, v in vars(args).items() if k not in ('json', 'password')}
+    write_results('seed', config, timings, args.json)
+
+
+if __name__ == '__main__':
+    main()
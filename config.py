@@ -0,0 +1,125 @@
+# config.py (Application settings, read from the environment and .env)
+"""
+Config objects for ``create_app`` (app.py). ``APP_CONFIG`` picks one when no
+config is passed explicitly: ``production`` (the default), ``development``
+or ``testing``. Every setting can also be overridden on the app afterwards
+through ``app.config``.
+
+The .env file is loaded when this module is first imported, and app.py
+imports it before anything else, so the settings other modules still read
+from the environment themselves (database connection and pool sizes in db.py,
+instrumentation.py, partitions.py) see .env values too.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _flag(name, default):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+class Config:
+    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
+    SESSION_TYPE = 'filesystem'
+
+    # Default number of rows per page for user, quiz and attempt listings
+    PAGE_SIZE = int(os.getenv('PAGE_SIZE', '20'))
+
+    # Attempt CSV exports: 'copy' streams Postgres COPY output directly,
+    # 'cursor' formats rows fetched through a server-side cursor. Gzip is
+    # applied when the client accepts it.
+    CSV_EXPORT_MODE = os.getenv('CSV_EXPORT_MODE', 'copy').lower()
+    CSV_EXPORT_GZIP = _flag('CSV_EXPORT_GZIP', 'true')
+
+    # Largest quiz/question import accepted, in bytes
+    IMPORT_MAX_BYTES = int(os.getenv('IMPORT_MAX_BYTES', str(50 * 1024 * 1024)))
+
+    # Quiz definitions (and the question pools sampled from them) cached per
+    # worker process
+    QUIZ_CACHE_SIZE = int(os.getenv('QUIZ_CACHE_SIZE', '256'))
+
+    # Item analysis results cached per worker, kept until a new attempt arrives
+    ITEM_ANALYSIS_CACHE_SIZE = int(os.getenv('ITEM_ANALYSIS_CACHE_SIZE', '64'))
+
+    # Candidates ranked per search query (search.py)
+    SEARCH_MAX_MATCHES = int(os.getenv('SEARCH_MAX_MATCHES', '1000'))
+
+    # Students listed on a quiz leaderboard unless ?limit= asks otherwise (max 100)
+    LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', '10'))
+
+    # Most ids/edits accepted by one batch admin request
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '5000'))
+
+    # Seconds past a timed quiz's deadline during which answers are still accepted
+    ATTEMPT_GRACE_SECONDS = float(os.getenv('ATTEMPT_GRACE_SECONDS', '30'))
+
+    # Optional bearer token required by /metrics (unset: open to the scraper)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+    # Password hashing (passwords.py): bcrypt cost, hashing threads per
+    # worker, and a limit on hashes in progress shared by every worker on the
+    # host; a login that cannot start or finish within the timeout gets a 503
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '2'))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '5'))
+    PASSWORD_HASH_SLOT_DIR = os.getenv('PASSWORD_HASH_SLOT_DIR') or None
+
+    # Read replicas for @read_only routes, as comma-separated postgresql://
+    # URIs (none: all reads go to the primary). A replica lagging more than
+    # REPLICA_MAX_LAG seconds is skipped, lag is probed at most every
+    # REPLICA_CHECK_INTERVAL seconds, and an unreachable replica is left alone
+    # for REPLICA_RETRY_AFTER seconds.
+    REPLICA_DSNS = [dsn.strip() for dsn in os.getenv('DB_REPLICA_DSNS', '').split(',') if dsn.strip()]
+    REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', '2'))
+    REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '1'))
+    REPLICA_RETRY_AFTER = float(os.getenv('DB_REPLICA_RETRY_AFTER', '10'))
+    REPLICA_CONNECT_TIMEOUT = int(os.getenv('DB_REPLICA_CONNECT_TIMEOUT', '2'))
+
+    # Seconds a user's reads stay on the primary after they change something,
+    # so they see their own writes while the replicas catch up. Keep it above
+    # REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL.
+    REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
+
+    # Dynamic responses (HTML, JSON) at least this many bytes are compressed
+    # when the client accepts it (-1 disables)
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+
+    # Compile every template when the app is created rather than on its
+    # first render; under gunicorn --preload that happens once, in the
+    # master, and forked workers inherit the compiled templates
+    PRECOMPILE_TEMPLATES = _flag('PRECOMPILE_TEMPLATES', 'true')
+
+
+class ProductionConfig(Config):
+    pass
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    # Templates are reloaded on change anyway
+    PRECOMPILE_TEMPLATES = False
+
+
+class TestingConfig(Config):
+    TESTING = True
+    PRECOMPILE_TEMPLATES = False
+
+
+CONFIGS = {
+    'production': ProductionConfig,
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+}
+
+
+def load_config(name=None):
+    """The config class called ``name`` (default: $APP_CONFIG, else production)"""
+    name = (name or os.getenv('APP_CONFIG') or 'production').lower()
+    try:
+        return CONFIGS[name]
+    except KeyError:
+        raise ValueError(f"Unknown APP_CONFIG {name!r} (expected one of {', '.join(CONFIGS)})")
@@ -0,0 +1,437 @@
+# db.py (PostgreSQL connection pooling)
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+from instrumentation import InstrumentedConnection
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout"""
+
+
+def connect_from_env():
+    """Open a connection (with instrumented cursors) using the DB_* environment variables"""
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'quiz_db'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'password'),
+        port=os.getenv('DB_PORT', '5432'),
+        connection_factory=InstrumentedConnection
+    )
+
+
+class ConnectionPool:
+    """Thread-safe bounded pool of psycopg2 connections.
+
+    Connections are handed out through ``connection()``, which always returns
+    them to the pool. A connection is discarded instead of reused when it is
+    broken, or once it has served ``max_uses`` checkouts.
+    """
+
+    def __init__(self, connect=connect_from_env, min_size=1, max_size=10,
+                 timeout=5.0, check_on_borrow=True, max_uses=0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError('Invalid pool size: min=%s max=%s' % (min_size, max_size))
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_on_borrow = check_on_borrow
+        self.max_uses = max_uses
+
+        self._cond = threading.Condition()
+        self._idle = []     # connections ready to be borrowed (LIFO)
+        self._uses = {}     # id(conn) -> number of checkouts served
+        self._size = 0      # open connections, idle + in use
+        self._in_use = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._discarded = 0
+        self._recycled = 0
+
+        for _ in range(min_size):
+            conn = self._open()
+            self._idle.append(conn)
+
+    def _open(self):
+        conn = self._connect()
+        self._uses[id(conn)] = 0
+        self._size += 1
+        return conn
+
+    def _discard(self, conn):
+        self._uses.pop(id(conn), None)
+        self._size -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_healthy(conn):
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        """Borrow a connection, waiting up to ``timeout`` seconds for one to free up"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout('Connection pool is closed')
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot, then connect outside the lock
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout('Timed out after %.1fs waiting for a database connection' % self.timeout)
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if conn is None:
+                conn = self._connect()
+                with self._cond:
+                    self._uses[id(conn)] = 0
+            elif self.check_on_borrow and not self._is_healthy(conn):
+                with self._cond:
+                    self._discarded += 1
+                    self._discard(conn)
+                    self._size += 1
+                conn = self._connect()
+                with self._cond:
+                    self._uses[id(conn)] = 0
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._uses[id(conn)] += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def putconn(self, conn):
+        """Return a borrowed connection, rolling back any open transaction"""
+        reusable = not conn.closed
+        if reusable and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+
+        with self._cond:
+            self._in_use -= 1
+            if not reusable:
+                self._discarded += 1
+                self._discard(conn)
+            elif self._closed:
+                self._discard(conn)
+            elif self.max_uses and self._uses.get(id(conn), 0) >= self.max_uses:
+                self._recycled += 1
+                self._discard(conn)
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a ``with`` block"""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'utilization': self._in_use / self.max_size,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'wait_seconds_total': self._wait_total,
+                'wait_seconds_max': self._wait_max,
+                'wait_seconds_avg': self._wait_total / self._checkouts if self._checkouts else 0.0,
+                'discarded': self._discarded,
+                'recycled': self._recycled,
+            }
+
+
+def pool_from_env(connect=connect_from_env, min_size=None):
+    """Build a pool sized by the DB_POOL_* environment variables.
+
+    Sizes are per process, so with gunicorn each worker gets its own pool.
+    """
+    return ConnectionPool(
+        connect=connect,
+        min_size=int(os.getenv('DB_POOL_MIN', '1')) if min_size is None else min_size,
+        max_size=int(os.getenv('DB_POOL_MAX', '10')),
+        timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+        check_on_borrow=os.getenv('DB_POOL_CHECK', 'true').lower() in ('1', 'true', 'yes'),
+        max_uses=int(os.getenv('DB_POOL_MAX_USES', '0')),
+    )
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+# Pools inherited across fork; kept referenced so their sockets (which belong
+# to the parent process) are never closed from the child
+_inherited_pools = []
+
+
+def get_pool():
+    """Return this process's pool, creating it on first use.
+
+    The pool is keyed on the pid so a worker forked from a preloaded master
+    never shares sockets with its parent.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                if _pool is not None:
+                    _inherited_pools.append(_pool)
+                _pool = pool_from_env()
+                _pool_pid = pid
+    return _pool
+
+
+# Replication lag in seconds as seen by a replica. A replica that has replayed
+# everything it received is current even when the primary has been idle for
+# a while (after a restart, streaming resumes at a segment boundary, so the
+# received position can trail the replayed one) -- but only while its WAL
+# receiver is streaming: one cut off from the primary has replayed all it
+# ever will. Otherwise the lag is the age of the last transaction replayed,
+# NULL (not usable) when there is none. pg_stat_wal_receiver shows its status
+# only to superusers and roles with pg_read_all_stats; without that the
+# replica counts as lagging whenever the primary goes quiet. A server that is
+# not in recovery (a plain second instance, as in local testing) has no lag.
+REPLICA_LAG_SQL = """
+    SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0.0
+                WHEN pg_last_wal_receive_lsn() <= pg_last_wal_replay_lsn()
+                     AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0.0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8
+           END
+"""
+
+
+class Replica:
+    """One read replica: its DSN, its health as last probed and, per process,
+    its connection pool"""
+
+    def __init__(self, dsn, max_lag=2.0, retry_after=10.0, connect_timeout=2):
+        self.dsn = dsn
+        params = psycopg2.extensions.parse_dsn(dsn)
+        self.name = '%s:%s/%s' % (params.get('host', 'localhost'), params.get('port', '5432'),
+                                  params.get('dbname', ''))
+        self.max_lag = max_lag
+        self.retry_after = retry_after
+        self.connect_timeout = connect_timeout
+        self.lag = None
+        self.checked_at = None      # time.monotonic() of the last probe
+        self.down_until = 0.0
+        self.error = None
+        self.reads = 0
+        self.busy = 0               # reads sent to the primary as the pool was full
+        self.failures = 0
+        self._pool = None
+        self._pool_pid = None
+
+    def connect(self):
+        return psycopg2.connect(self.dsn, connect_timeout=self.connect_timeout,
+                                connection_factory=InstrumentedConnection)
+
+    def pool(self):
+        """This process's pool for the replica; it opens no connection up front,
+        so a replica that is down at startup does not stop the app"""
+        pid = os.getpid()
+        if self._pool is None or self._pool_pid != pid:
+            with _pool_lock:
+                if self._pool is None or self._pool_pid != pid:
+                    if self._pool is not None:
+                        _inherited_pools.append(self._pool)
+                    self._pool = pool_from_env(connect=self.connect, min_size=0)
+                    self._pool_pid = pid
+        return self._pool
+
+    def usable(self, now):
+        return now >= self.down_until and self.lag is not None and self.lag <= self.max_lag
+
+    def record_lag(self, lag):
+        self.lag = None if lag is None else float(lag)
+        self.error = None
+
+    def record_failure(self, error):
+        self.lag = None
+        self.down_until = time.monotonic() + self.retry_after
+        self.error = str(error).strip()
+        self.failures += 1
+
+    def stats(self, now):
+        return {
+            'name': self.name,
+            'usable': self.usable(now),
+            'lag_seconds': self.lag,
+            'down_for_seconds': max(self.down_until - now, 0.0),
+            'error': self.error,
+            'reads': self.reads,
+            'busy': self.busy,
+            'failures': self.failures,
+            'pool': self._pool.stats() if self._pool is not None and self._pool_pid == os.getpid() else None,
+        }
+
+
+class ReplicaRouter:
+    """Spreads read-only work over the healthy replicas, round robin.
+
+    Each replica's lag is probed at most every ``check_interval`` seconds by
+    whichever read next comes through. A replica that cannot be reached is
+    left alone for ``retry_after`` seconds, and one lagging more than
+    ``max_lag`` seconds is skipped until a later probe finds it caught up.
+    With no usable replica, reads go to the primary.
+
+    ``getconn``/``putconn`` follow ``ConnectionPool``, so
+    ``instrumentation.timed_checkout`` borrows from the router like a pool.
+    """
+
+    def __init__(self, dsns, primary=None, max_lag=2.0, check_interval=1.0, retry_after=10.0, connect_timeout=2):
+        self.replicas = [Replica(dsn, max_lag, retry_after, connect_timeout) for dsn in dsns]
+        self.check_interval = check_interval
+        self._primary = primary or get_pool
+        self._lock = threading.Lock()
+        self._next = 0
+        self._origins = {}      # id(conn) -> pool it was borrowed from
+        self.primary_reads = 0
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def due(self):
+        """Replicas to probe now. They are claimed, so concurrent reads do not
+        probe the same replica twice; the caller records the outcome."""
+        now = time.monotonic()
+        with self._lock:
+            due = [r for r in self.replicas if now >= r.down_until
+                   and (r.checked_at is None or now - r.checked_at >= self.check_interval)]
+            for replica in due:
+                replica.checked_at = now
+        return due
+
+    def choose(self):
+        """The next usable replica, or None"""
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = self.replicas[self._next % len(self.replicas)]
+                self._next += 1
+                if replica.usable(now):
+                    replica.reads += 1
+                    return replica
+            self.primary_reads += 1
+        return None
+
+    def probe(self, replica):
+        try:
+            with replica.pool().connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(REPLICA_LAG_SQL)
+                    replica.record_lag(cur.fetchone()[0])
+        except psycopg2.Error as e:
+            replica.record_failure(e)
+        except PoolTimeout:
+            # Busy, not down: keep the last reading
+            pass
+
+    def getconn(self):
+        for replica in self.due():
+            self.probe(replica)
+        while True:
+            replica = self.choose()
+            pool = replica.pool() if replica is not None else self._primary()
+            try:
+                conn = pool.getconn()
+            except psycopg2.OperationalError as e:
+                if replica is None:
+                    raise
+                replica.record_failure(e)
+                continue
+            except PoolTimeout:
+                if replica is None:
+                    raise
+                # Busy, not down: this read goes to the primary, and the
+                # replica stays in rotation
+                with self._lock:
+                    replica.busy += 1
+                    self.primary_reads += 1
+                pool = self._primary()
+                conn = pool.getconn()
+            with self._lock:
+                self._origins[id(conn)] = pool
+            return conn
+
+    def putconn(self, conn):
+        with self._lock:
+            pool = self._origins.pop(id(conn))
+        pool.putconn(conn)
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'replicas': [replica.stats(now) for replica in self.replicas],
+            'primary_reads': self.primary_reads,
+        }
+
+
+def replicas_from_config(config):
+    """Router over the ``REPLICA_DSNS`` of an app config (none: every read goes
+    to the primary). It opens no connection until the first read."""
+    return ReplicaRouter(
+        config['REPLICA_DSNS'],
+        max_lag=config['REPLICA_MAX_LAG'],
+        check_interval=config['REPLICA_CHECK_INTERVAL'],
+        retry_after=config['REPLICA_RETRY_AFTER'],
+        connect_timeout=config['REPLICA_CONNECT_TIMEOUT'],
+    )
@@ -0,0 +1,62 @@
+# grading.py (Quiz scoring, shared by every serving mode)
+
+
+def grade_submission(questions, get_answer, passing_score):
+    """Score a submission in a single pass over the quiz questions.
+
+    ``get_answer`` maps a question id to the submitted answer (or None), e.g.
+    ``lambda qid: request.form.get(f'question_{qid}')``.
+
+    Returns a dict with the percentage ``score``, ``passed``, ``missing``
+    (True if any question was left unanswered) and parallel ``question_ids``,
+    ``selected_answers`` and ``is_correct`` lists ready for a batched insert.
+    """
+    earned = 0
+    total_points = 0
+    missing = False
+    question_ids = []
+    selected_answers = []
+    is_correct = []
+
+    for question in questions:
+        selected = get_answer(question['id'])
+        if selected is None or str(selected).strip() == "":
+            missing = True
+        correct = selected == question['correct_answer']
+        points = question['points']
+        if correct:
+            earned += points
+        total_points += points
+
+        question_ids.append(question['id'])
+        selected_answers.append(selected)
+        is_correct.append(correct)
+
+    percentage = (earned / total_points) * 100 if total_points > 0 else 0
+    return {
+        'score': percentage,
+        'passed': percentage >= passing_score,
+        'missing': missing,
+        'question_ids': question_ids,
+        'selected_answers': selected_answers,
+        'is_correct': is_correct,
+    }
+
+
+def clean_answers(raw, max_items=1000):
+    """Validate an answer delta ``{question_id: answer}`` sent by the page.
+
+    Returns a dict with string question ids and string answers (at most 255
+    characters, the width of ``user_answers.selected_answer``), or None if
+    ``raw`` is not a well-formed delta. Ids are not checked against the quiz
+    here; grading only ever reads the quiz's own question ids.
+    """
+    if not isinstance(raw, dict) or len(raw) > max_items:
+        return None
+    answers = {}
+    for question_id, answer in raw.items():
+        question_id = str(question_id)
+        if not question_id.isdigit() or not isinstance(answer, str) or len(answer) > 255:
+            return None
+        answers[question_id] = answer
+    return answers
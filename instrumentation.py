@@ -0,0 +1,337 @@
+# instrumentation.py (Per-request SQL statistics and Prometheus metrics)
+"""
+Every connection from the pool is an ``InstrumentedConnection`` whose cursors
+time ``execute``, ``executemany`` and ``copy_expert``. Each statement is
+charged to the request being served (query count, database time, rows
+returned), to its normalised statement text, and logged when it runs longer
+than SLOW_QUERY_MS. Request latency and the per-request totals are kept in
+histograms labelled by route and rendered in the Prometheus text format by
+``metrics.render()``.
+
+Figures are per process, like the pool and cache stats: with gunicorn every
+worker keeps its own, and each series carries the worker's pid.
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged (0 logs every statement, negative disables)
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_MS', '200')) / 1000
+
+# Distinct statements tracked; anything beyond is counted under 'other'
+MAX_STATEMENTS = int(os.getenv('SQL_STATS_MAX_STATEMENTS', '500'))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class RequestStats:
+    """Database work charged to one request"""
+
+    __slots__ = ('route', 'queries', 'db_seconds', 'rows', 'acquire_seconds', 'slow_queries')
+
+    def __init__(self, route):
+        self.route = route
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.acquire_seconds = 0.0
+        self.slow_queries = 0
+
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def begin_request(route):
+    stats = RequestStats(route)
+    _current.set(stats)
+    return stats
+
+
+def current_request():
+    return _current.get()
+
+
+def end_request():
+    _current.set(None)
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}   # label values -> [bucket counts..., count, sum]
+
+    def observe(self, label_values, value):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+    def render(self, extra):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for label_values, series in sorted(self._series.items()):
+            labels = _labels(self.labels, label_values, extra)
+            for bound, count in zip(self.buckets, series):
+                yield f'{self.name}_bucket{{{labels},le="{bound}"}} {count}'
+            yield f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-2]}'
+            yield f'{self.name}_count{{{labels}}} {series[-2]}'
+            yield f'{self.name}_sum{{{labels}}} {series[-1]}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._series = {}
+
+    def inc(self, label_values, amount=1):
+        self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self, extra):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for label_values, value in sorted(self._series.items()):
+            yield f'{self.name}{{{_labels(self.labels, label_values, extra)}}} {value}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra):
+    pairs = list(zip(names, values)) + list(extra)
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+_NORMALIZE = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\?(?:\s*,\s*\?)*\)(?:\s*,\s*\(\?(?:\s*,\s*\?)*\))+'), '(?), ...'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normalize_statement(sql):
+    """Statement text with literals replaced by ?, so executions group together"""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    elif not isinstance(sql, str):
+        sql = str(sql)
+    for pattern, replacement in _NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class StatementStats:
+    """Calls, time and rows per normalised statement, bounded in size"""
+
+    def __init__(self, max_statements=MAX_STATEMENTS):
+        self.max_statements = max_statements
+        self._entries = {}      # statement id -> entry
+        self._ids = {}          # raw statement text -> statement id
+
+    def statement_id(self, sql):
+        key = sql if isinstance(sql, (str, bytes)) else str(sql)
+        statement_id = self._ids.get(key)
+        if statement_id is None:
+            text = normalize_statement(sql)
+            statement_id = hashlib.md5(text.encode('utf-8')).hexdigest()[:12]
+            if statement_id not in self._entries and len(self._entries) >= self.max_statements:
+                statement_id, text = 'other', 'other'
+            if statement_id not in self._entries:
+                self._entries[statement_id] = {'id': statement_id, 'statement': text, 'calls': 0,
+                                               'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0}
+            # Raw texts with inlined literals are one-offs; do not let them pile up
+            if len(self._ids) < 4 * self.max_statements:
+                self._ids[key] = statement_id
+        return statement_id
+
+    def record(self, sql, seconds, rows):
+        entry = self._entries[self.statement_id(sql)]
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        entry['max_seconds'] = max(entry['max_seconds'], seconds)
+        entry['rows'] += rows
+        return entry
+
+    def top(self, limit=50, key='seconds'):
+        entries = sorted(self._entries.values(), key=lambda e: e[key], reverse=True)[:limit]
+        return [dict(e, mean_seconds=e['seconds'] / e['calls'] if e['calls'] else 0.0) for e in entries]
+
+    def render(self, extra):
+        for name, field, documentation in (
+                ('quiz_db_statement_calls_total', 'calls', 'Executions per normalised statement'),
+                ('quiz_db_statement_seconds_total', 'seconds', 'Database time per normalised statement'),
+                ('quiz_db_statement_rows_total', 'rows', 'Rows returned per normalised statement')):
+            yield f'# HELP {name} {documentation}'
+            yield f'# TYPE {name} counter'
+            for entry in self._entries.values():
+                yield f'{name}{{{_labels(("statement",), (entry["id"],), extra)}}} {entry[field]}'
+
+
+class Metrics:
+    """Process-wide registry behind /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements = StatementStats()
+        self.request_duration = Histogram(
+            'quiz_http_request_duration_seconds', 'Request latency until the response is returned',
+            ('route', 'method', 'status'), LATENCY_BUCKETS)
+        self.queries_per_request = Histogram(
+            'quiz_db_queries_per_request', 'SQL statements executed per request',
+            ('route',), QUERY_COUNT_BUCKETS)
+        self.db_time_per_request = Histogram(
+            'quiz_db_time_per_request_seconds', 'Database time per request',
+            ('route',), LATENCY_BUCKETS)
+        self.counters = {
+            'queries': Counter('quiz_db_queries_total', 'SQL statements executed', ('route',)),
+            'db_seconds': Counter('quiz_db_query_seconds_total', 'Time spent executing SQL', ('route',)),
+            'rows': Counter('quiz_db_rows_total', 'Rows returned by SQL statements', ('route',)),
+            'acquire_seconds': Counter('quiz_db_acquire_seconds_total',
+                                       'Time spent waiting for a pooled connection', ('route',)),
+            'slow_queries': Counter('quiz_db_slow_queries_total',
+                                    'Statements slower than SLOW_QUERY_MS', ('route',)),
+        }
+
+    def record_query(self, sql, seconds, rows):
+        with self._lock:
+            return self.statements.record(sql, seconds, rows)['id']
+
+    def record_request(self, stats, method, status, seconds):
+        route = (stats.route,)
+        with self._lock:
+            self.request_duration.observe((stats.route, method, str(status)), seconds)
+            self.queries_per_request.observe(route, stats.queries)
+            self.db_time_per_request.observe(route, stats.db_seconds)
+            for field, counter in self.counters.items():
+                value = getattr(stats, field)
+                if value:
+                    counter.inc(route, value)
+
+    def top_statements(self, limit=50, key='seconds'):
+        with self._lock:
+            return self.statements.top(limit, key)
+
+    def render(self, gauges=None):
+        """Prometheus text exposition; ``gauges`` adds {name: (help, value)}"""
+        extra = (('pid', os.getpid()),)
+        lines = []
+        with self._lock:
+            for metric in (self.request_duration, self.queries_per_request, self.db_time_per_request,
+                           *self.counters.values(), self.statements):
+                lines.extend(metric.render(extra))
+        for name, (documentation, value) in (gauges or {}).items():
+            lines += [f'# HELP {name} {documentation}', f'# TYPE {name} gauge',
+                      f'{name}{{{_labels((), (), extra)}}} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def record_query(sql, started, rows):
+    """Charge one finished statement to the current request and the statement table"""
+    seconds = time.perf_counter() - started
+    statement_id = metrics.record_query(sql, seconds, rows)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+        stats.rows += rows
+    if 0 <= SLOW_QUERY_SECONDS <= seconds:
+        if stats is not None:
+            stats.slow_queries += 1
+        logger.warning('Slow query %.1f ms (route=%s, rows=%s, statement=%s): %s', seconds * 1000,
+                       stats.route if stats else None, rows, statement_id, normalize_statement(sql)[:2000])
+
+
+def record_acquire(seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.acquire_seconds += seconds
+
+
+@contextmanager
+def timed_checkout(pool):
+    """``pool.connection()``, charging the wait for a connection to the request"""
+    stats = _current.get()
+    started = time.perf_counter()
+    # The pool's health check on borrow is part of the wait, not a query of the request
+    _current.set(None)
+    try:
+        conn = pool.getconn()
+    finally:
+        _current.set(stats)
+    record_acquire(time.perf_counter() - started)
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+class InstrumentedCursorMixin:
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(query, started, self._rows_returned())
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_query(query, started, 0)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            record_query(sql, started, max(self.rowcount, 0))
+
+    def _rows_returned(self):
+        # rowcount is the result size for a statement that returns rows; named
+        # (server-side) cursors only know it as rows are fetched
+        if self.description is None or self.name:
+            return 0
+        return max(self.rowcount, 0)
+
+
+_cursor_classes = {}
+
+
+def instrumented_cursor_class(base):
+    cls = _cursor_classes.get(base)
+    if cls is None:
+        cls = _cursor_classes.setdefault(base, type('Instrumented' + base.__name__, (InstrumentedCursorMixin, base), {}))
+    return cls
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose cursors, of any factory, are instrumented"""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = instrumented_cursor_class(base)
+        return super().cursor(*args, **kwargs)
@@ -0,0 +1,96 @@
+# leaderboard.py (Per-quiz leaderboards and score distributions)
+"""
+Reads over the leaderboard tables that migration 8 keeps current with
+triggers on quiz_attempts: ``quiz_best_scores`` holds each student's best
+attempt per quiz and ``quiz_score_histogram`` how many students have each
+best score (0-100). Ranks and percentiles come from the 101 histogram
+buckets, so a request reads the top ``limit`` rows plus the histogram no
+matter how many attempts the quiz has.
+"""
+
+TOP_SQL = """
+    SELECT b.user_id, u.username, b.best_score, b.best_at, b.attempts
+    FROM quiz_best_scores b
+    JOIN users u ON u.id = b.user_id
+    WHERE b.quiz_id = %s
+    ORDER BY b.best_score DESC, b.best_at, b.user_id
+    LIMIT %s
+"""
+HISTOGRAM_SQL = """
+    SELECT score, SUM(students) FROM quiz_score_histogram
+    WHERE quiz_id = %s
+    GROUP BY score
+    HAVING SUM(students) <> 0
+"""
+STUDENT_BEST_SQL = """
+    SELECT best_score, best_at, attempts FROM quiz_best_scores WHERE quiz_id = %s AND user_id = %s
+"""
+
+# Score range covered by each bar of the distribution (the last one also
+# takes 100)
+BIN_WIDTH = 10
+
+
+class Distribution:
+    """Students per best score for one quiz"""
+
+    def __init__(self, counts):
+        self.counts = [0] * 101
+        for score, students in counts:
+            self.counts[min(max(score, 0), 100)] += int(students)
+        self.students = sum(self.counts)
+
+    def above(self, score):
+        return sum(self.counts[score + 1:])
+
+    def rank(self, score):
+        """1-based standard competition rank (ties share the better rank)"""
+        return self.above(score) + 1
+
+    def percentile(self, score):
+        """Percentile rank: share of students below, counting ties as half"""
+        if not self.students:
+            return None
+        below = self.students - self.above(score) - self.counts[score]
+        return round(100.0 * (below + 0.5 * self.counts[score]) / self.students, 1)
+
+    def bins(self):
+        bins = []
+        for start in range(0, 100, BIN_WIDTH):
+            end = 100 if start + BIN_WIDTH >= 100 else start + BIN_WIDTH - 1
+            bins.append({'from': start, 'to': end, 'students': sum(self.counts[start:end + 1])})
+        return bins
+
+
+def quiz_leaderboard(cur, quiz_id, user_id=None, limit=10):
+    cur.execute(HISTOGRAM_SQL, (quiz_id,))
+    distribution = Distribution(cur.fetchall())
+    cur.execute(TOP_SQL, (quiz_id, limit))
+    top = [{
+        'rank': distribution.rank(row[2]),
+        'user_id': row[0],
+        'username': row[1],
+        'best_score': row[2],
+        'best_at': row[3].isoformat() if row[3] else None,
+        'attempts': row[4],
+    } for row in cur.fetchall()]
+
+    result = {
+        'quiz_id': quiz_id,
+        'students': distribution.students,
+        'top': top,
+        'distribution': distribution.bins(),
+        'you': None,
+    }
+    if user_id is not None:
+        cur.execute(STUDENT_BEST_SQL, (quiz_id, user_id))
+        row = cur.fetchone()
+        if row:
+            result['you'] = {
+                'best_score': row[0],
+                'best_at': row[1].isoformat() if row[1] else None,
+                'attempts': row[2],
+                'rank': distribution.rank(row[0]),
+                'percentile': distribution.percentile(row[0]),
+            }
+    return result
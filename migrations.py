@@ -0,0 +1,886 @@
+# migrations.py (Versioned schema migrations)
+import logging
+import time
+
+import partitions
+
+logger = logging.getLogger(__name__)
+
+# Serialises migration runs across gunicorn workers and app instances
+MIGRATION_LOCK_KEY = 727_274_101
+
+# Seconds between attempts to take the migration lock. A runner waits by
+# polling rather than blocking in pg_advisory_lock: a blocked statement holds
+# a snapshot, and CREATE INDEX CONCURRENTLY in the runner that has the lock
+# waits for every older snapshot, so the two would wait on each other.
+MIGRATION_LOCK_POLL = 0.5
+
+
+class Migration:
+    """One schema change, applied exactly once and recorded in schema_version.
+
+    ``statements`` run together in a single transaction; an entry may also be
+    a callable taking the cursor. ``indexes`` maps index names to their
+    definitions (everything after the name); those are built with
+    CREATE INDEX CONCURRENTLY outside a transaction so writes keep flowing,
+    after which ``drop_indexes`` are removed the same way.
+    """
+
+    def __init__(self, version, description, statements=(), indexes=None, drop_indexes=()):
+        if statements and (indexes or drop_indexes):
+            raise ValueError('A migration is either transactional or concurrent, not both')
+        self.version = version
+        self.description = description
+        self.statements = list(statements)
+        self.indexes = dict(indexes or {})
+        self.drop_indexes = list(drop_indexes)
+
+    def apply(self, cur):
+        if self.statements:
+            cur.execute("BEGIN")
+            try:
+                for statement in self.statements:
+                    if callable(statement):
+                        statement(cur)
+                    else:
+                        cur.execute(statement)
+                self._record(cur)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            return
+
+        for name, definition in self.indexes.items():
+            # A failed concurrent build leaves an INVALID index behind that
+            # IF NOT EXISTS would happily skip; drop it and start over
+            cur.execute("""
+                SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = %s AND NOT i.indisvalid
+            """, (name,))
+            if cur.fetchone():
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+        for name in self.drop_indexes:
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        self._record(cur)
+
+    def _record(self, cur):
+        cur.execute(
+            "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+            (self.version, self.description)
+        )
+
+
+def _student_stats_triggers():
+    statements = []
+    for op, referencing in (('INSERT', 'NEW TABLE AS new_rows'), ('DELETE', 'OLD TABLE AS old_rows')):
+        statements += [
+            f"DROP TRIGGER IF EXISTS quiz_attempts_student_stats_{op.lower()} ON quiz_attempts",
+            f"""
+            CREATE TRIGGER quiz_attempts_student_stats_{op.lower()} AFTER {op} ON quiz_attempts
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION student_stats_trigger()
+            """,
+        ]
+    return statements
+
+
+def _trigram_indexes(cur):
+    """Trigram indexes for typo-tolerant title and question search. pg_trgm
+    ships with contrib, which not every server has; without it search stays
+    full-text only (search.py checks for the extension)."""
+    cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    if cur.fetchone() is None:
+        logger.warning('pg_trgm is not available; search will not match misspelt words')
+        return
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    cur.execute("CREATE INDEX IF NOT EXISTS quizzes_title_trgm_idx ON quizzes USING gin (title gin_trgm_ops)")
+    cur.execute("CREATE INDEX IF NOT EXISTS questions_text_trgm_idx ON questions USING gin (question_text gin_trgm_ops)")
+
+
+def rebuild_dashboard_counters(cur):
+    """Recount the dashboard counters from the base tables (seeding / repair)"""
+    cur.execute("LOCK TABLE quizzes, users, quiz_attempts IN SHARE MODE")
+    cur.execute("DELETE FROM dashboard_counters")
+    cur.execute("""
+        INSERT INTO dashboard_counters (name, shard, value) VALUES
+            ('quizzes', 0, (SELECT COUNT(*) FROM quizzes)),
+            ('students', 0, (SELECT COUNT(*) FROM users WHERE role = 'student')),
+            ('attempts', 0, (SELECT COUNT(*) FROM quiz_attempts))
+    """)
+
+
+def rebuild_leaderboards(cur):
+    """Recompute every quiz's best scores and score histogram from quiz_attempts (seeding / repair)"""
+    cur.execute("LOCK TABLE quiz_attempts IN SHARE MODE")
+    cur.execute("DELETE FROM quiz_best_scores")
+    cur.execute("DELETE FROM quiz_score_histogram")
+    # The histogram follows through the quiz_best_scores trigger
+    cur.execute("""
+        INSERT INTO quiz_best_scores (quiz_id, user_id, best_score, best_attempt_id, best_at, attempts)
+        SELECT DISTINCT ON (quiz_id, user_id)
+               quiz_id, user_id, COALESCE(score, 0), id, attempted_at,
+               COUNT(*) OVER (PARTITION BY quiz_id, user_id)
+        FROM quiz_attempts
+        ORDER BY quiz_id, user_id, COALESCE(score, 0) DESC, attempted_at, id
+    """)
+
+
+def rebuild_student_stats(cur):
+    """Recompute every student's statistics rollup from quiz_attempts (seeding / repair)"""
+    cur.execute("LOCK TABLE quiz_attempts IN SHARE MODE")
+    cur.execute("DELETE FROM student_stats")
+    cur.execute("INSERT INTO student_stats SELECT * FROM compute_student_stats(NULL)")
+
+
+def _replace_fk(table, column, target):
+    # Recreate a foreign key with ON DELETE CASCADE (older databases were
+    # created without it)
+    constraint = f"{table}_{column}_fkey"
+    return f"""
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM information_schema.table_constraints tc
+                WHERE tc.constraint_name = '{constraint}'
+                  AND tc.table_name = '{table}'
+            ) THEN
+                ALTER TABLE {table} DROP CONSTRAINT {constraint};
+            END IF;
+            ALTER TABLE {table}
+                ADD CONSTRAINT {constraint}
+                FOREIGN KEY ({column}) REFERENCES {target}(id) ON DELETE CASCADE;
+        END$$;
+    """
+
+
+def _counter_triggers():
+    statements = []
+    for table, counter in (('quizzes', 'quizzes'), ('quiz_attempts', 'attempts')):
+        statements += [
+            f"DROP TRIGGER IF EXISTS {table}_count_ins ON {table}",
+            f"""
+            CREATE TRIGGER {table}_count_ins AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION count_rows_trigger('{counter}')
+            """,
+            f"DROP TRIGGER IF EXISTS {table}_count_del ON {table}",
+            f"""
+            CREATE TRIGGER {table}_count_del AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION count_rows_trigger('{counter}')
+            """,
+        ]
+    for op, referencing in (('INSERT', 'NEW TABLE AS new_rows'),
+                            ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+                            ('DELETE', 'OLD TABLE AS old_rows')):
+        statements += [
+            f"DROP TRIGGER IF EXISTS users_count_{op.lower()} ON users",
+            f"""
+            CREATE TRIGGER users_count_{op.lower()} AFTER {op} ON users
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION count_students_trigger()
+            """,
+        ]
+    return statements
+
+
+def _leaderboard_triggers():
+    statements = []
+    for table, function, ops in (
+            ('quiz_attempts', 'best_scores_trigger', ('INSERT', 'DELETE')),
+            ('quiz_best_scores', 'score_histogram_trigger', ('INSERT', 'UPDATE', 'DELETE'))):
+        for op in ops:
+            referencing = {'INSERT': 'NEW TABLE AS new_rows',
+                           'UPDATE': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+                           'DELETE': 'OLD TABLE AS old_rows'}[op]
+            statements += [
+                f"DROP TRIGGER IF EXISTS {table}_leaderboard_{op.lower()} ON {table}",
+                f"""
+                CREATE TRIGGER {table}_leaderboard_{op.lower()} AFTER {op} ON {table}
+                REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+                """,
+            ]
+    return statements
+
+
+def _create_attempt_partitions(cur):
+    # Every month that already has attempts, through the months ahead
+    cur.execute("SELECT MIN(attempted_at) FROM quiz_attempts_unpartitioned")
+    partitions.ensure_partitions(cur, since=cur.fetchone()[0])
+
+
+MIGRATIONS = [
+    Migration(1, 'Base tables', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(80) UNIQUE NOT NULL,
+            email VARCHAR(120) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            role VARCHAR(20) NOT NULL DEFAULT 'student',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS quizzes (
+            id SERIAL PRIMARY KEY,
+            title VARCHAR(255) NOT NULL,
+            description TEXT,
+            created_by INTEGER REFERENCES users(id),
+            passing_score INTEGER DEFAULT 60,
+            duration_minutes INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Older databases predate the duration column
+        "ALTER TABLE quizzes ADD COLUMN IF NOT EXISTS duration_minutes INTEGER DEFAULT 0",
+        '''
+        CREATE TABLE IF NOT EXISTS questions (
+            id SERIAL PRIMARY KEY,
+            quiz_id INTEGER REFERENCES quizzes(id) ON DELETE CASCADE,
+            question_text TEXT NOT NULL,
+            question_type VARCHAR(20) DEFAULT 'multiple_choice',
+            options JSONB,
+            correct_answer VARCHAR(255) NOT NULL,
+            points INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_attempts (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id),
+            quiz_id INTEGER REFERENCES quizzes(id),
+            score INTEGER,
+            passed BOOLEAN,
+            attempted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        _replace_fk('quiz_attempts', 'quiz_id', 'quizzes'),
+        _replace_fk('quiz_attempts', 'user_id', 'users'),
+        '''
+        CREATE TABLE IF NOT EXISTS user_answers (
+            id SERIAL PRIMARY KEY,
+            attempt_id INTEGER REFERENCES quiz_attempts(id) ON DELETE CASCADE,
+            question_id INTEGER REFERENCES questions(id),
+            selected_answer VARCHAR(255),
+            is_correct BOOLEAN
+        )
+        ''',
+    ]),
+
+    # Dashboard counters, kept current by statement-level triggers so the
+    # admin dashboard never has to COUNT(*) the base tables. Each counter is
+    # spread over shards (picked by backend pid) so concurrent quiz
+    # submissions do not queue on a single row lock; readers SUM the shards.
+    # The triggers hold locks on the base tables until commit, so the seed
+    # counts taken in the same transaction cannot drift.
+    Migration(2, 'Dashboard counters', [
+        '''
+        CREATE TABLE IF NOT EXISTS dashboard_counters (
+            name VARCHAR(40) NOT NULL,
+            shard SMALLINT NOT NULL,
+            value BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, shard)
+        )
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION bump_dashboard_counter(counter_name TEXT, delta BIGINT)
+        RETURNS void AS $$
+        BEGIN
+            IF delta <> 0 THEN
+                INSERT INTO dashboard_counters (name, shard, value)
+                VALUES (counter_name, pg_backend_pid() % 16, delta)
+                ON CONFLICT (name, shard)
+                DO UPDATE SET value = dashboard_counters.value + EXCLUDED.value;
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION count_rows_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM bump_dashboard_counter(TG_ARGV[0], (SELECT COUNT(*) FROM new_rows));
+            ELSE
+                PERFORM bump_dashboard_counter(TG_ARGV[0], -(SELECT COUNT(*) FROM old_rows));
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION count_students_trigger() RETURNS trigger AS $$
+        DECLARE
+            delta BIGINT := 0;
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                delta := delta + (SELECT COUNT(*) FROM new_rows WHERE role = 'student');
+            END IF;
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                delta := delta - (SELECT COUNT(*) FROM old_rows WHERE role = 'student');
+            END IF;
+            PERFORM bump_dashboard_counter('students', delta);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        *_counter_triggers(),
+        rebuild_dashboard_counters,
+    ]),
+
+    # Foreign keys and sort columns used by every hot query. The listing
+    # indexes double as covering indexes (INCLUDE) so dashboard pages and
+    # per-student counts can be answered with index-only scans.
+    Migration(3, 'Query indexes', indexes={
+        'questions_quiz_id_idx':
+            'ON questions (quiz_id, id)',
+        'quizzes_created_at_id_idx':
+            'ON quizzes (created_at DESC, id DESC)',
+        'quizzes_created_by_created_at_id_idx':
+            'ON quizzes (created_by, created_at DESC, id DESC)',
+        'users_created_at_id_cov_idx':
+            'ON users (created_at DESC, id DESC) INCLUDE (username, email, role)',
+        'quiz_attempts_user_recent_idx':
+            'ON quiz_attempts (user_id, attempted_at DESC, id DESC) INCLUDE (quiz_id, score, passed)',
+        'quiz_attempts_quiz_recent_idx':
+            'ON quiz_attempts (quiz_id, attempted_at DESC, id DESC) INCLUDE (user_id, score, passed)',
+        'quiz_attempts_attempted_at_idx':
+            'ON quiz_attempts (attempted_at)',
+        'user_answers_attempt_id_idx':
+            'ON user_answers (attempt_id)',
+        'user_answers_question_id_idx':
+            'ON user_answers (question_id)',
+    }, drop_indexes=[
+        # Superseded by the covering variants above
+        'users_created_at_id_idx',
+        'quiz_attempts_user_attempted_at_id_idx',
+        'quiz_attempts_quiz_attempted_at_id_idx',
+    ]),
+
+    # Server-side attempt sessions: opened when a student starts a quiz,
+    # updated by autosave deltas (question id -> answer in ``answers``) and
+    # sealed into quiz_attempts on submit. At most one open session per
+    # student and quiz.
+    Migration(4, 'Attempt sessions', [
+        '''
+        CREATE TABLE IF NOT EXISTS attempt_sessions (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            quiz_id INTEGER NOT NULL REFERENCES quizzes(id) ON DELETE CASCADE,
+            started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            deadline TIMESTAMP,
+            answers JSONB NOT NULL DEFAULT '{}',
+            saved_at TIMESTAMP,
+            sealed_at TIMESTAMP,
+            attempt_id INTEGER REFERENCES quiz_attempts(id) ON DELETE SET NULL
+        )
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS attempt_sessions_open_idx
+            ON attempt_sessions (user_id, quiz_id) WHERE sealed_at IS NULL
+        ''',
+    ]),
+
+    # Row versions behind the ETags of the admin JSON endpoints and the quiz
+    # page, bumped by every UPDATE that changes what those return (quizzes
+    # already have one). Existing rows start at the migration time.
+    Migration(5, 'Question and user versions', [
+        "ALTER TABLE questions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+    ]),
+
+    # The quiz page lists usernames, so its validator includes the latest
+    # user change
+    Migration(6, 'User version index', indexes={
+        'users_updated_at_idx': 'ON users (updated_at)',
+    }),
+
+    # A quiz is deleted with a single statement. Its questions cascade, and
+    # their recorded answers must go with them rather than block the delete
+    # before the attempts' own cascade has reached them.
+    Migration(7, 'Cascade answers with their question', [
+        _replace_fk('user_answers', 'question_id', 'questions'),
+    ]),
+
+    # Leaderboards: each student's best attempt per quiz, and per quiz how
+    # many students have each best score (0-100), both kept current by
+    # statement-level triggers in the transaction that records or deletes
+    # attempts (including the cascades from deleting a user or quiz). Top-k,
+    # ranks and percentiles then read at most k rows plus 101 buckets,
+    # however many attempts a quiz has. The histogram is sharded like the
+    # dashboard counters; readers SUM the shards.
+    Migration(8, 'Quiz leaderboards', [
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_best_scores (
+            quiz_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            best_score INTEGER NOT NULL,
+            best_attempt_id INTEGER NOT NULL,
+            best_at TIMESTAMP,
+            attempts INTEGER NOT NULL,
+            PRIMARY KEY (quiz_id, user_id)
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS quiz_best_scores_rank_idx
+            ON quiz_best_scores (quiz_id, best_score DESC, best_at, user_id)
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_score_histogram (
+            quiz_id INTEGER NOT NULL,
+            score SMALLINT NOT NULL,
+            shard SMALLINT NOT NULL,
+            students BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (quiz_id, score, shard)
+        )
+        ''',
+        # New attempts raise a best score only when they beat it (ties keep
+        # the earlier attempt); deleted attempts recompute the pairs they
+        # touched from what remains, dropping pairs with nothing left
+        '''
+        CREATE OR REPLACE FUNCTION best_scores_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO quiz_best_scores AS b (quiz_id, user_id, best_score, best_attempt_id, best_at, attempts)
+                SELECT DISTINCT ON (quiz_id, user_id)
+                       quiz_id, user_id, COALESCE(score, 0), id, attempted_at,
+                       COUNT(*) OVER (PARTITION BY quiz_id, user_id)
+                FROM new_rows
+                ORDER BY quiz_id, user_id, COALESCE(score, 0) DESC, attempted_at, id
+                ON CONFLICT (quiz_id, user_id) DO UPDATE SET
+                    attempts = b.attempts + EXCLUDED.attempts,
+                    best_score = GREATEST(b.best_score, EXCLUDED.best_score),
+                    best_attempt_id = CASE WHEN EXCLUDED.best_score > b.best_score
+                                           THEN EXCLUDED.best_attempt_id ELSE b.best_attempt_id END,
+                    best_at = CASE WHEN EXCLUDED.best_score > b.best_score
+                                   THEN EXCLUDED.best_at ELSE b.best_at END;
+            ELSE
+                DELETE FROM quiz_best_scores b
+                USING (SELECT DISTINCT quiz_id, user_id FROM old_rows) l
+                WHERE b.quiz_id = l.quiz_id AND b.user_id = l.user_id
+                  AND NOT EXISTS (SELECT 1 FROM quiz_attempts a
+                                  WHERE a.quiz_id = l.quiz_id AND a.user_id = l.user_id);
+                UPDATE quiz_best_scores b
+                SET best_score = r.score, best_attempt_id = r.id, best_at = r.attempted_at, attempts = r.attempts
+                FROM (
+                    SELECT DISTINCT ON (a.quiz_id, a.user_id)
+                           a.quiz_id, a.user_id, COALESCE(a.score, 0) AS score, a.id, a.attempted_at,
+                           COUNT(*) OVER (PARTITION BY a.quiz_id, a.user_id) AS attempts
+                    FROM quiz_attempts a
+                    JOIN (SELECT DISTINCT quiz_id, user_id FROM old_rows) l
+                      ON a.quiz_id = l.quiz_id AND a.user_id = l.user_id
+                    ORDER BY a.quiz_id, a.user_id, COALESCE(a.score, 0) DESC, a.attempted_at, a.id
+                ) r
+                WHERE b.quiz_id = r.quiz_id AND b.user_id = r.user_id
+                  AND (b.best_attempt_id, b.attempts) IS DISTINCT FROM (r.id, r.attempts);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION bump_score_histogram(deltas JSONB) RETURNS void AS $$
+        BEGIN
+            INSERT INTO quiz_score_histogram AS h (quiz_id, score, shard, students)
+            SELECT d.quiz_id, d.score, pg_backend_pid() % 16, d.delta
+            FROM jsonb_to_recordset(deltas) AS d(quiz_id INTEGER, score SMALLINT, delta BIGINT)
+            WHERE d.delta <> 0
+            ORDER BY d.quiz_id, d.score
+            ON CONFLICT (quiz_id, score, shard) DO UPDATE SET students = h.students + EXCLUDED.students;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION score_histogram_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM bump_score_histogram((
+                    SELECT jsonb_agg(d) FROM (
+                        SELECT quiz_id, best_score AS score, COUNT(*) AS delta
+                        FROM new_rows GROUP BY quiz_id, best_score) d));
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM bump_score_histogram((
+                    SELECT jsonb_agg(d) FROM (
+                        SELECT quiz_id, score, SUM(delta) AS delta FROM (
+                            SELECT quiz_id, best_score AS score, 1 AS delta FROM new_rows
+                            UNION ALL
+                            SELECT quiz_id, best_score, -1 FROM old_rows
+                        ) moved GROUP BY quiz_id, score) d));
+            ELSE
+                PERFORM bump_score_histogram((
+                    SELECT jsonb_agg(d) FROM (
+                        SELECT quiz_id, best_score AS score, -COUNT(*) AS delta
+                        FROM old_rows GROUP BY quiz_id, best_score) d));
+                -- A deleted quiz leaves nothing behind
+                DELETE FROM quiz_score_histogram h
+                WHERE h.quiz_id IN (SELECT DISTINCT quiz_id FROM old_rows)
+                  AND NOT EXISTS (SELECT 1 FROM quizzes z WHERE z.id = h.quiz_id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        *_leaderboard_triggers(),
+        rebuild_leaderboards,
+    ]),
+
+    # Attempts and answers partitioned by month of attempted_at (see
+    # partitions.py), so old months can be detached and archived instead of
+    # bloating the live tables. The primary keys include attempted_at, and
+    # answers copy their attempt's attempted_at so both land in the same
+    # month. The tables are rebuilt under their old names and ids (same
+    # sequences); attempt_sessions keeps attempt_id without a foreign key.
+    # Leaderboard pairs touched by deletes are refreshed by a function the
+    # archival job calls too.
+    Migration(9, 'Partition attempts and answers by month', [
+        '''
+        CREATE OR REPLACE FUNCTION refresh_best_scores(quiz_ids INTEGER[], user_ids INTEGER[])
+        RETURNS void AS $$
+        BEGIN
+            DELETE FROM quiz_best_scores b
+            USING unnest(quiz_ids, user_ids) AS l(quiz_id, user_id)
+            WHERE b.quiz_id = l.quiz_id AND b.user_id = l.user_id
+              AND NOT EXISTS (SELECT 1 FROM quiz_attempts a
+                              WHERE a.quiz_id = l.quiz_id AND a.user_id = l.user_id);
+            UPDATE quiz_best_scores b
+            SET best_score = r.score, best_attempt_id = r.id, best_at = r.attempted_at, attempts = r.attempts
+            FROM (
+                SELECT DISTINCT ON (a.quiz_id, a.user_id)
+                       a.quiz_id, a.user_id, COALESCE(a.score, 0) AS score, a.id, a.attempted_at,
+                       COUNT(*) OVER (PARTITION BY a.quiz_id, a.user_id) AS attempts
+                FROM quiz_attempts a
+                JOIN unnest(quiz_ids, user_ids) AS l(quiz_id, user_id)
+                  ON a.quiz_id = l.quiz_id AND a.user_id = l.user_id
+                ORDER BY a.quiz_id, a.user_id, COALESCE(a.score, 0) DESC, a.attempted_at, a.id
+            ) r
+            WHERE b.quiz_id = r.quiz_id AND b.user_id = r.user_id
+              AND (b.best_attempt_id, b.attempts) IS DISTINCT FROM (r.id, r.attempts);
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION best_scores_trigger() RETURNS trigger AS $$
+        DECLARE
+            quiz_ids INTEGER[];
+            user_ids INTEGER[];
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO quiz_best_scores AS b (quiz_id, user_id, best_score, best_attempt_id, best_at, attempts)
+                SELECT DISTINCT ON (quiz_id, user_id)
+                       quiz_id, user_id, COALESCE(score, 0), id, attempted_at,
+                       COUNT(*) OVER (PARTITION BY quiz_id, user_id)
+                FROM new_rows
+                ORDER BY quiz_id, user_id, COALESCE(score, 0) DESC, attempted_at, id
+                ON CONFLICT (quiz_id, user_id) DO UPDATE SET
+                    attempts = b.attempts + EXCLUDED.attempts,
+                    best_score = GREATEST(b.best_score, EXCLUDED.best_score),
+                    best_attempt_id = CASE WHEN EXCLUDED.best_score > b.best_score
+                                           THEN EXCLUDED.best_attempt_id ELSE b.best_attempt_id END,
+                    best_at = CASE WHEN EXCLUDED.best_score > b.best_score
+                                   THEN EXCLUDED.best_at ELSE b.best_at END;
+            ELSE
+                SELECT array_agg(quiz_id), array_agg(user_id) INTO quiz_ids, user_ids
+                FROM (SELECT DISTINCT quiz_id, user_id FROM old_rows) pairs;
+                PERFORM refresh_best_scores(quiz_ids, user_ids);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        "ALTER TABLE attempt_sessions DROP CONSTRAINT IF EXISTS attempt_sessions_attempt_id_fkey",
+        "ALTER TABLE quiz_attempts RENAME TO quiz_attempts_unpartitioned",
+        "ALTER TABLE user_answers RENAME TO user_answers_unpartitioned",
+        # Keep the id sequences when the old tables are dropped
+        "ALTER SEQUENCE quiz_attempts_id_seq OWNED BY NONE",
+        "ALTER SEQUENCE user_answers_id_seq OWNED BY NONE",
+        '''
+        CREATE TABLE quiz_attempts (
+            id INTEGER NOT NULL DEFAULT nextval('quiz_attempts_id_seq'),
+            user_id INTEGER,
+            quiz_id INTEGER,
+            score INTEGER,
+            passed BOOLEAN,
+            attempted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) PARTITION BY RANGE (attempted_at)
+        ''',
+        '''
+        CREATE TABLE user_answers (
+            id INTEGER NOT NULL DEFAULT nextval('user_answers_id_seq'),
+            attempt_id INTEGER,
+            question_id INTEGER,
+            selected_answer VARCHAR(255),
+            is_correct BOOLEAN,
+            attempted_at TIMESTAMP NOT NULL
+        ) PARTITION BY RANGE (attempted_at)
+        ''',
+        _create_attempt_partitions,
+        '''
+        INSERT INTO quiz_attempts (id, user_id, quiz_id, score, passed, attempted_at)
+        SELECT id, user_id, quiz_id, score, passed, COALESCE(attempted_at, LOCALTIMESTAMP)
+        FROM quiz_attempts_unpartitioned
+        ''',
+        # Answers without an attempt cannot be placed (and were unreachable)
+        '''
+        INSERT INTO user_answers (id, attempt_id, question_id, selected_answer, is_correct, attempted_at)
+        SELECT ua.id, ua.attempt_id, ua.question_id, ua.selected_answer, ua.is_correct, qa.attempted_at
+        FROM user_answers_unpartitioned ua
+        JOIN quiz_attempts qa ON qa.id = ua.attempt_id
+        ''',
+        "DROP TABLE user_answers_unpartitioned",
+        "DROP TABLE quiz_attempts_unpartitioned",
+        "ALTER SEQUENCE quiz_attempts_id_seq OWNED BY quiz_attempts.id",
+        "ALTER SEQUENCE user_answers_id_seq OWNED BY user_answers.id",
+        "ALTER TABLE quiz_attempts ADD CONSTRAINT quiz_attempts_pkey PRIMARY KEY (id, attempted_at)",
+        "ALTER TABLE user_answers ADD CONSTRAINT user_answers_pkey PRIMARY KEY (id, attempted_at)",
+        '''
+        ALTER TABLE quiz_attempts
+            ADD CONSTRAINT quiz_attempts_user_id_fkey
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            ADD CONSTRAINT quiz_attempts_quiz_id_fkey
+                FOREIGN KEY (quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE
+        ''',
+        '''
+        ALTER TABLE user_answers
+            ADD CONSTRAINT user_answers_attempt_id_fkey
+                FOREIGN KEY (attempt_id, attempted_at) REFERENCES quiz_attempts(id, attempted_at) ON DELETE CASCADE,
+            ADD CONSTRAINT user_answers_question_id_fkey
+                FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE
+        ''',
+        # Same indexes as before (migration 3), now per partition
+        '''
+        CREATE INDEX quiz_attempts_user_recent_idx
+            ON quiz_attempts (user_id, attempted_at DESC, id DESC) INCLUDE (quiz_id, score, passed)
+        ''',
+        '''
+        CREATE INDEX quiz_attempts_quiz_recent_idx
+            ON quiz_attempts (quiz_id, attempted_at DESC, id DESC) INCLUDE (user_id, score, passed)
+        ''',
+        "CREATE INDEX quiz_attempts_attempted_at_idx ON quiz_attempts (attempted_at)",
+        "CREATE INDEX user_answers_attempt_id_idx ON user_answers (attempt_id)",
+        "CREATE INDEX user_answers_question_id_idx ON user_answers (question_id)",
+        # After the copy, which must not count twice
+        *_counter_triggers(),
+        *_leaderboard_triggers(),
+    ]),
+
+    # Question banks (sampling.py): a quiz may draw sample_size questions per
+    # attempt, balanced across question tags or point values, and shuffle
+    # question and option order. The attempt session keeps the seed and the
+    # drawn question ids, so a resumed attempt shows the same questions and
+    # grading reads only those. All nullable: existing quizzes and open
+    # sessions serve every question in order, as before.
+    Migration(10, 'Question banks', [
+        "ALTER TABLE questions ADD COLUMN IF NOT EXISTS tag VARCHAR(80)",
+        '''
+        ALTER TABLE quizzes
+            ADD COLUMN IF NOT EXISTS sample_size INTEGER CHECK (sample_size > 0),
+            ADD COLUMN IF NOT EXISTS sample_by VARCHAR(10) CHECK (sample_by IN ('tag', 'points')),
+            ADD COLUMN IF NOT EXISTS shuffle BOOLEAN NOT NULL DEFAULT FALSE
+        ''',
+        '''
+        ALTER TABLE attempt_sessions
+            ADD COLUMN IF NOT EXISTS seed BIGINT,
+            ADD COLUMN IF NOT EXISTS question_ids INTEGER[]
+        ''',
+    ]),
+
+    # Full-text search (search.py): weighted tsvectors kept current by
+    # Postgres as stored generated columns, with GIN indexes. Adding a stored
+    # column rewrites both tables under an exclusive lock, so the indexes are
+    # built in the same transaction rather than concurrently afterwards.
+    Migration(11, 'Full-text search', [
+        '''
+        ALTER TABLE quizzes ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED
+        ''',
+        '''
+        ALTER TABLE questions ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(question_text, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(tag, '')), 'B')
+        ) STORED
+        ''',
+        "CREATE INDEX IF NOT EXISTS quizzes_search_idx ON quizzes USING gin (search_vector)",
+        "CREATE INDEX IF NOT EXISTS questions_search_idx ON questions USING gin (search_vector)",
+        _trigram_indexes,
+    ]),
+
+    # Student statistics (student_stats.py): one row per student with their
+    # attempt and pass totals, score sum and last attempt, plus per quiz the
+    # attempts, passes, best score, score sum and last attempt as JSONB. A
+    # statement-level trigger folds new attempts in within the transaction
+    # that records them; deleted attempts (a user, a quiz, an archived month)
+    # recompute the students they belonged to from what remains. The student
+    # dashboard then reads everything with one primary-key lookup.
+    Migration(12, 'Student statistics', [
+        '''
+        CREATE TABLE IF NOT EXISTS student_stats (
+            user_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL,
+            passed INTEGER NOT NULL,
+            score_sum BIGINT NOT NULL,
+            last_attempt_at TIMESTAMP,
+            quizzes JSONB NOT NULL DEFAULT '{}'
+        )
+        ''',
+        # Rollups from quiz_attempts for the given students (NULL: everyone);
+        # the same shape as the student_stats rows
+        '''
+        CREATE OR REPLACE FUNCTION compute_student_stats(user_ids INTEGER[])
+        RETURNS TABLE (user_id INTEGER, attempts INTEGER, passed INTEGER, score_sum BIGINT,
+                       last_attempt_at TIMESTAMP, quizzes JSONB) AS $$
+            SELECT q.user_id, SUM(q.attempts)::int, SUM(q.passed)::int, SUM(q.score_sum)::bigint, MAX(q.last_at),
+                   COALESCE(jsonb_object_agg(q.quiz_id, jsonb_build_object(
+                       'attempts', q.attempts, 'passed', q.passed, 'best', q.best,
+                       'score_sum', q.score_sum, 'last_at', q.last_at)) FILTER (WHERE q.quiz_id IS NOT NULL), '{}')
+            FROM (
+                SELECT a.user_id, a.quiz_id, COUNT(*) AS attempts, COUNT(*) FILTER (WHERE a.passed) AS passed,
+                       MAX(COALESCE(a.score, 0)) AS best, SUM(COALESCE(a.score, 0)) AS score_sum,
+                       MAX(a.attempted_at) AS last_at
+                FROM quiz_attempts a
+                WHERE a.user_id IS NOT NULL AND (user_ids IS NULL OR a.user_id = ANY(user_ids))
+                GROUP BY a.user_id, a.quiz_id
+            ) q
+            GROUP BY q.user_id
+        $$ LANGUAGE sql STABLE
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION refresh_student_stats(user_ids INTEGER[]) RETURNS void AS $$
+        BEGIN
+            DELETE FROM student_stats WHERE user_id = ANY(user_ids);
+            INSERT INTO student_stats SELECT * FROM compute_student_stats(user_ids);
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        # Per-quiz entries of two rollups added together (timestamps are ISO
+        # text, so the later one is also the greater string)
+        '''
+        CREATE OR REPLACE FUNCTION merge_student_quizzes(current JSONB, added JSONB) RETURNS JSONB AS $$
+            SELECT current || COALESCE(jsonb_object_agg(e.key, CASE WHEN current -> e.key IS NULL THEN e.value
+                ELSE jsonb_build_object(
+                    'attempts', (current -> e.key ->> 'attempts')::int + (e.value ->> 'attempts')::int,
+                    'passed', (current -> e.key ->> 'passed')::int + (e.value ->> 'passed')::int,
+                    'best', GREATEST((current -> e.key ->> 'best')::int, (e.value ->> 'best')::int),
+                    'score_sum', (current -> e.key ->> 'score_sum')::bigint + (e.value ->> 'score_sum')::bigint,
+                    'last_at', GREATEST(current -> e.key ->> 'last_at', e.value ->> 'last_at'))
+                END), '{}')
+            FROM jsonb_each(added) e
+        $$ LANGUAGE sql IMMUTABLE
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION student_stats_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO student_stats AS s (user_id, attempts, passed, score_sum, last_attempt_at, quizzes)
+                SELECT q.user_id, SUM(q.attempts), SUM(q.passed), SUM(q.score_sum), MAX(q.last_at),
+                       COALESCE(jsonb_object_agg(q.quiz_id, jsonb_build_object(
+                           'attempts', q.attempts, 'passed', q.passed, 'best', q.best,
+                           'score_sum', q.score_sum, 'last_at', q.last_at)) FILTER (WHERE q.quiz_id IS NOT NULL), '{}')
+                FROM (
+                    SELECT user_id, quiz_id, COUNT(*) AS attempts, COUNT(*) FILTER (WHERE passed) AS passed,
+                           MAX(COALESCE(score, 0)) AS best, SUM(COALESCE(score, 0)) AS score_sum,
+                           MAX(attempted_at) AS last_at
+                    FROM new_rows
+                    WHERE user_id IS NOT NULL
+                    GROUP BY user_id, quiz_id
+                ) q
+                GROUP BY q.user_id
+                ORDER BY q.user_id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    attempts = s.attempts + EXCLUDED.attempts,
+                    passed = s.passed + EXCLUDED.passed,
+                    score_sum = s.score_sum + EXCLUDED.score_sum,
+                    last_attempt_at = GREATEST(s.last_attempt_at, EXCLUDED.last_attempt_at),
+                    quizzes = merge_student_quizzes(s.quizzes, EXCLUDED.quizzes);
+            ELSE
+                PERFORM refresh_student_stats(ARRAY(SELECT DISTINCT user_id FROM old_rows WHERE user_id IS NOT NULL));
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        *_student_stats_triggers(),
+        rebuild_student_stats,
+    ]),
+
+    # Listing timestamps (pagination.py): the admin listings page on
+    # (created_at, id), and a row compare against the cursor never matches a
+    # NULL created_at, so such a row was shown on no page after the first and
+    # could not be encoded as a cursor either. Rows of unknown age are dated
+    # to their last update if known, else the epoch, and list last.
+    Migration(13, 'Listing timestamps not null', [
+        "UPDATE users SET created_at = COALESCE(updated_at, 'epoch') WHERE created_at IS NULL",
+        "UPDATE quizzes SET created_at = COALESCE(updated_at, 'epoch') WHERE created_at IS NULL",
+        "ALTER TABLE users ALTER COLUMN created_at SET NOT NULL",
+        "ALTER TABLE quizzes ALTER COLUMN created_at SET NOT NULL",
+    ]),
+]
+
+LATEST_VERSION = max(m.version for m in MIGRATIONS)
+
+
+def current_version(cur):
+    cur.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cur.fetchone()[0]
+
+
+def acquire_migration_lock(cur):
+    """Take the session-level migration lock, polling (the connection is in
+    autocommit, so no snapshot is held between attempts)"""
+    while True:
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        if cur.fetchone()[0]:
+            return
+        time.sleep(MIGRATION_LOCK_POLL)
+
+
+def migrate(conn):
+    """Apply any pending migrations; returns the versions applied.
+
+    Once the schema is current this is a single cheap query and no DDL runs.
+    """
+    with conn.cursor() as cur:
+        if current_version(cur) >= LATEST_VERSION:
+            conn.rollback()
+            return []
+
+    conn.rollback()
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    applied = []
+    try:
+        with conn.cursor() as cur:
+            # Locked first: concurrent CREATE TABLE IF NOT EXISTS can still
+            # collide in the catalog
+            acquire_migration_lock(cur)
+            try:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INTEGER PRIMARY KEY,
+                        description TEXT NOT NULL,
+                        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                # Re-read under the lock: another worker may have finished first
+                cur.execute("SELECT version FROM schema_version")
+                done = {row[0] for row in cur.fetchall()}
+                for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                    if migration.version in done:
+                        continue
+                    logger.info('Applying migration %s: %s', migration.version, migration.description)
+                    migration.apply(cur)
+                    applied.append(migration.version)
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+    finally:
+        conn.autocommit = autocommit
+    return applied
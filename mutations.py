@@ -0,0 +1,369 @@
+# mutations.py (Ownership-checked single-statement admin writes)
+"""
+Every admin write is one conditional statement: the ownership check, the
+optional optimistic-concurrency check and the write itself all live in the
+WHERE clause of a single ``UPDATE``/``DELETE ... RETURNING``. There is no
+separate probe to race against and no extra round trip.
+
+No row back means the write did not apply. Only on that failure path, and
+only when the caller sent the version it last read, a primary-key probe
+tells a stale version (``Conflict``, 409) apart from a row that does not
+exist or belongs to someone else (``NotFound``, 404).
+"""
+from datetime import datetime
+
+import psycopg2.errors
+
+
+class Rejected(Exception):
+    """A write that did not apply; ``status`` and ``body()`` make the response"""
+
+    status = 400
+
+    def __init__(self, message, **details):
+        super().__init__(message)
+        self.details = details
+
+    def body(self):
+        return {'error': str(self), **self.details}
+
+
+class NotFound(Rejected):
+    status = 404
+
+
+class Conflict(Rejected):
+    status = 409
+
+
+def expected_version(data):
+    """The ``expected_updated_at`` the client last read (ISO 8601), or None to write unconditionally"""
+    value = (data or {}).get('expected_updated_at')
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise Rejected('expected_updated_at must be an ISO 8601 timestamp')
+
+
+def version_of(row):
+    """Row version as sent to clients (microsecond precision, unlike jsonify's HTTP dates)"""
+    return row['updated_at'].isoformat() if row['updated_at'] else None
+
+
+def _apply(cur, sql, params, not_found, expected=None, probe_sql=None, probe_params=()):
+    cur.execute(sql, params)
+    row = cur.fetchone()
+    if row is not None:
+        return row
+    if expected is not None and probe_sql:
+        cur.execute(probe_sql, probe_params)
+        current = cur.fetchone()
+        if current is not None:
+            raise Conflict('Changed by someone else since it was loaded; reload and try again',
+                           updated_at=current[0].isoformat() if current[0] else None)
+    raise NotFound(not_found)
+
+
+UPDATE_QUIZ_SQL = """
+    UPDATE quizzes
+    SET title = %s, description = %s, passing_score = %s, updated_at = CURRENT_TIMESTAMP
+    WHERE id = %s AND created_by = %s
+      AND (%s::timestamp IS NULL OR updated_at = %s::timestamp)
+    RETURNING id, updated_at
+"""
+QUIZ_VERSION_SQL = "SELECT updated_at FROM quizzes WHERE id = %s AND created_by = %s"
+
+# The question and its quiz's version (which keys the cached definitions) move
+# together in one statement
+UPDATE_QUESTION_SQL = """
+    WITH question AS (
+        UPDATE questions q
+        SET question_text = %s, question_type = %s, options = %s, correct_answer = %s, points = %s,
+            updated_at = CURRENT_TIMESTAMP
+        FROM quizzes z
+        WHERE q.id = %s AND z.id = q.quiz_id AND z.created_by = %s
+          AND (%s::timestamp IS NULL OR q.updated_at = %s::timestamp)
+        RETURNING q.id, q.quiz_id, q.updated_at
+    ), quiz AS (
+        UPDATE quizzes SET updated_at = CURRENT_TIMESTAMP
+        WHERE id = (SELECT quiz_id FROM question)
+    )
+    SELECT id, quiz_id, updated_at FROM question
+"""
+QUESTION_VERSION_SQL = """
+    SELECT q.updated_at FROM questions q JOIN quizzes z ON z.id = q.quiz_id
+    WHERE q.id = %s AND z.created_by = %s
+"""
+
+UPDATE_USER_SQL = """
+    UPDATE users
+    SET username = %s, email = %s, role = %s, updated_at = CURRENT_TIMESTAMP
+    WHERE id = %s
+      AND (%s::timestamp IS NULL OR updated_at = %s::timestamp)
+    RETURNING id, updated_at
+"""
+USER_VERSION_SQL = "SELECT updated_at FROM users WHERE id = %s"
+
+# Questions, attempts (and their answers) and attempt sessions go with the
+# quiz through ON DELETE CASCADE
+DELETE_QUIZ_SQL = "DELETE FROM quizzes WHERE id = %s AND created_by = %s RETURNING id"
+DELETE_USER_SQL = "DELETE FROM users WHERE id = %s RETURNING id"
+
+
+def update_quiz(cur, quiz_id, owner_id, title, description, passing_score, expected=None):
+    return _apply(cur, UPDATE_QUIZ_SQL,
+                  (title, description, passing_score, quiz_id, owner_id, expected, expected),
+                  'Quiz not found or unauthorized', expected, QUIZ_VERSION_SQL, (quiz_id, owner_id))
+
+
+def update_question(cur, question_id, owner_id, question_text, question_type, options, correct_answer,
+                    points, expected=None):
+    """Returns the row (id, quiz_id, updated_at); ``options`` is the JSON text"""
+    return _apply(cur, UPDATE_QUESTION_SQL,
+                  (question_text, question_type, options, correct_answer, points,
+                   question_id, owner_id, expected, expected),
+                  'Question not found or unauthorized', expected, QUESTION_VERSION_SQL, (question_id, owner_id))
+
+
+def update_user(cur, user_id, username, email, role, expected=None):
+    try:
+        return _apply(cur, UPDATE_USER_SQL, (username, email, role, user_id, expected, expected),
+                      'User not found', expected, USER_VERSION_SQL, (user_id,))
+    except psycopg2.errors.UniqueViolation:
+        raise Conflict('Username or email already in use')
+
+
+def delete_quiz(cur, quiz_id, owner_id):
+    return _apply(cur, DELETE_QUIZ_SQL, (quiz_id, owner_id), 'Quiz not found or unauthorized')
+
+
+def delete_user(cur, user_id):
+    try:
+        return _apply(cur, DELETE_USER_SQL, (user_id,), 'User not found')
+    except psycopg2.errors.ForeignKeyViolation:
+        raise Conflict('User still owns quizzes; delete or reassign them first')
+
+
+# Batch variants: one set-based statement over every requested id in the
+# caller's transaction. Items the WHERE clause filtered out are classified
+# afterwards with one probe over just those ids, so results come back per
+# item, in request order, while the rest of the batch still applies.
+
+DELETE_QUIZZES_SQL = "DELETE FROM quizzes WHERE id = ANY(%s::int[]) AND created_by = %s RETURNING id"
+
+# Admins who still own quizzes are skipped instead of failing the whole batch
+DELETE_USERS_SQL = """
+    DELETE FROM users u
+    WHERE u.id = ANY(%s::int[]) AND u.id <> %s
+      AND NOT EXISTS (SELECT 1 FROM quizzes z WHERE z.created_by = u.id)
+    RETURNING u.id
+"""
+USERS_OWNING_QUIZZES_SQL = """
+    SELECT u.id, EXISTS (SELECT 1 FROM quizzes z WHERE z.created_by = u.id)
+    FROM users u WHERE u.id = ANY(%s::int[])
+"""
+
+# NULL fields are left unchanged, so a batch can set one field on many rows
+UPDATE_QUIZZES_SQL = """
+    UPDATE quizzes z
+    SET title = COALESCE(v.title, z.title),
+        description = COALESCE(v.description, z.description),
+        passing_score = COALESCE(v.passing_score, z.passing_score),
+        updated_at = CURRENT_TIMESTAMP
+    FROM unnest(%s::int[], %s::text[], %s::text[], %s::int[], %s::timestamp[])
+         AS v(id, title, description, passing_score, expected)
+    WHERE z.id = v.id AND z.created_by = %s
+      AND (v.expected IS NULL OR z.updated_at = v.expected)
+    RETURNING z.id, z.updated_at
+"""
+QUIZ_VERSIONS_SQL = "SELECT id, updated_at FROM quizzes WHERE id = ANY(%s::int[]) AND created_by = %s"
+
+UPDATE_USERS_SQL = """
+    UPDATE users u
+    SET username = COALESCE(v.username, u.username),
+        email = COALESCE(v.email, u.email),
+        role = COALESCE(v.role, u.role),
+        updated_at = CURRENT_TIMESTAMP
+    FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[], %s::timestamp[])
+         AS v(id, username, email, role, expected)
+    WHERE u.id = v.id
+      AND (v.expected IS NULL OR u.updated_at = v.expected)
+    RETURNING u.id, u.updated_at
+"""
+USER_VERSIONS_SQL = "SELECT id, updated_at FROM users WHERE id = ANY(%s::int[])"
+TAKEN_NAMES_SQL = "SELECT id, username, email FROM users WHERE username = ANY(%s::text[]) OR email = ANY(%s::text[])"
+
+ROLES = ('admin', 'student')
+
+
+def batch_ids(data, max_items):
+    """Distinct integer ids from ``{"ids": [...]}``, in request order"""
+    ids = (data or {}).get('ids')
+    if not isinstance(ids, list) or not ids:
+        raise Rejected('ids must be a non-empty list')
+    if len(ids) > max_items:
+        raise Rejected(f'At most {max_items} items per batch')
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise Rejected('ids must be integers')
+    return list(dict.fromkeys(ids))
+
+
+def batch_items(data, max_items):
+    """``{"items": [{"id": ..., field: value, ...}]}``, one item per id"""
+    items = (data or {}).get('items')
+    if not isinstance(items, list) or not items:
+        raise Rejected('items must be a non-empty list')
+    if len(items) > max_items:
+        raise Rejected(f'At most {max_items} items per batch')
+    return items
+
+
+def _summary(results):
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return {'results': results, 'summary': summary}
+
+
+def _versions(cur, sql, params):
+    cur.execute(sql, params)
+    return {row[0]: row[1] for row in cur.fetchall()}
+
+
+def delete_quizzes(cur, quiz_ids, owner_id):
+    cur.execute(DELETE_QUIZZES_SQL, (quiz_ids, owner_id))
+    deleted = {row[0] for row in cur.fetchall()}
+    return _summary([{'id': i, 'status': 'deleted'} if i in deleted else
+                     {'id': i, 'status': 'not_found', 'error': 'Quiz not found or unauthorized'}
+                     for i in quiz_ids])
+
+
+def delete_users(cur, user_ids, acting_user_id):
+    cur.execute(DELETE_USERS_SQL, (user_ids, acting_user_id))
+    deleted = {row[0] for row in cur.fetchall()}
+    owners = {}
+    remaining = [i for i in user_ids if i not in deleted]
+    if remaining:
+        owners = _versions(cur, USERS_OWNING_QUIZZES_SQL, (remaining,))
+    results = []
+    for i in user_ids:
+        if i in deleted:
+            results.append({'id': i, 'status': 'deleted'})
+        elif i == acting_user_id:
+            results.append({'id': i, 'status': 'invalid', 'error': 'Cannot delete your own account'})
+        elif owners.get(i):
+            results.append({'id': i, 'status': 'conflict',
+                            'error': 'User still owns quizzes; delete or reassign them first'})
+        else:
+            results.append({'id': i, 'status': 'not_found', 'error': 'User not found'})
+    return _summary(results)
+
+
+def _parse_items(items, fields, check):
+    """One entry per item, in request order: either the item to write (id,
+    ``fields`` and its expected version) or its ``invalid`` result"""
+    parsed, seen = [], set()
+    for item in items:
+        item_id = item.get('id') if isinstance(item, dict) else None
+        try:
+            if not isinstance(item_id, int) or isinstance(item_id, bool):
+                raise Rejected('id must be an integer')
+            if item_id in seen:
+                raise Rejected('Duplicate id in batch')
+            seen.add(item_id)
+            values = {field: item.get(field) for field in fields}
+            if all(v is None for v in values.values()):
+                raise Rejected('Nothing to change')
+            check(item_id, values)
+            parsed.append({'id': item_id, 'expected': expected_version(item), **values})
+        except Rejected as e:
+            parsed.append({'id': item_id, 'status': 'invalid', 'error': str(e)})
+    return parsed
+
+
+def _update_results(parsed, updated, current, not_found):
+    results = []
+    for item in parsed:
+        if 'status' in item:
+            results.append(item)
+        elif item['id'] in updated:
+            results.append({'id': item['id'], 'status': 'updated',
+                            'updated_at': updated[item['id']].isoformat()})
+        elif item['id'] in current:
+            version = current[item['id']]
+            results.append({'id': item['id'], 'status': 'conflict',
+                            'error': 'Changed by someone else since it was loaded; reload and try again',
+                            'updated_at': version.isoformat() if version else None})
+        else:
+            results.append({'id': item['id'], 'status': 'not_found', 'error': not_found})
+    return _summary(results)
+
+
+def _write_batch(cur, sql, parsed, fields, extra, probe_sql, probe_extra):
+    """Runs the batch UPDATE over the valid items; returns (updated, current) versions by id"""
+    valid = [item for item in parsed if 'status' not in item]
+    if not valid:
+        return {}, {}
+    columns = [[item[field] for item in valid] for field in ('id', *fields, 'expected')]
+    cur.execute(sql, (*columns, *extra))
+    updated = dict(cur.fetchall())
+    missed = [item['id'] for item in valid if item['id'] not in updated]
+    current = _versions(cur, probe_sql, (missed, *probe_extra)) if missed else {}
+    return updated, current
+
+
+def update_quizzes(cur, items, owner_id):
+    def check(item_id, values):
+        if values['title'] is not None and (not isinstance(values['title'], str) or not values['title'].strip()):
+            raise Rejected('title must be a non-empty string')
+        if values['description'] is not None and not isinstance(values['description'], str):
+            raise Rejected('description must be a string')
+        score = values['passing_score']
+        if score is not None and (isinstance(score, bool) or not isinstance(score, int) or not 0 <= score <= 100):
+            raise Rejected('passing_score must be an integer between 0 and 100')
+
+    fields = ('title', 'description', 'passing_score')
+    parsed = _parse_items(items, fields, check)
+    updated, current = _write_batch(cur, UPDATE_QUIZZES_SQL, parsed, fields, (owner_id,),
+                                    QUIZ_VERSIONS_SQL, (owner_id,))
+    return _update_results(parsed, updated, current, 'Quiz not found or unauthorized')
+
+
+def update_users(cur, items, acting_user_id):
+    usernames, emails = {}, {}
+
+    def check(item_id, values):
+        for field, taken in (('username', usernames), ('email', emails)):
+            value = values[field]
+            if value is not None:
+                if not isinstance(value, str) or not value.strip():
+                    raise Rejected(f'{field} must be a non-empty string')
+                if taken.setdefault(value, item_id) != item_id:
+                    raise Rejected(f'{field} {value!r} appears twice in the batch')
+        if values['role'] is not None:
+            if values['role'] not in ROLES:
+                raise Rejected(f'role must be one of {", ".join(ROLES)}')
+            if item_id == acting_user_id and values['role'] != 'admin':
+                raise Rejected('Cannot remove your own admin role')
+
+    fields = ('username', 'email', 'role')
+    parsed = _parse_items(items, fields, check)
+    if usernames or emails:
+        # Names already held by other users fail their own item up front; a
+        # race past this check still aborts the batch as a whole below
+        cur.execute(TAKEN_NAMES_SQL, (list(usernames), list(emails)))
+        owners = {}
+        for owner_id, username, email in cur.fetchall():
+            owners[('username', username)] = owners[('email', email)] = owner_id
+        for position, item in enumerate(parsed):
+            for field in ('username', 'email'):
+                if 'status' not in item and owners.get((field, item[field]), item['id']) != item['id']:
+                    parsed[position] = item = {'id': item['id'], 'status': 'conflict',
+                                               'error': f'{field} {item[field]!r} is already in use'}
+    try:
+        updated, current = _write_batch(cur, UPDATE_USERS_SQL, parsed, fields, (), USER_VERSIONS_SQL, ())
+    except psycopg2.errors.UniqueViolation:
+        raise Conflict('A username or email in the batch is already in use; nothing was changed')
+    return _update_results(parsed, updated, current, 'User not found')
@@ -0,0 +1,85 @@
+# pagination.py (Keyset pagination over (timestamp, id) ordered listings)
+import base64
+from datetime import datetime
+
+
+def encode_cursor(ts, row_id):
+    raw = f"{ts.isoformat()}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (timestamp, id) for a cursor token; raises ValueError if malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        ts, row_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(ts), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+# Ranked listings (search.py) seek on (rank, id) instead; repr keeps the
+# float exact, so the next page starts right after the last row
+def encode_rank_cursor(rank, row_id):
+    raw = f"{rank!r}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_rank_cursor(token):
+    """Return (rank, id) for a ranked cursor token; raises ValueError if malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        rank, row_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|')
+        return float(rank), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def page_from_rows(rows, limit, ts_key, id_key='id'):
+    """Split a LIMIT ``limit + 1`` result into the page and the next cursor"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[ts_key], last[id_key])
+
+
+def page_query(select_sql, where_sql, params, sort, cursor=None, limit=20):
+    """Build the SQL and parameters for one page, newest first, seeking past ``cursor``.
+
+    ``sort`` names the SQL columns to order by and the result keys they come
+    back as: ``(ts_column, id_column, ts_key, id_key)``. A composite index on
+    (filter columns..., ts DESC, id DESC) turns every page into an index seek.
+    """
+    ts_column, id_column, ts_key, id_key = sort
+    conditions = [where_sql] if where_sql else []
+    params = list(params)
+    if cursor:
+        conditions.append(f"({ts_column}, {id_column}) < (%s, %s)")
+        params.extend(decode_cursor(cursor))
+    sql = select_sql
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {ts_column} DESC, {id_column} DESC LIMIT %s"
+    params.append(limit + 1)
+    return sql, params
+
+
+def fetch_page(cur, select_sql, where_sql, params, sort, cursor=None, limit=20):
+    """Fetch one page (see ``page_query``); returns (rows, next_cursor)"""
+    sql, params = page_query(select_sql, where_sql, params, sort, cursor, limit)
+    cur.execute(sql, params)
+    return page_from_rows(cur.fetchall(), limit, sort[2], sort[3])
+
+
+def serialize_rows(rows):
+    """Make rows JSON friendly, rendering timestamps as ISO 8601"""
+    result = []
+    for row in rows:
+        item = dict(row)
+        for key, value in item.items():
+            if isinstance(value, datetime):
+                item[key] = value.isoformat()
+        result.append(item)
+    return result
@@ -0,0 +1,289 @@
+# partitions.py (Monthly attempt partitions: creation and archival)
+"""
+``quiz_attempts`` and ``user_answers`` are range-partitioned by
+``attempted_at`` into one partition per calendar month, named
+``<table>_pYYYYMM``. An answer carries its attempt's ``attempted_at``, so an
+attempt and its answers always sit in the same month and the foreign key
+between them is ``(attempt_id, attempted_at)``.
+
+``ensure_partitions`` creates the months that do not exist yet, up to
+``PARTITION_MONTHS_AHEAD`` months ahead. ``init_db`` runs it on every deploy,
+and so does the ``maintain`` command below, which should run from cron at
+least monthly. There is no default partition, because it would stop the
+planner from reading partitions in order for the newest-first listings. An
+insert past the last partition would fail instead of landing somewhere
+unindexed, so the attempt routes also call ``ensure_current`` first: once per
+process and calendar month it checks (and if need be creates) the partitions,
+and a missed cron run cannot stop submissions.
+
+Archiving a month takes three steps, and each one can be re-run:
+
+1. In one transaction, detach both partitions and drop their foreign keys,
+   and take their rows out of the dashboard counter, the leaderboards and
+   the student statistics.
+2. Export each detached table with COPY to ``<table>_pYYYYMM.csv.gz``. Then
+   write ``attempts_pYYYYMM.manifest.json`` with row counts and checksums.
+3. Drop the detached tables (unless asked to keep them).
+
+A month that was detached but not yet exported is picked up again by the
+next run. The files restore with ``COPY ... FROM`` into a table of the same
+shape.
+
+    python partitions.py list
+    python partitions.py maintain --retain-months 24 --archive-dir /var/backups/quiz
+    python partitions.py archive 2023-08 --archive-dir /var/backups/quiz
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ('quiz_attempts', 'user_answers')
+
+# Serialises partition creation across deploys, cron and app workers
+PARTITION_LOCK_KEY = 727_274_102
+
+# Months created ahead of the current one, so inserts never run out of room
+# between maintenance runs
+MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))
+
+# Past months kept attached by ``maintain`` besides the current one (0 keeps
+# everything)
+RETAIN_MONTHS = int(os.getenv('PARTITION_RETAIN_MONTHS', '0'))
+ARCHIVE_DIR = os.getenv('PARTITION_ARCHIVE_DIR', 'archive')
+
+PARTITION_NAME = re.compile(r'^(quiz_attempts|user_answers)_p(\d{4})(\d{2})$')
+
+PARTITIONS_SQL = """
+    SELECT c.relname, i.inhparent IS NOT NULL AS attached
+    FROM pg_class c
+    LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+    WHERE c.relkind = 'r' AND c.relnamespace = 'public'::regnamespace
+      AND c.relname ~ '^(quiz_attempts|user_answers)_p[0-9]{6}$'
+"""
+FOREIGN_KEYS_SQL = "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'"
+# The detached month no longer counts towards the dashboard, the
+# leaderboards or the student statistics, as if its attempts had been deleted.
+# An empty month aggregates to NULL, which compute_student_stats reads as
+# "every student": hence the empty array.
+FORGET_ATTEMPTS_SQL = """
+    SELECT bump_dashboard_counter('attempts', -(SELECT COUNT(*) FROM {table})),
+           refresh_best_scores(array_agg(quiz_id), array_agg(user_id)),
+           refresh_student_stats(COALESCE(array_agg(DISTINCT user_id), '{{}}'))
+    FROM (SELECT DISTINCT quiz_id, user_id FROM {table}) pairs
+"""
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    years, index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def parse_month(text):
+    try:
+        return month_start(datetime.strptime(text, '%Y-%m'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{text!r} is not a YYYY-MM month')
+
+
+def partitions(cur):
+    """{month: {table: attached}} for every monthly partition table, attached or not"""
+    cur.execute(PARTITIONS_SQL)
+    months = {}
+    for name, attached in cur.fetchall():
+        table, year, month = PARTITION_NAME.match(name).groups()
+        months.setdefault(date(int(year), int(month), 1), {})[table] = attached
+    return dict(sorted(months.items()))
+
+
+def ensure_partitions(cur, since=None, ahead=MONTHS_AHEAD):
+    """Create the missing monthly partitions from ``since`` (default: this
+    month) through ``ahead`` months from now; returns the names created.
+    The caller commits."""
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (PARTITION_LOCK_KEY,))
+    existing = partitions(cur)
+    month, last = month_start(since or date.today()), add_months(month_start(date.today()), ahead)
+    created = []
+    while month <= last:
+        for table in PARTITIONED_TABLES:
+            if table not in existing.get(month, {}):
+                name = partition_name(table, month)
+                cur.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                            (month, add_months(month, 1)))
+                created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+# Month for which this process last ran ensure_current
+_checked_month = None
+
+
+def needs_check(today=None):
+    return _checked_month != month_start(today or date.today())
+
+
+def ensure_current(connection, today=None):
+    """ensure_partitions at most once per process and calendar month, on a
+    connection from ``connection()`` (app.get_db_connection); returns the
+    names created. Partitions created here mean ``maintain`` is not running."""
+    global _checked_month
+    if not needs_check(today):
+        return []
+    with connection() as conn, conn.cursor() as cur:
+        created = ensure_partitions(cur)
+        conn.commit()
+    for name in created:
+        logger.warning("Created %s on first write of the month; is 'partitions.py maintain' in cron?", name)
+    _checked_month = month_start(today or date.today())
+    return created
+
+
+def _drop_foreign_keys(cur, table):
+    cur.execute(FOREIGN_KEYS_SQL, (table,))
+    for (constraint,) in cur.fetchall():
+        cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT {constraint}")
+
+
+def detach_month(conn, month):
+    """Step 1: take the month out of the live tables (no-op if already detached)"""
+    attempts, answers = (partition_name(table, month) for table in PARTITIONED_TABLES)
+    with conn.cursor() as cur:
+        state = partitions(cur).get(month, {})
+        # Answers first: their foreign key would otherwise pin the attempts
+        # partition. Detached tables keep copies of the foreign keys, which
+        # would let later deletes cascade into rows awaiting export.
+        if state.get('user_answers'):
+            cur.execute(f"ALTER TABLE user_answers DETACH PARTITION {answers}")
+            _drop_foreign_keys(cur, answers)
+        if state.get('quiz_attempts'):
+            cur.execute(f"ALTER TABLE quiz_attempts DETACH PARTITION {attempts}")
+            _drop_foreign_keys(cur, attempts)
+            cur.execute(FORGET_ATTEMPTS_SQL.format(table=attempts))
+    conn.commit()
+
+
+def export_table(cur, table, directory):
+    """Step 2 for one table: gzip CSV with a header row; returns its manifest entry"""
+    path = os.path.join(directory, f'{table}.csv.gz')
+    partial = path + '.partial'
+    with gzip.open(partial, 'wb') as out:
+        cur.copy_expert(f"COPY {table} TO STDOUT WITH (FORMAT csv, HEADER)", out)
+    rows = cur.rowcount
+    cur.execute(f"SELECT COUNT(*) FROM {table}")
+    expected = cur.fetchone()[0]
+    if rows != expected:
+        os.remove(partial)
+        raise RuntimeError(f'{table}: exported {rows} rows, table has {expected}')
+    digest = hashlib.sha256()
+    with open(partial, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    os.replace(partial, path)
+    return {'file': os.path.basename(path), 'rows': rows, 'sha256': digest.hexdigest()}
+
+
+def archive_month(conn, month, directory, keep_tables=False):
+    """Detach, export and drop one month; returns the manifest, or None when
+    nothing is left of that month"""
+    if month >= month_start(date.today()):
+        raise ValueError(f'{month:%Y-%m} is still receiving attempts; only past months can be archived')
+    os.makedirs(directory, exist_ok=True)
+    detach_month(conn, month)
+    with conn.cursor() as cur:
+        tables = [partition_name(table, month) for table in PARTITIONED_TABLES
+                  if table in partitions(cur).get(month, {})]
+        if not tables:
+            conn.rollback()
+            logger.info("Nothing to archive for %s", f'{month:%Y-%m}')
+            return None
+        manifest = {
+            'month': f'{month:%Y-%m}',
+            'from': month.isoformat(),
+            'to': add_months(month, 1).isoformat(),
+            'archived_at': datetime.now().isoformat(timespec='seconds'),
+            'tables': {table: export_table(cur, table, directory) for table in tables},
+        }
+        conn.rollback()
+        with open(manifest_path(directory, month), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        if not keep_tables:
+            for table in tables:
+                cur.execute(f"DROP TABLE {table}")
+            conn.commit()
+    logger.info("Archived %s: %s", manifest['month'],
+                ', '.join(f"{t} {m['rows']} rows" for t, m in manifest['tables'].items()))
+    return manifest
+
+
+def manifest_path(directory, month):
+    return os.path.join(directory, f'attempts_p{month:%Y%m}.manifest.json')
+
+
+def archivable_months(cur, retain_months, directory, today=None):
+    """Attached months entirely older than the newest ``retain_months``, plus
+    months an earlier run detached but did not finish exporting"""
+    cutoff = add_months(month_start(today or date.today()), -retain_months)
+    return [month for month, tables in partitions(cur).items()
+            if (month < cutoff and any(tables.values()))
+            or (not any(tables.values()) and not os.path.exists(manifest_path(directory, month)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='show monthly partitions and whether they are attached')
+    maintain = sub.add_parser('maintain', help='create upcoming partitions and archive expired ones')
+    maintain.add_argument('--ahead', type=int, default=MONTHS_AHEAD, help='months to create ahead')
+    maintain.add_argument('--retain-months', type=int, default=RETAIN_MONTHS,
+                          help='past months kept attached besides the current one (0: archive nothing)')
+    maintain.add_argument('--archive-dir', default=ARCHIVE_DIR)
+    maintain.add_argument('--keep-tables', action='store_true', help='keep detached tables after export')
+    archive = sub.add_parser('archive', help='archive one month now')
+    archive.add_argument('month', type=parse_month, help='YYYY-MM')
+    archive.add_argument('--archive-dir', default=ARCHIVE_DIR)
+    archive.add_argument('--keep-tables', action='store_true', help='keep detached tables after export')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    from app import get_db_connection
+
+    with get_db_connection() as conn:
+        if args.command == 'list':
+            with conn.cursor() as cur:
+                for month, tables in partitions(cur).items():
+                    states = ', '.join(f"{t} {'attached' if a else 'DETACHED'}" for t, a in sorted(tables.items()))
+                    print(f"{month:%Y-%m}  {states}")
+            return 0
+        if args.command == 'archive':
+            print(json.dumps(archive_month(conn, args.month, args.archive_dir, args.keep_tables), indent=2))
+            return 0
+
+        with conn.cursor() as cur:
+            created = ensure_partitions(cur, ahead=args.ahead)
+            conn.commit()
+            for name in created:
+                logger.info("Created %s", name)
+            months = archivable_months(cur, args.retain_months, args.archive_dir) if args.retain_months > 0 else []
+        for month in months:
+            archive_month(conn, month, args.archive_dir, args.keep_tables)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# passwords.py (bcrypt hashing with a host-wide admission limit)
+import fcntl
+import hmac
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+
+# Slot files shared by the workers of one host (PASSWORD_HASH_SLOT_DIR);
+# workers of one deployment must agree on it
+DEFAULT_SLOT_DIR = os.path.join(tempfile.gettempdir(), 'quiz-password-hash')
+
+
+class HasherBusy(Exception):
+    """Raised when hashing is at capacity or too slow; the request should be retried"""
+
+
+def _encode(password):
+    # bcrypt only reads the first 72 bytes; older releases truncated silently
+    # and newer ones refuse longer input, so truncate to keep old hashes valid
+    return password.encode('utf-8')[:72]
+
+
+def hash_rounds(hashed):
+    """Cost factor of a ``$2b$12$...`` hash, or None if it cannot be read"""
+    try:
+        return int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _verify(hashed, password, rounds):
+    # Returns (matches, new_hash); new_hash is set when the stored hash uses a
+    # different cost than configured, so the caller can upgrade it in place
+    try:
+        matches = hmac.compare_digest(bcrypt.hashpw(_encode(password), hashed.encode('utf-8')),
+                                      hashed.encode('utf-8'))
+    except ValueError:
+        return False, None
+    if matches and hash_rounds(hashed) != rounds:
+        return True, _hash(password, rounds)
+    return matches, None
+
+
+class HostSlots:
+    """At most ``size`` holders at once across every process on this host.
+
+    Slot ``n`` is an flock on ``<directory>/slot-<n>``; taking one never
+    waits. The kernel drops a process's locks when it exits, so a crashed or
+    killed worker cannot leak a slot.
+    """
+
+    def __init__(self, directory, size):
+        self.directory = directory
+        self.size = size
+        os.makedirs(directory, exist_ok=True)
+
+    def try_acquire(self):
+        """A held slot (pass it to ``release``), or None when all are taken"""
+        for n in range(self.size):
+            fd = os.open(os.path.join(self.directory, f'slot-{n}'), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def release(self, fd):
+        os.close(fd)
+
+
+class PasswordHasher:
+    """bcrypt hashing and verification with a host-wide admission limit.
+
+    bcrypt is deliberately slow, and with sync gunicorn workers a login
+    occupies its worker for the whole computation. A job first takes one of
+    ``max_pending`` slots shared by every worker on the host (``HostSlots``);
+    when none is free ``HasherBusy`` is raised at once, so a login storm is
+    shed with a 503 while the remaining workers keep serving other pages.
+    Keep ``max_pending`` below the number of sync workers.
+
+    Admitted jobs run on ``workers`` threads of this process (bcrypt releases
+    the GIL, so threaded workers keep serving meanwhile) and the request waits
+    at most ``timeout`` seconds for the result, then gets ``HasherBusy`` too;
+    the slot is held until the abandoned job finishes. ``workers=0`` hashes
+    inline in the request thread, without the timeout.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_pending=2, timeout=5.0, slot_dir=None):
+        if workers < 0 or max_pending < 1 or timeout <= 0:
+            raise ValueError('Invalid hasher settings: workers=%s max_pending=%s timeout=%s'
+                             % (workers, max_pending, timeout))
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.slots = HostSlots(slot_dir or DEFAULT_SLOT_DIR, max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        self._submitted = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._rehashed = 0
+
+    def _done(self, slot):
+        self.slots.release(slot)
+        with self._lock:
+            self._pending -= 1
+
+    def _job(self, slot, fn, args):
+        # The slot is released before the result is delivered, so the caller
+        # can hash again straight away
+        try:
+            return fn(*args)
+        finally:
+            self._done(slot)
+
+    def _run(self, fn, *args):
+        slot = self.slots.try_acquire()
+        with self._lock:
+            if slot is None:
+                self._rejected += 1
+                raise HasherBusy('Password hashing is at capacity')
+            self._pending += 1
+            self._submitted += 1
+            if self.workers and self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+        if not self.workers:
+            return self._job(slot, fn, args)
+        try:
+            future = self._executor.submit(self._job, slot, fn, args)
+        except BaseException:
+            self._done(slot)
+            raise
+        # A job cancelled by close() never runs to release its slot
+        future.add_done_callback(lambda f: f.cancelled() and self._done(slot))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise HasherBusy('Password hashing took longer than %ss' % self.timeout)
+
+    def hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, hashed, password):
+        """Return (matches, new_hash); store new_hash when it is not None"""
+        matches, new_hash = self._run(_verify, hashed, password, self.rounds)
+        if new_hash is not None:
+            with self._lock:
+                self._rehashed += 1
+        return matches, new_hash
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'timeout': self.timeout,
+                'pending': self._pending,
+                'submitted': self._submitted,
+                'rejected': self._rejected,
+                'timeouts': self._timeouts,
+                'rehashed': self._rehashed,
+            }
+
+
+# App config keys, in PasswordHasher argument order
+HASHER_SETTINGS = ('BCRYPT_ROUNDS', 'PASSWORD_HASH_WORKERS', 'PASSWORD_HASH_MAX_PENDING',
+                   'PASSWORD_HASH_TIMEOUT', 'PASSWORD_HASH_SLOT_DIR')
+
+_hashers = {}
+_hashers_pid = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher(config):
+    """Return this process's hasher for the settings in ``config`` (an app
+    config), creating it on first use; keyed on the pid like the connection
+    pool, so a forked gunicorn worker starts its own threads (the slots it
+    shares)"""
+    global _hashers_pid
+    settings = tuple(config[key] for key in HASHER_SETTINGS)
+    pid = os.getpid()
+    hasher = _hashers.get(settings) if _hashers_pid == pid else None
+    if hasher is None:
+        with _hasher_lock:
+            if _hashers_pid != pid:
+                _hashers.clear()
+                _hashers_pid = pid
+            hasher = _hashers.get(settings)
+            if hasher is None:
+                hasher = _hashers[settings] = PasswordHasher(*settings)
+    return hasher
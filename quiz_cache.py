@@ -0,0 +1,70 @@
+# quiz_cache.py (In-process cache of quiz definitions)
+import threading
+from collections import OrderedDict
+
+
+class QuizCache:
+    """Size-bounded LRU cache of quiz definitions keyed by quiz_id.
+
+    Every entry carries the version (``quizzes.updated_at``) it was loaded at.
+    A lookup must present the current version, so a definition changed by
+    another worker is treated as a miss instead of being served stale.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # quiz_id -> (version, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, quiz_id, version):
+        with self._lock:
+            entry = self._entries.get(quiz_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != version:
+                del self._entries[quiz_id]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(quiz_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, quiz_id, version, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[quiz_id] = (version, value)
+            self._entries.move_to_end(quiz_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, quiz_id):
+        with self._lock:
+            if self._entries.pop(quiz_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,450 @@
+# quiz_transfer.py (Bulk quiz import and export)
+"""
+Whole quizzes, or bare question banks, move between environments as JSON or
+CSV.
+
+JSON is the export envelope ``{"format": "quiz-export", "version": 1,
+"quizzes": [...]}``; each quiz carries title, description, passing_score,
+duration_minutes, the question bank settings sample_size, sample_by and
+shuffle (see sampling.py), and a ``questions`` list of question_text,
+question_type, options, correct_answer, points and tag. A bare list of
+quizzes (or, for a question bank, of questions) is accepted too. CSV has one row per question
+with the quiz columns repeated; rows sharing the ``quiz`` key (the source
+quiz id on export, any label on import) form one quiz, and ``options`` is a
+JSON array or, as in the quiz form, ``|``-separated.
+
+An import is validated in one pass and every problem is reported with its
+location before anything is written. It then loads in a single transaction:
+quizzes through execute_values with ids drawn up front, questions through
+COPY. Exports are streamed from the database, so memory stays flat for any
+size of bank.
+
+    python quiz_transfer.py export --admin admin --format csv -o quizzes.csv
+    python quiz_transfer.py import quizzes.csv --admin admin
+    python quiz_transfer.py import bank.json --admin admin --quiz-id 12
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+
+import psycopg2.extras
+
+from sampling import SAMPLE_BY
+from streaming import CHUNK_SIZE
+
+EXPORT_FORMAT = 'quiz-export'
+EXPORT_VERSION = 1
+FORMATS = ('json', 'csv')
+
+QUIZ_FIELDS = ['title', 'description', 'passing_score', 'duration_minutes', 'sample_size', 'sample_by', 'shuffle']
+QUESTION_FIELDS = ['question_text', 'question_type', 'options', 'correct_answer', 'points', 'tag']
+CSV_HEADER = ['quiz'] + QUIZ_FIELDS + QUESTION_FIELDS
+QUESTION_TYPES = ('multiple_choice', 'true_false')
+TRUE_FALSE_OPTIONS = ['True', 'False']
+
+# Problems reported per rejected import; the rest are summarised
+MAX_ERRORS = 50
+
+# Column limits from the schema
+MAX_TITLE = 255
+MAX_ANSWER = 255
+MAX_TAG = 80
+
+EXPORT_SQL = """
+    SELECT z.id AS quiz, z.title, z.description, z.passing_score, z.duration_minutes,
+           z.sample_size, z.sample_by, z.shuffle,
+           q.question_text, q.question_type, q.options, q.correct_answer, q.points, q.tag
+    FROM quizzes z
+    LEFT JOIN questions q ON q.quiz_id = z.id
+    WHERE z.created_by = %s AND (%s::int[] IS NULL OR z.id = ANY(%s::int[]))
+    ORDER BY z.id, q.id
+"""
+EXPORT_COPY_SQL = f"""
+    COPY (SELECT quiz, title, description, passing_score, duration_minutes, sample_size, sample_by, shuffle,
+                 question_text, question_type, options::text, correct_answer, points, tag
+          FROM ({EXPORT_SQL}) rows)
+    TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+COPY_QUESTIONS_SQL = """
+    COPY questions (quiz_id, question_text, question_type, options, correct_answer, points, tag)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+
+class InvalidImport(Exception):
+    """The import was rejected; ``errors`` lists every problem found"""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} problem(s) in import')
+        self.errors = errors
+
+
+def guess_format(filename=None, mimetype=None, default='json'):
+    name = (filename or '').lower()
+    if name.endswith('.csv') or mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    if name.endswith('.json') or mimetype == 'application/json':
+        return 'json'
+    return default
+
+
+class _Checker:
+    """Collects validation errors with their location"""
+
+    def __init__(self):
+        self.errors = []
+        self.dropped = 0
+
+    def error(self, where, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f'{where}: {message}')
+        else:
+            self.dropped += 1
+
+    def raise_if_failed(self):
+        if self.errors:
+            if self.dropped:
+                self.errors.append(f'... and {self.dropped} more')
+            raise InvalidImport(self.errors)
+
+    def integer(self, where, field, value, default, minimum, maximum=None):
+        if value is None or value == '':
+            return default
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            self.error(where, f'{field} must be an integer')
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            self.error(where, f'{field} must be an integer')
+            return default
+        if number < minimum or (maximum is not None and number > maximum):
+            bounds = f'between {minimum} and {maximum}' if maximum is not None else f'at least {minimum}'
+            self.error(where, f'{field} must be {bounds}')
+        return number
+
+    def boolean(self, where, field, value, default=False):
+        if value is None or value == '':
+            return default
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in ('true', 't', 'yes', '1', 'false', 'f', 'no', '0'):
+            return value.strip().lower() in ('true', 't', 'yes', '1')
+        self.error(where, f'{field} must be true or false')
+        return default
+
+    def text(self, where, field, value, required=False, max_length=None):
+        if value is None:
+            value = ''
+        if not isinstance(value, str):
+            self.error(where, f'{field} must be a string')
+            return ''
+        value = value.strip()
+        if required and not value:
+            self.error(where, f'{field} is required')
+        if max_length and len(value) > max_length:
+            self.error(where, f'{field} is longer than {max_length} characters')
+        return value
+
+    def options(self, where, value):
+        if value is None or value == '':
+            return []
+        if isinstance(value, str):
+            if value.lstrip().startswith('['):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    self.error(where, 'options is not a valid JSON array')
+                    return []
+            else:
+                value = value.split('|')
+        if not isinstance(value, list) or not all(isinstance(o, (str, int, float)) for o in value):
+            self.error(where, 'options must be a list of strings')
+            return []
+        return [str(o).strip() for o in value if str(o).strip()]
+
+    def question(self, where, raw):
+        if not isinstance(raw, dict):
+            self.error(where, 'question must be an object')
+            return None
+        question_type = self.text(where, 'question_type', raw.get('question_type')) or 'multiple_choice'
+        if question_type not in QUESTION_TYPES:
+            self.error(where, f'question_type must be one of {", ".join(QUESTION_TYPES)}')
+        if question_type == 'true_false':
+            options = TRUE_FALSE_OPTIONS
+        else:
+            options = self.options(where, raw.get('options'))
+        correct_answer = self.text(where, 'correct_answer', raw.get('correct_answer'),
+                                   required=True, max_length=MAX_ANSWER)
+        if correct_answer and options and correct_answer not in options:
+            self.error(where, f'correct_answer {correct_answer!r} is not one of the options')
+        return {
+            'question_text': self.text(where, 'question_text', raw.get('question_text'), required=True),
+            'question_type': question_type,
+            'options': options,
+            'correct_answer': correct_answer,
+            'points': self.integer(where, 'points', raw.get('points'), 1, 0),
+            'tag': self.text(where, 'tag', raw.get('tag'), max_length=MAX_TAG) or None,
+        }
+
+    def quiz(self, where, raw, questions):
+        if not isinstance(raw, dict):
+            self.error(where, 'quiz must be an object')
+            return None
+        return {
+            'title': self.text(where, 'title', raw.get('title'), required=True, max_length=MAX_TITLE),
+            'description': self.text(where, 'description', raw.get('description')),
+            'passing_score': self.integer(where, 'passing_score', raw.get('passing_score'), 60, 0, 100),
+            'duration_minutes': self.integer(where, 'duration_minutes', raw.get('duration_minutes'), 0, 0),
+            'sample_size': self.integer(where, 'sample_size', raw.get('sample_size'), None, 1),
+            'sample_by': self.sample_by(where, raw.get('sample_by')),
+            'shuffle': self.boolean(where, 'shuffle', raw.get('shuffle')),
+            'questions': questions,
+        }
+
+    def sample_by(self, where, value):
+        value = self.text(where, 'sample_by', value) or None
+        if value is not None and value not in SAMPLE_BY:
+            self.error(where, f'sample_by must be one of {", ".join(SAMPLE_BY)}')
+        return value
+
+
+def _load_json(data):
+    try:
+        return json.loads(data)
+    except ValueError as e:
+        raise InvalidImport([f'Invalid JSON: {e}'])
+
+
+def _csv_rows(data):
+    if isinstance(data, bytes):
+        try:
+            data = data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise InvalidImport(['CSV must be UTF-8 encoded'])
+    reader = csv.DictReader(io.StringIO(data, newline=''))
+    if not reader.fieldnames or 'question_text' not in reader.fieldnames:
+        raise InvalidImport([f'CSV header must include question_text (columns: {", ".join(CSV_HEADER)})'])
+    # Line 1 is the header
+    return ((reader.line_num, row) for row in reader)
+
+
+def _has_question(row):
+    return any((row.get(field) or '').strip() for field in QUESTION_FIELDS)
+
+
+def read_quizzes(data, fmt='json'):
+    """Validated quizzes (each with its questions) from an export file"""
+    check = _Checker()
+    quizzes = []
+    if fmt == 'csv':
+        groups = {}
+        for line, row in _csv_rows(data):
+            where = f'line {line}'
+            key = (row.get('quiz') or '').strip() or (row.get('title') or '').strip()
+            if key not in groups:
+                groups[key] = check.quiz(where, row, [])
+                quizzes.append(groups[key])
+            if _has_question(row):
+                groups[key]['questions'].append(check.question(where, row))
+    else:
+        payload = _load_json(data)
+        if isinstance(payload, dict):
+            payload = payload['quizzes'] if 'quizzes' in payload else [payload]
+        if not isinstance(payload, list):
+            raise InvalidImport(['Expected a quiz, a list of quizzes or {"quizzes": [...]}'])
+        for i, raw in enumerate(payload):
+            where = f'quizzes[{i}]'
+            raw_questions = (raw.get('questions') or []) if isinstance(raw, dict) else []
+            if not isinstance(raw_questions, list):
+                check.error(where, 'questions must be a list')
+                raw_questions = []
+            questions = [check.question(f'{where}.questions[{j}]', q) for j, q in enumerate(raw_questions)]
+            quizzes.append(check.quiz(where, raw, questions))
+    if not quizzes:
+        check.error('import', 'no quizzes found')
+    check.raise_if_failed()
+    return quizzes
+
+
+def read_questions(data, fmt='json'):
+    """Validated questions for appending to an existing quiz (quiz columns are ignored)"""
+    check = _Checker()
+    if fmt == 'csv':
+        questions = [check.question(f'line {line}', row) for line, row in _csv_rows(data) if _has_question(row)]
+    else:
+        payload = _load_json(data)
+        if isinstance(payload, dict):
+            if 'quizzes' in payload:
+                payload = [q for quiz in payload['quizzes'] if isinstance(quiz, dict)
+                           for q in quiz.get('questions') or []]
+            else:
+                payload = payload.get('questions', [payload])
+        if not isinstance(payload, list):
+            raise InvalidImport(['Expected a list of questions or {"questions": [...]}'])
+        questions = [check.question(f'questions[{i}]', q) for i, q in enumerate(payload)]
+    if not questions:
+        check.error('import', 'no questions found')
+    check.raise_if_failed()
+    return questions
+
+
+def copy_questions(cur, rows):
+    """COPY (quiz_id, question) pairs into questions"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for quiz_id, q in rows:
+        writer.writerow((quiz_id, q['question_text'], q['question_type'], json.dumps(q['options']),
+                         q['correct_answer'], q['points'], q['tag']))
+    buffer.seek(0)
+    cur.copy_expert(COPY_QUESTIONS_SQL, buffer)
+
+
+def insert_quizzes(cur, quizzes, created_by):
+    """Insert validated quizzes and their questions; returns the new quiz ids.
+
+    Runs in the caller's transaction. Ids are drawn from the sequence first,
+    so the questions can be copied in without reading anything back.
+    """
+    cur.execute("SELECT nextval(pg_get_serial_sequence('quizzes', 'id')) FROM generate_series(1, %s)",
+                (len(quizzes),))
+    quiz_ids = [row[0] for row in cur.fetchall()]
+    psycopg2.extras.execute_values(
+        cur,
+        "INSERT INTO quizzes (id, title, description, created_by, passing_score, duration_minutes,"
+        " sample_size, sample_by, shuffle) VALUES %s",
+        [(quiz_id, z['title'], z['description'], created_by, z['passing_score'], z['duration_minutes'],
+          z['sample_size'], z['sample_by'], z['shuffle'])
+         for quiz_id, z in zip(quiz_ids, quizzes)],
+        page_size=1000)
+    copy_questions(cur, ((quiz_id, q) for quiz_id, z in zip(quiz_ids, quizzes) for q in z['questions']))
+    return quiz_ids
+
+
+def append_questions(cur, quiz_id, questions):
+    """Add validated questions to an existing quiz and bump its version"""
+    copy_questions(cur, ((quiz_id, q) for q in questions))
+    cur.execute("UPDATE quizzes SET updated_at = CURRENT_TIMESTAMP WHERE id = %s", (quiz_id,))
+
+
+def export_params(created_by, quiz_ids=None):
+    quiz_ids = list(quiz_ids) if quiz_ids else None
+    return (created_by, quiz_ids, quiz_ids)
+
+
+def json_chunks(rows, chunk_size=CHUNK_SIZE):
+    """Encode EXPORT_SQL rows (ordered by quiz) as the JSON export envelope.
+
+    Each question is written as soon as its row arrives, so a quiz with any
+    number of questions is never held in memory.
+    """
+    parts = [f'{{"format": "{EXPORT_FORMAT}", "version": {EXPORT_VERSION}, "quizzes": [']
+    size = len(parts[0])
+    current = None
+    first_question = True
+    for row in rows:
+        if row['quiz'] != current:
+            quiz = {field: row[field] for field in QUIZ_FIELDS}
+            prefix = '\n' if current is None else ']},\n'
+            parts.append(prefix + json.dumps(quiz)[:-1] + ', "questions": [')
+            current = row['quiz']
+            first_question = True
+        if row['question_text'] is not None:
+            question = {field: row[field] for field in QUESTION_FIELDS}
+            parts.append(('\n  ' if first_question else ',\n  ') + json.dumps(question))
+            first_question = False
+        size += len(parts[-1])
+        if size >= chunk_size:
+            yield ''.join(parts).encode('utf-8')
+            parts, size = [], 0
+    parts.append(']}]}\n' if current is not None else ']}\n')
+    yield ''.join(parts).encode('utf-8')
+
+
+def csv_row(row):
+    """EXPORT_SQL row as a CSV_HEADER row (what EXPORT_COPY_SQL emits)"""
+    return [json.dumps(row[field]) if field == 'options' and row[field] is not None else row[field]
+            for field in CSV_HEADER]
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from db import connect_from_env
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="write an admin's quizzes to a file")
+    export.add_argument('--admin', required=True, help='username of the owning admin')
+    export.add_argument('--quiz-id', type=int, action='append', help='only this quiz (repeatable)')
+    export.add_argument('--format', choices=FORMATS, help='default: from the file name, else json')
+    export.add_argument('-o', '--output', help='default: stdout')
+    load = commands.add_parser('import', help='load quizzes or questions from a file')
+    load.add_argument('file')
+    load.add_argument('--admin', required=True, help='username of the admin who will own the quizzes')
+    load.add_argument('--quiz-id', type=int, help='append the questions to this existing quiz instead')
+    load.add_argument('--format', choices=FORMATS, help='default: from the file name, else json')
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = connect_from_env()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM users WHERE username = %s AND role = 'admin'", (args.admin,))
+            row = cur.fetchone()
+            if row is None:
+                sys.exit(f'No admin named {args.admin}')
+            admin_id = row[0]
+
+        if args.command == 'export':
+            fmt = args.format or guess_format(args.output)
+            out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+            try:
+                params = export_params(admin_id, args.quiz_id)
+                if fmt == 'csv':
+                    with conn.cursor() as cur:
+                        cur.copy_expert(cur.mogrify(EXPORT_COPY_SQL, params).decode('utf-8'), out)
+                else:
+                    with conn.cursor(name='export_quizzes', cursor_factory=psycopg2.extras.DictCursor) as cur:
+                        cur.itersize = 2000
+                        cur.execute(EXPORT_SQL, params)
+                        for chunk in json_chunks(cur):
+                            out.write(chunk)
+            finally:
+                if args.output:
+                    out.close()
+            conn.rollback()
+            return
+
+        fmt = args.format or guess_format(args.file)
+        with open(args.file, 'rb') as f:
+            data = f.read()
+        try:
+            if args.quiz_id:
+                questions = read_questions(data, fmt)
+            else:
+                quizzes = read_quizzes(data, fmt)
+        except InvalidImport as e:
+            sys.exit('Import rejected:\n  ' + '\n  '.join(e.errors))
+        with conn.cursor() as cur:
+            if args.quiz_id:
+                cur.execute("SELECT id FROM quizzes WHERE id = %s AND created_by = %s FOR UPDATE",
+                            (args.quiz_id, admin_id))
+                if cur.fetchone() is None:
+                    sys.exit(f'Quiz {args.quiz_id} not found or not owned by {args.admin}')
+                append_questions(cur, args.quiz_id, questions)
+                message = f'Added {len(questions)} question(s) to quiz {args.quiz_id}'
+            else:
+                quiz_ids = insert_quizzes(cur, quizzes, admin_id)
+                count = sum(len(z['questions']) for z in quizzes)
+                message = f'Imported {len(quiz_ids)} quiz(zes) with {count} question(s): {quiz_ids}'
+        conn.commit()
+        print(message, file=sys.stderr)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
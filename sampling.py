@@ -0,0 +1,108 @@
+# sampling.py (Per-attempt question sampling and option shuffling)
+"""
+A quiz can draw each attempt's questions from a larger bank. The settings live
+on the quiz row: ``sample_size`` (questions per attempt, NULL for every
+question), ``sample_by`` (``'tag'`` or ``'points'`` to draw from each group in
+proportion to its share of the bank) and ``shuffle`` (random question order
+and option order per attempt).
+
+Opening an attempt session picks a random ``seed`` and, for sampled quizzes,
+stores the drawn question ids in ``attempt_sessions.question_ids``. Resuming
+the attempt reuses both, so a refresh shows the same questions in the same
+order, and grading reads back exactly the stored set.
+
+Sampling never touches the database. The grouped id arrays are built once per
+quiz version from the cached definition and kept in ``pools``, a QuizCache the
+caller owns (one per app and worker process, sized like the definition cache);
+a draw costs O(sample_size) however large the bank, instead of an
+``ORDER BY random()`` over every row.
+"""
+import random
+import secrets
+
+SAMPLE_BY = ('tag', 'points')
+
+
+class QuestionPool:
+    """A quiz's question ids grouped for stratified sampling"""
+
+    def __init__(self, questions, sample_by=None):
+        self.by_id = {q['id']: q for q in questions}
+        groups = {}
+        for q in questions:
+            key = q.get(sample_by) if sample_by in SAMPLE_BY else None
+            groups.setdefault(key, []).append(q['id'])
+        # Sorted so the same seed draws the same questions in every process,
+        # whatever order the questions were passed in
+        self.strata = [tuple(sorted(ids)) for _, ids in sorted(groups.items(), key=lambda item: str(item[0]))]
+        self.size = len(self.by_id)
+
+    def allocate(self, sample_size):
+        """Questions per stratum: proportional to its size, remainders going to
+        the strata with the largest fractional share"""
+        if sample_size >= self.size:
+            return [len(ids) for ids in self.strata]
+        shares = [sample_size * len(ids) / self.size for ids in self.strata]
+        counts = [int(share) for share in shares]
+        by_remainder = sorted(range(len(shares)), key=lambda i: counts[i] - shares[i])
+        for i in by_remainder[:sample_size - sum(counts)]:
+            counts[i] += 1
+        return counts
+
+    def draw(self, sample_size, seed, shuffle=False):
+        """``sample_size`` question ids, in presentation order"""
+        rng = random.Random(seed)
+        drawn = []
+        for ids, count in zip(self.strata, self.allocate(sample_size)):
+            drawn.extend(rng.sample(ids, count))
+        if shuffle:
+            rng.shuffle(drawn)
+        else:
+            drawn.sort()
+        return drawn
+
+    def questions(self, question_ids):
+        """The questions behind stored ids; ids deleted since are skipped"""
+        return [self.by_id[i] for i in question_ids if i in self.by_id]
+
+
+def get_pool(pools, quiz, questions):
+    """The quiz's QuestionPool from ``pools``, validated against
+    quizzes.updated_at like the definition it is built from"""
+    pool = pools.get(quiz['id'], quiz['updated_at'])
+    if pool is None:
+        pool = QuestionPool(questions, quiz.get('sample_by'))
+        pools.put(quiz['id'], quiz['updated_at'], pool)
+    return pool
+
+
+def new_seed():
+    return secrets.randbits(63)
+
+
+def draw_questions(pools, quiz, questions, seed):
+    """Question ids to store with a new attempt session, or None when the quiz
+    serves every question"""
+    if not quiz.get('sample_size'):
+        return None
+    return get_pool(pools, quiz, questions).draw(quiz['sample_size'], seed, quiz.get('shuffle'))
+
+
+def attempt_questions(pools, quiz, questions, seed, question_ids):
+    """The questions of one attempt, in presentation order, with options
+    shuffled when the quiz asks for it. Cached dicts are copied, not changed."""
+    if question_ids is not None:
+        questions = get_pool(pools, quiz, questions).questions(question_ids)
+    elif quiz.get('shuffle') and seed is not None:
+        questions = list(questions)
+        random.Random(seed).shuffle(questions)
+    if not quiz.get('shuffle') or seed is None:
+        return questions
+    shuffled = []
+    for q in questions:
+        if q.get('question_type') == 'multiple_choice' and q.get('options'):
+            options = list(q['options'])
+            random.Random(f"{seed}:{q['id']}").shuffle(options)
+            q = dict(q, options=options)
+        shuffled.append(q)
+    return shuffled
@@ -0,0 +1,115 @@
+# search.py (Ranked full-text search over quizzes and questions)
+"""
+Migration 11 gives quizzes and questions a ``search_vector`` that Postgres
+keeps current as a stored generated column: quiz title (weight A) and
+description (B), question text (A) and tag (B). Both vectors have GIN
+indexes, so a search is an index lookup rather than an ``ILIKE`` scan.
+
+Search text becomes a prefix query: every word must match, each as a prefix,
+so ``alg equa`` finds "Algebraic equations" while it is still being typed.
+Where pg_trgm is installed, a title or question that is a close trigram
+match also qualifies (through its own GIN index), which catches misspellings
+such as ``algebera``.
+
+Results are ordered by rank, best first, and paged with a (rank, id) keyset
+cursor. Ranking reads each candidate's vector, so at most ``SEARCH_MAX_MATCHES``
+candidates are ranked per query: the newest matches, by id. The candidate set
+must be the same on every page for the keyset cursor to hold, hence the
+ORDER BY before its LIMIT. A very common word ranks only the newest matches,
+and narrowing the search brings the rest within reach.
+"""
+import re
+
+from pagination import decode_rank_cursor, encode_rank_cursor
+
+# Words of the search text that take part; the rest are ignored
+MAX_TERMS = 8
+
+# Letters and digits only: tsquery operators and punctuation never reach
+# to_tsquery, so any input is a valid query
+_WORD = re.compile(r'[^\W_]+')
+
+QUIZ_COLUMNS = "m.id, m.title, m.description, m.created_by, m.passing_score, m.duration_minutes, m.created_at, m.updated_at"
+QUESTION_COLUMNS = "m.id, m.quiz_id, m.quiz_title, m.question_text, m.question_type, m.points, m.tag"
+
+# {rank} and {match} are filled in per query: with pg_trgm the trigram
+# similarity of the title (or question text) joins the text rank
+QUIZ_SEARCH_SQL = """
+    SELECT * FROM (
+        SELECT {columns}, ({rank})::float8 AS rank
+        FROM (SELECT to_tsquery('english', %s) AS query, %s::text AS text) s,
+        LATERAL (
+            SELECT z.* FROM quizzes z
+            WHERE ({match}) {scope}
+            ORDER BY {alias}.id DESC
+            LIMIT %s
+        ) m
+    ) ranked
+"""
+QUESTION_SEARCH_SQL = """
+    SELECT * FROM (
+        SELECT {columns}, ({rank})::float8 AS rank
+        FROM (SELECT to_tsquery('english', %s) AS query, %s::text AS text) s,
+        LATERAL (
+            SELECT q.*, z.title AS quiz_title FROM questions q
+            JOIN quizzes z ON z.id = q.quiz_id
+            WHERE ({match}) {scope}
+            ORDER BY {alias}.id DESC
+            LIMIT %s
+        ) m
+    ) ranked
+"""
+
+_has_trigram = None
+
+
+def has_trigram(cur):
+    """Whether pg_trgm is installed (checked once per process)"""
+    global _has_trigram
+    if _has_trigram is None:
+        cur.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        _has_trigram = cur.fetchone()[0]
+    return _has_trigram
+
+
+def terms(text):
+    return _WORD.findall((text or '').lower())[:MAX_TERMS]
+
+
+def prefix_query(words):
+    """``alg equa`` -> ``alg:* & equa:*`` (stemmed by to_tsquery)"""
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def search_page(cur, kind, text, scope_sql=None, scope_params=(), cursor=None, limit=20, max_matches=1000):
+    """One page of ranked matches for ``kind`` ('quizzes' or 'questions');
+    returns (rows, next_cursor). ``scope_sql`` filters the candidates (``z``
+    is the quiz, ``q`` the question); at most ``max_matches`` of them are
+    ranked, whatever the size of the tables."""
+    words = terms(text)
+    if not words:
+        return [], None
+    sql, column, alias = {
+        'quizzes': (QUIZ_SEARCH_SQL, 'title', 'z'),
+        'questions': (QUESTION_SEARCH_SQL, 'question_text', 'q'),
+    }[kind]
+    columns = QUIZ_COLUMNS if kind == 'quizzes' else QUESTION_COLUMNS
+    match = f"{alias}.search_vector @@ s.query"
+    rank = "ts_rank_cd(m.search_vector, s.query, 1)"
+    if has_trigram(cur):
+        match += f" OR s.text <%% {alias}.{column}"
+        rank += f" + word_similarity(s.text, m.{column})"
+    sql = sql.format(columns=columns, rank=rank, match=match, alias=alias,
+                     scope=f"AND {scope_sql}" if scope_sql else '')
+    params = [prefix_query(words), ' '.join(words), *scope_params, max_matches]
+    if cursor:
+        sql += " WHERE (rank, id) < (%s, %s)"
+        params.extend(decode_rank_cursor(cursor))
+    sql += " ORDER BY rank DESC, id DESC LIMIT %s"
+    params.append(limit + 1)
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_rank_cursor(rows[-1]['rank'], rows[-1]['id'])
@@ -51,11 +51,19 @@
         response = await fetch(`/admin/quiz/delete/${itemToDelete}`, { method: 'POST' });
       } else if (deleteType === 'user') {
         response = await fetch(`/admin/user/delete/${itemToDelete}`, { method: 'POST' });
+      } else if (deleteType === 'quizzes' || deleteType === 'users') {
+        response = await fetch(`/admin/${deleteType}/delete`, {
+          method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ ids: itemToDelete })
+        });
       }
       if (response?.ok) {
         const result = await response.json();
-        showMessage(result.message || 'Deleted', 'success');
-        setTimeout(() => location.reload(), 800);
+        if (result.results) {
+          showBatchResults(result, 'deleted', 'Deleted');
+        } else {
+          showMessage(result.message || 'Deleted', 'success');
+          setTimeout(() => location.reload(), 800);
+        }
       } else {
         const err = await response.json();
         showMessage(err.error || 'Failed to delete', 'error');
@@ -68,6 +76,89 @@
     deleteType = null;
   });
 
+  // Multi-select: each toolbar acts on the checked rows of its list with one
+  // batch request, which applies in a single transaction and reports per item
+  function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text == null ? '' : String(text);
+    return div.innerHTML;
+  }
+
+  function showBatchResults(result, appliedStatus, verb) {
+    const applied = result.summary[appliedStatus] || 0;
+    const failed = result.results.filter(r => r.status !== appliedStatus);
+    let message = `${verb} ${applied} of ${result.results.length}.`;
+    if (failed.length) {
+      const shown = failed.slice(0, 5).map(r => `#${escapeHtml(r.id)}: ${escapeHtml(r.error)}`);
+      if (failed.length > shown.length) shown.push(`and ${failed.length - shown.length} more`);
+      message += ` Skipped ${failed.length}: ${shown.join('; ')}`;
+    }
+    showMessage(message, failed.length && !applied ? 'error' : 'success');
+    if (applied) setTimeout(() => location.reload(), failed.length ? 3000 : 800);
+  }
+
+  document.querySelectorAll('[data-batch-for]').forEach((toolbar) => {
+    const list = document.getElementById(toolbar.dataset.batchFor);
+    const type = toolbar.dataset.batchType;
+    if (!list) return;
+    const selectAll = toolbar.querySelector('[data-select-all]');
+    const count = toolbar.querySelector('[data-selected-count]');
+    const selectedIds = () => [...list.querySelectorAll('input[data-select]:checked')].map(cb => parseInt(cb.value, 10));
+
+    function refresh() {
+      const selected = selectedIds().length;
+      const total = list.querySelectorAll('input[data-select]').length;
+      if (count) count.textContent = `${selected} selected`;
+      if (selectAll) {
+        selectAll.checked = selected > 0 && selected === total;
+        selectAll.indeterminate = selected > 0 && selected < total;
+      }
+      toolbar.querySelectorAll('[data-batch]').forEach(btn => { btn.disabled = selected === 0; });
+    }
+
+    list.addEventListener('change', (e) => { if (e.target.matches('input[data-select]')) refresh(); });
+    list.addEventListener('paginate:loaded', refresh);
+    selectAll?.addEventListener('change', () => {
+      list.querySelectorAll('input[data-select]').forEach(cb => { cb.checked = selectAll.checked; });
+      refresh();
+    });
+
+    toolbar.querySelectorAll('[data-batch]').forEach((btn) => btn.addEventListener('click', async () => {
+      const ids = selectedIds();
+      if (!ids.length) return;
+      const field = btn.dataset.batch;
+      if (field === 'delete') {
+        itemToDelete = ids;
+        deleteType = type;
+        if (modalTitle) modalTitle.textContent = `Delete ${ids.length} ${type}`;
+        if (modalMessage) modalMessage.textContent = type === 'quizzes'
+          ? `Are you sure you want to delete ${ids.length} selected quizzes? This will remove all related questions and attempts.`
+          : `Are you sure you want to delete ${ids.length} selected users? Their attempts will be removed too.`;
+        deleteModal?.classList.remove('hidden');
+        return;
+      }
+      const input = toolbar.querySelector('[data-batch-value]');
+      let value = input ? input.value : '';
+      if (value === '') {
+        showMessage('Enter a value to apply to the selection', 'error');
+        return;
+      }
+      if (input.type === 'number') value = parseInt(value, 10);
+      try {
+        const res = await fetch(`/admin/${type}/edit`, {
+          method: 'POST', headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ items: ids.map(id => ({ id, [field]: value })) })
+        });
+        if (!res.ok) throw await res.json();
+        showBatchResults(await res.json(), 'updated', 'Updated');
+      } catch (err) {
+        showMessage(escapeHtml(err.error || 'Error updating selection'), 'error');
+      }
+    }));
+
+    refresh();
+  });
+
   // Quiz edit
   const quizEditModal = document.getElementById('quizEditModal');
   const quizEditForm = document.getElementById('quizEditForm');
@@ -82,6 +173,8 @@
       document.getElementById('editQuizTitle').value = quiz.title || '';
       document.getElementById('editQuizDescription').value = quiz.description || '';
       document.getElementById('editQuizPassingScore').value = quiz.passing_score || 60;
+      // Sent back so a concurrent edit is reported instead of overwritten
+      quizEditForm.dataset.updatedAt = quiz.updated_at || '';
       quizEditModal?.classList.remove('hidden');
     } catch (err) {
       showMessage(err.error || 'Error fetching quiz', 'error');
@@ -96,7 +189,8 @@
     const payload = {
       title: document.getElementById('editQuizTitle').value,
       description: document.getElementById('editQuizDescription').value,
-      passing_score: parseInt(document.getElementById('editQuizPassingScore').value, 10) || 60
+      passing_score: parseInt(document.getElementById('editQuizPassingScore').value, 10) || 60,
+      expected_updated_at: quizEditForm.dataset.updatedAt || null
     };
     try {
       const res = await fetch(`/admin/quiz/edit/${quizId}`, {
@@ -169,6 +263,7 @@
       document.getElementById('editQuestionOptions').value = (q.options && q.options.length) ? q.options.join('|') : '';
       document.getElementById('editCorrectAnswer').value = q.correct_answer || '';
       document.getElementById('editQuestionPoints').value = q.points || 1;
+      questionEditForm.dataset.updatedAt = q.updated_at || '';
       questionEditModal?.classList.remove('hidden');
     } catch (err) {
       showMessage(err.error || 'Error fetching question', 'error');
@@ -185,7 +280,8 @@
       question_type: document.getElementById('editQuestionType').value,
       options: (document.getElementById('editQuestionOptions').value || '').split('|').map(s => s.trim()).filter(Boolean),
       correct_answer: document.getElementById('editCorrectAnswer').value,
-      points: parseInt(document.getElementById('editQuestionPoints').value, 10) || 1
+      points: parseInt(document.getElementById('editQuestionPoints').value, 10) || 1,
+      expected_updated_at: questionEditForm.dataset.updatedAt || null
     };
     try {
       const res = await fetch(`/admin/question/edit/${questionId}`, {
@@ -215,6 +311,7 @@
       document.getElementById('editUsername').value = user.username || '';
       document.getElementById('editEmail').value = user.email || '';
       document.getElementById('editRole').value = user.role || 'student';
+      userEditForm.dataset.updatedAt = user.updated_at || '';
       userEditModal?.classList.remove('hidden');
     } catch (err) {
       showMessage(err.error || 'Error fetching user', 'error');
@@ -229,7 +326,8 @@
     const payload = {
       username: document.getElementById('editUsername').value,
       email: document.getElementById('editEmail').value,
-      role: document.getElementById('editRole').value
+      role: document.getElementById('editRole').value,
+      expected_updated_at: userEditForm.dataset.updatedAt || null
     };
     try {
       const res = await fetch(`/admin/user/edit/${userId}`, {
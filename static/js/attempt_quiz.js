@@ -4,6 +4,9 @@ let totalQuestions = 0;
 let durationMinutes = 0;
 let remainingSeconds = 0;
 let countdownTimer = null;
+let autosaveUrl = null;
+let pendingAnswers = {};
+let autosaveTimer = null;
 
 function showQuestion(questionNum) {
   // Hide all questions
@@ -73,6 +76,40 @@ function validateForm() {
   return true;
 }
 
+// Autosave: answer changes are batched and sent after a short, jittered pause
+// so a cohort working in lockstep does not hit the server in the same instant
+function queueAutosave(input) {
+  const questionId = input.name.replace('question_', '');
+  pendingAnswers[questionId] = input.value;
+  clearTimeout(autosaveTimer);
+  autosaveTimer = setTimeout(flushAutosave, 1000 + Math.random() * 1000);
+}
+
+async function flushAutosave() {
+  if (!autosaveUrl || Object.keys(pendingAnswers).length === 0) return;
+  const batch = pendingAnswers;
+  pendingAnswers = {};
+  try {
+    const res = await fetch(autosaveUrl, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ answers: batch })
+    });
+    if (res.ok) {
+      // Keep the countdown in step with the server's deadline
+      const data = await res.json();
+      if (data.remaining_seconds !== null && durationMinutes > 0) {
+        remainingSeconds = Math.max(0, Math.floor(data.remaining_seconds));
+      }
+    } else if (res.status !== 409) {
+      pendingAnswers = Object.assign(batch, pendingAnswers);
+    }
+  } catch (err) {
+    // Offline for a moment: retry with the next change (or on submit)
+    pendingAnswers = Object.assign(batch, pendingAnswers);
+  }
+}
+
 function startCountdown() {
   if (durationMinutes <= 0) return;
   const timerEl = document.getElementById('countdown-timer');
@@ -87,8 +124,11 @@ function startCountdown() {
     remainingSeconds -= 1;
     if (remainingSeconds <= 0) {
       clearInterval(countdownTimer);
+      remainingSeconds = 0;
       render();
-      if (formEl) formEl.submit();
+      // The server already holds the autosaved answers and accepts the final
+      // form within a grace period, so spread the cohort's submits out
+      if (formEl) setTimeout(() => formEl.submit(), Math.random() * 3000);
     } else {
       render();
     }
@@ -107,9 +147,24 @@ document.addEventListener('DOMContentLoaded', function () {
   if (rootEl) {
     totalQuestions = parseInt(rootEl.dataset.totalQuestions, 10) || 0;
     durationMinutes = parseInt(rootEl.dataset.durationMinutes, 10) || 0;
-    remainingSeconds = durationMinutes > 0 ? durationMinutes * 60 : 0;
+    // Time left comes from the server-side attempt session (resumes on reload)
+    const serverRemaining = parseInt(rootEl.dataset.remainingSeconds, 10);
+    remainingSeconds = durationMinutes > 0
+      ? (Number.isNaN(serverRemaining) ? durationMinutes * 60 : Math.max(serverRemaining, 0))
+      : 0;
+    autosaveUrl = rootEl.dataset.autosaveUrl || null;
   }
 
+  document.querySelectorAll('#quiz-form input[type="radio"]').forEach(input => {
+    input.addEventListener('change', () => queueAutosave(input));
+  });
+  window.addEventListener('pagehide', () => {
+    if (autosaveUrl && Object.keys(pendingAnswers).length && navigator.sendBeacon) {
+      navigator.sendBeacon(autosaveUrl, new Blob([JSON.stringify({ answers: pendingAnswers })], { type: 'application/json' }));
+      pendingAnswers = {};
+    }
+  });
+
   // Bind nav page buttons if present
   document.querySelectorAll('.nav-btn').forEach(btn => {
     btn.addEventListener('click', () => {
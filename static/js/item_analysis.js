@@ -0,0 +1,86 @@
+// Item analysis panel on the quiz page (admins)
+(function () {
+  function escapeHtml(value) {
+    return String(value ?? '')
+      .replace(/&/g, '&amp;')
+      .replace(/</g, '&lt;')
+      .replace(/>/g, '&gt;')
+      .replace(/"/g, '&quot;')
+      .replace(/'/g, '&#39;');
+  }
+
+  function formatStat(value, digits = 2) {
+    return value === null || value === undefined ? '&ndash;' : Number(value).toFixed(digits);
+  }
+
+  function formatPercent(share) {
+    return share === null || share === undefined ? '&ndash;' : `${Math.round(share * 1000) / 10}%`;
+  }
+
+  // Flag items that are too easy or too hard, or that do not separate strong
+  // from weak students (conventional rule-of-thumb thresholds)
+  function statClass(value, low, high) {
+    if (value === null || value === undefined) return 'text-gray-400';
+    if (value < low || value > high) return 'text-red-600 font-semibold';
+    return 'text-gray-800';
+  }
+
+  function renderOptions(question) {
+    const chips = question.options.map((option) => `
+      <span class="inline-block px-2 py-1 mr-1 mb-1 rounded text-xs ${option.correct ? 'bg-green-100 text-green-800' : 'bg-gray-100 text-gray-700'}">
+        ${escapeHtml(option.option)}: ${option.count} (${formatPercent(option.share)})
+      </span>`);
+    if (question.blank) chips.push(`<span class="inline-block px-2 py-1 mr-1 mb-1 rounded text-xs bg-yellow-100 text-yellow-800">Blank: ${question.blank}</span>`);
+    if (question.other) chips.push(`<span class="inline-block px-2 py-1 mr-1 mb-1 rounded text-xs bg-yellow-100 text-yellow-800">Other: ${question.other}</span>`);
+    return chips.join('');
+  }
+
+  // Alpha only covers attempts that were given every question; say so when
+  // that is not all of them (sampled quizzes, questions added later)
+  function formatAlpha(analysis) {
+    if (analysis.alpha_attempts === analysis.attempts) return formatStat(analysis.cronbach_alpha);
+    if (analysis.cronbach_alpha === null) return 'n/a <span class="text-xs text-gray-500">(attempts were given different questions)</span>';
+    return `${formatStat(analysis.cronbach_alpha)} <span class="text-xs text-gray-500">(over the ${analysis.alpha_attempts} attempts given every question)</span>`;
+  }
+
+  function render(panel, analysis) {
+    const summary = panel.querySelector('[data-analysis-summary]');
+    summary.innerHTML = `
+      <span class="mr-4"><strong>${analysis.attempts}</strong> completed attempts</span>
+      <span class="mr-4">Mean score: <strong>${formatStat(analysis.mean_score, 1)}%</strong></span>
+      <span class="mr-4">Cronbach's &alpha;: <strong>${formatAlpha(analysis)}</strong></span>
+      <span class="text-xs text-gray-400">computed ${escapeHtml(new Date(analysis.computed_at).toLocaleString('en-US'))}</span>`;
+
+    panel.querySelector('[data-analysis-rows]').innerHTML = analysis.questions.map((question) => `
+      <tr class="odd:bg-white even:bg-gray-50 align-top">
+        <td class="px-4 py-2 text-sm text-gray-800">${question.position}<div class="text-xs text-gray-400">${question.attempts} attempts</div></td>
+        <td class="px-4 py-2 text-sm ${statClass(question.difficulty, 0.2, 0.9)}">${formatStat(question.difficulty)}</td>
+        <td class="px-4 py-2 text-sm ${statClass(question.discrimination, 0.2, 1)}">${formatStat(question.discrimination)}</td>
+        <td class="px-4 py-2 text-sm ${statClass(question.point_biserial, 0.2, 1)}">${formatStat(question.point_biserial)}</td>
+        <td class="px-4 py-2 text-sm">${renderOptions(question)}</td>
+      </tr>`).join('');
+    panel.querySelector('[data-analysis-table]').classList.toggle('hidden', analysis.questions.length === 0);
+  }
+
+  async function runAnalysis(panel, button) {
+    button.disabled = true;
+    try {
+      const response = await fetch(panel.dataset.url, { headers: { Accept: 'application/json' } });
+      const data = await response.json();
+      if (!response.ok) throw new Error(data.error || 'Failed to run item analysis');
+      render(panel, data);
+    } catch (error) {
+      panel.querySelector('[data-analysis-summary]').innerHTML =
+        `<span class="text-red-600">${escapeHtml(error.message)}</span>`;
+    } finally {
+      button.disabled = false;
+    }
+  }
+
+  document.addEventListener('DOMContentLoaded', () => {
+    const panel = document.getElementById('itemAnalysis');
+    if (!panel) return;
+    const button = panel.querySelector('[data-action="runAnalysis"]');
+    button.addEventListener('click', () => runAnalysis(panel, button));
+  });
+})();
@@ -0,0 +1,64 @@
+// Leaderboard panel on the quiz page
+(function () {
+  function escapeHtml(value) {
+    return String(value ?? '')
+      .replace(/&/g, '&amp;')
+      .replace(/</g, '&lt;')
+      .replace(/>/g, '&gt;')
+      .replace(/"/g, '&quot;')
+      .replace(/'/g, '&#39;');
+  }
+
+  function ordinal(n) {
+    const suffix = (n % 100 >= 11 && n % 100 <= 13) ? 'th' : ({ 1: 'st', 2: 'nd', 3: 'rd' }[n % 10] || 'th');
+    return `${n}${suffix}`;
+  }
+
+  function render(panel, board) {
+    panel.querySelector('[data-leaderboard-students]').textContent =
+      `${board.students} student${board.students === 1 ? '' : 's'}`;
+
+    const you = panel.querySelector('[data-leaderboard-you]');
+    if (board.you) {
+      you.innerHTML = `
+        Your best: <strong>${board.you.best_score}%</strong>
+        (${board.you.attempts} attempt${board.you.attempts === 1 ? '' : 's'}) &middot;
+        ranked <strong>${ordinal(board.you.rank)}</strong> of ${board.students} &middot;
+        <strong>${board.you.percentile}</strong> percentile`;
+      you.classList.remove('hidden');
+    }
+
+    panel.querySelector('[data-leaderboard-rows]').innerHTML = board.top.length ? board.top.map((entry) => `
+      <tr class="odd:bg-white even:bg-gray-50">
+        <td class="px-4 py-2 text-sm text-gray-800">${entry.rank}</td>
+        <td class="px-4 py-2 text-sm text-gray-800">${escapeHtml(entry.username)}</td>
+        <td class="px-4 py-2 text-sm font-semibold text-gray-800">${entry.best_score}%</td>
+        <td class="px-4 py-2 text-sm text-gray-600">${entry.attempts}</td>
+      </tr>`).join('') : `
+      <tr><td colspan="4" class="px-4 py-2 text-sm text-gray-500">No attempts yet.</td></tr>`;
+
+    const peak = Math.max(1, ...board.distribution.map(bin => bin.students));
+    panel.querySelector('[data-leaderboard-distribution]').innerHTML = board.distribution.map((bin) => `
+      <div class="flex items-center text-xs text-gray-600">
+        <span class="w-16 shrink-0">${bin.from}&ndash;${bin.to}%</span>
+        <div class="flex-1 bg-gray-100 rounded h-3 mx-2">
+          <div class="bg-yellow-400 h-3 rounded" style="width: ${(100 * bin.students / peak).toFixed(1)}%"></div>
+        </div>
+        <span class="w-12 shrink-0 text-right">${bin.students}</span>
+      </div>`).join('');
+  }
+
+  document.addEventListener('DOMContentLoaded', async () => {
+    const panel = document.getElementById('leaderboard');
+    if (!panel) return;
+    try {
+      const response = await fetch(panel.dataset.url, { headers: { Accept: 'application/json' } });
+      const data = await response.json();
+      if (!response.ok) throw new Error(data.error || 'Failed to load the leaderboard');
+      render(panel, data);
+    } catch (error) {
+      panel.querySelector('[data-leaderboard-rows]').innerHTML =
+        `<tr><td colspan="4" class="px-4 py-2 text-sm text-red-600">${escapeHtml(error.message)}</td></tr>`;
+    }
+  });
+})();
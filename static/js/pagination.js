@@ -0,0 +1,287 @@
+// Keyset pagination: "Load more" for server-rendered lists
+(function () {
+  function escapeHtml(value) {
+    return String(value ?? '')
+      .replace(/&/g, '&amp;')
+      .replace(/</g, '&lt;')
+      .replace(/>/g, '&gt;')
+      .replace(/"/g, '&quot;')
+      .replace(/'/g, '&#39;');
+  }
+
+  // Mirror the strftime formats used by the templates
+  function formatDate(iso) {
+    return new Date(iso).toLocaleDateString('en-US', { month: 'short', day: '2-digit', year: 'numeric' });
+  }
+
+  function formatLongDate(iso) {
+    return new Date(iso).toLocaleDateString('en-US', { month: 'long', day: '2-digit', year: 'numeric' });
+  }
+
+  function formatTime(iso) {
+    return new Date(iso).toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit', hour12: true });
+  }
+
+  function formatScore(score) {
+    return (Math.round((score || 0) * 10) / 10).toFixed(1);
+  }
+
+  // The student's own figures per quiz, rendered into the list by the server
+  function studentQuizStats(list, quizId) {
+    list.quizStats ??= JSON.parse(list.dataset.quizStats || '{}');
+    const mine = list.quizStats[String(quizId)];
+    if (!mine) return '';
+    return `
+            <div class="flex items-center space-x-4 text-sm text-gray-500 mt-1">
+              <span><i class="fas fa-trophy mr-1 text-yellow-500"></i>Best: ${escapeHtml(mine.best)}%</span>
+              <span>Avg: ${escapeHtml(mine.average)}%</span>
+              <span>${mine.attempts} attempt${mine.attempts === 1 ? '' : 's'}</span>
+            </div>`;
+  }
+
+  const renderers = {
+    admin_quizzes: (quiz) => `
+      <div class="border border-gray-200 p-4 rounded-lg hover:shadow-md transition-shadow duration-200">
+        <div class="flex justify-between items-start mb-3">
+          <input type="checkbox" data-select value="${quiz.id}" class="mt-2 mr-3 h-4 w-4" aria-label="Select quiz">
+          <div class="flex-1">
+            <h4 class="font-semibold text-lg text-gray-800 mb-1">${escapeHtml(quiz.title)}</h4>
+            <p class="text-sm text-gray-600 mb-2">${escapeHtml(quiz.description)}</p>
+            <div class="flex items-center space-x-4 text-sm text-gray-500">
+              <span><i class="fas fa-target mr-1"></i>Pass: ${escapeHtml(quiz.passing_score)}%</span>
+              <span><i class="fas fa-calendar mr-1"></i>${formatDate(quiz.created_at)}</span>
+            </div>
+          </div>
+        </div>
+        <div class="flex items-center space-x-3 pt-3 border-t border-gray-100">
+          <a href="/quiz/${quiz.id}" class="text-blue-500 hover:text-blue-700 text-sm font-medium">
+            <i class="fas fa-eye mr-1"></i>View Details
+          </a>
+          <button data-action="manageQuestions" data-id="${quiz.id}" data-title="${escapeHtml(quiz.title)}" class="text-indigo-500 hover:text-indigo-700 text-sm font-medium">
+            <i class="fas fa-list mr-1"></i>Questions
+          </button>
+          <button data-action="editQuiz" data-id="${quiz.id}" class="text-yellow-500 hover:text-yellow-700 text-sm font-medium">
+            <i class="fas fa-edit mr-1"></i>Edit
+          </button>
+          <button data-action="confirmDeleteQuiz" data-id="${quiz.id}" data-title="${escapeHtml(quiz.title)}" class="text-red-500 hover:text-red-700 text-sm font-medium">
+            <i class="fas fa-trash mr-1"></i>Delete
+          </button>
+        </div>
+      </div>`,
+
+    users: (user, list) => `
+      <div class="border border-gray-200 p-4 rounded-lg hover:shadow-md transition-shadow duration-200">
+        <div class="flex justify-between items-center">
+          ${String(user.id) !== list.dataset.currentUserId ? `
+          <input type="checkbox" data-select value="${user.id}" class="mr-3 h-4 w-4" aria-label="Select user">` : ''}
+          <div class="flex-1">
+            <div class="flex items-center space-x-3">
+              <h4 class="font-semibold text-gray-800">${escapeHtml(user.username)}</h4>
+              <span class="px-2 py-1 text-xs rounded-full ${user.role === 'admin' ? 'bg-red-100 text-red-800' : 'bg-blue-100 text-blue-800'}">
+                ${escapeHtml(user.role.charAt(0).toUpperCase() + user.role.slice(1))}
+              </span>
+            </div>
+            <p class="text-sm text-gray-600 mt-1">${escapeHtml(user.email)}</p>
+            <p class="text-xs text-gray-500 mt-1">Joined: ${formatDate(user.created_at)}</p>
+          </div>
+          <div class="flex items-center space-x-2">
+            <button data-action="editUser" data-id="${user.id}" class="text-yellow-500 hover:text-yellow-700 p-2 rounded hover:bg-yellow-50">
+              <i class="fas fa-edit"></i>
+            </button>
+            ${String(user.id) !== list.dataset.currentUserId ? `
+            <button data-action="confirmDeleteUser" data-id="${user.id}" data-title="${escapeHtml(user.username)}" class="text-red-500 hover:text-red-700 p-2 rounded hover:bg-red-50">
+              <i class="fas fa-trash"></i>
+            </button>` : ''}
+          </div>
+        </div>
+      </div>`,
+
+    student_quizzes: (quiz, list) => `
+      <div class="border border-gray-200 p-4 rounded-lg hover:shadow-md transition-shadow duration-200">
+        <div class="flex justify-between items-start mb-3">
+          <div class="flex-1">
+            <h4 class="font-semibold text-lg text-gray-800 mb-1">${escapeHtml(quiz.title)}</h4>
+            <p class="text-sm text-gray-600 mb-2">${escapeHtml(quiz.description)}</p>
+            <div class="flex items-center space-x-4 text-sm text-gray-500">
+              <span><i class="fas fa-target mr-1"></i>Pass: ${escapeHtml(quiz.passing_score)}%</span>
+              <span><i class="fas fa-calendar mr-1"></i>${formatDate(quiz.created_at)}</span>
+            </div>
+            ${studentQuizStats(list, quiz.id)}
+          </div>
+        </div>
+        <div class="pt-3 border-t border-gray-100">
+          <a href="/quiz/${quiz.id}/attempt" class="inline-flex items-center bg-blue-500 hover:bg-blue-600 text-white px-4 py-2 rounded-lg font-medium transition-colors duration-200">
+            <i class="fas fa-play mr-2"></i>Take Quiz
+          </a>
+          <a href="/quiz/${quiz.id}" class="inline-flex items-center text-blue-500 hover:text-blue-700 ml-3 font-medium">
+            <i class="fas fa-eye mr-1"></i>View Details
+          </a>
+        </div>
+      </div>`,
+
+    student_attempts: (attempt) => `
+      <div class="border p-4 rounded-lg ${attempt.passed ? 'border-green-200 bg-green-50' : 'border-red-200 bg-red-50'} hover:shadow-md transition-shadow duration-200">
+        <div class="flex justify-between items-center mb-2">
+          <h4 class="font-semibold text-gray-800">${escapeHtml(attempt.title)}</h4>
+          <span class="text-sm font-bold ${attempt.passed ? 'text-green-600' : 'text-red-600'}">${formatScore(attempt.score)}%</span>
+        </div>
+        <div class="flex justify-between items-center text-sm text-gray-600">
+          <span class="flex items-center">
+            ${attempt.passed
+              ? '<i class="fas fa-check-circle text-green-500 mr-1"></i>Passed'
+              : '<i class="fas fa-times-circle text-red-500 mr-1"></i>Failed'}
+          </span>
+          <span>${formatLongDate(attempt.attempted_at)} at ${formatTime(attempt.attempted_at)}</span>
+        </div>
+      </div>`,
+
+    admin_questions: (question) => `
+      <div class="border border-gray-200 p-4 rounded-lg hover:shadow-md transition-shadow duration-200">
+        <p class="text-gray-800 mb-2">${escapeHtml(question.question_text)}</p>
+        <div class="flex items-center space-x-4 text-sm text-gray-500">
+          <span><i class="fas fa-clipboard-list mr-1"></i>${escapeHtml(question.quiz_title)}</span>
+          <span>${escapeHtml(question.points)} pt${question.points === 1 ? '' : 's'}</span>
+          ${question.tag ? `<span class="px-2 py-1 text-xs rounded-full bg-gray-100 text-gray-700">${escapeHtml(question.tag)}</span>` : ''}
+          <button data-action="manageQuestions" data-id="${question.quiz_id}" data-title="${escapeHtml(question.quiz_title)}" class="text-indigo-500 hover:text-indigo-700 font-medium">
+            <i class="fas fa-list mr-1"></i>Questions
+          </button>
+        </div>
+      </div>`,
+
+    quiz_attempts: (attempt) => `
+      <tr class="odd:bg-white even:bg-gray-50">
+        <td class="px-4 py-2 text-sm text-gray-800">${escapeHtml(attempt.username)}</td>
+        <td class="px-4 py-2 text-sm font-semibold ${attempt.passed ? 'text-green-600' : 'text-red-600'}">${formatScore(attempt.score)}%</td>
+        <td class="px-4 py-2 text-sm">${attempt.passed ? 'Passed' : 'Failed'}</td>
+        <td class="px-4 py-2 text-sm text-gray-600">${formatLongDate(attempt.attempted_at)} ${formatTime(attempt.attempted_at)}</td>
+      </tr>`
+  };
+
+  function updateCount(list, loaded, hasMore) {
+    const badge = document.querySelector(`[data-count-for="${list.id}"]`);
+    if (!badge) return;
+    const noun = loaded === 1 ? badge.dataset.singular : badge.dataset.plural;
+    badge.textContent = `${loaded}${hasMore ? '+' : ''} ${noun}`;
+  }
+
+  async function loadMore(list, wrapper) {
+    const render = renderers[list.dataset.paginate];
+    const cursor = list.dataset.nextCursor;
+    const button = wrapper.querySelector('button');
+    if (!render || !cursor || button.disabled) return;
+    button.disabled = true;
+    try {
+      const url = new URL(list.dataset.url, window.location.href);
+      url.searchParams.set('cursor', cursor);
+      const res = await fetch(url);
+      if (!res.ok) throw await res.json();
+      const page = await res.json();
+      list.insertAdjacentHTML('beforeend', page.items.map(item => render(item, list)).join(''));
+      list.dataset.nextCursor = page.next_cursor || '';
+      list.dataset.loaded = String((parseInt(list.dataset.loaded, 10) || 0) + page.items.length);
+      updateCount(list, parseInt(list.dataset.loaded, 10), Boolean(page.next_cursor));
+      if (!page.next_cursor) wrapper.classList.add('hidden');
+      list.dispatchEvent(new CustomEvent('paginate:loaded', { detail: { count: page.items.length } }));
+    } catch (err) {
+      alert(err.error || 'Error loading more results');
+    }
+    button.disabled = false;
+  }
+
+  // Search boxes swap their list for ranked results (search.py) and put the
+  // server-rendered page back when cleared. The form, or the selected option
+  // of its scope <select>, names the search URL and the row renderer.
+  function searchTarget(form) {
+    const option = form.querySelector('select[name="scope"]')?.selectedOptions[0];
+    return (option || form).dataset;
+  }
+
+  function setupSearch(form) {
+    const list = document.getElementById(form.dataset.search);
+    const wrapper = document.querySelector(`[data-load-more="${list.id}"]`);
+    const empty = document.querySelector(`[data-search-empty="${list.id}"]`);
+    const badge = document.querySelector(`[data-count-for="${list.id}"]`);
+    const input = form.querySelector('input[name="q"]');
+    const original = {
+      html: list.innerHTML,
+      data: { ...list.dataset },
+      badge: badge ? { text: badge.textContent, ...badge.dataset } : null,
+    };
+    let timer = null;
+    let latest = 0;
+
+    function restore() {
+      list.innerHTML = original.html;
+      Object.assign(list.dataset, original.data);
+      if (badge) {
+        badge.textContent = original.badge.text;
+        badge.dataset.singular = original.badge.singular;
+        badge.dataset.plural = original.badge.plural;
+      }
+      wrapper?.classList.toggle('hidden', !list.dataset.nextCursor);
+      empty?.classList.add('hidden');
+      list.dispatchEvent(new CustomEvent('paginate:loaded', { detail: { count: 0 } }));
+    }
+
+    async function run() {
+      const text = input.value.trim();
+      const request = ++latest;
+      if (!text) {
+        restore();
+        return;
+      }
+      const target = searchTarget(form);
+      const url = new URL(target.url, window.location.href);
+      url.searchParams.set('q', text);
+      try {
+        const res = await fetch(url);
+        if (!res.ok) throw await res.json();
+        const page = await res.json();
+        // A slower earlier response must not overwrite a newer one
+        if (request !== latest) return;
+        const render = renderers[target.renderer];
+        list.innerHTML = page.items.map(item => render(item, list)).join('');
+        list.dataset.paginate = target.renderer;
+        list.dataset.url = url.toString();
+        list.dataset.nextCursor = page.next_cursor || '';
+        list.dataset.loaded = String(page.items.length);
+        if (badge) {
+          badge.dataset.singular = 'match';
+          badge.dataset.plural = 'matches';
+        }
+        updateCount(list, page.items.length, Boolean(page.next_cursor));
+        wrapper?.classList.toggle('hidden', !page.next_cursor);
+        empty?.classList.toggle('hidden', page.items.length > 0);
+        list.dispatchEvent(new CustomEvent('paginate:loaded', { detail: { count: page.items.length } }));
+      } catch (err) {
+        if (request === latest) alert(err.error || 'Error searching');
+      }
+    }
+
+    form.addEventListener('submit', (e) => {
+      e.preventDefault();
+      clearTimeout(timer);
+      run();
+    });
+    input.addEventListener('input', () => {
+      clearTimeout(timer);
+      timer = setTimeout(run, 250);
+    });
+    form.querySelector('select[name="scope"]')?.addEventListener('change', run);
+  }
+
+  document.querySelectorAll('form[data-search]').forEach(setupSearch);
+
+  document.querySelectorAll('[data-paginate]').forEach(list => {
+    const wrapper = document.querySelector(`[data-load-more="${list.id}"]`);
+    if (!wrapper) return;
+    wrapper.querySelector('button')?.addEventListener('click', () => loadMore(list, wrapper));
+
+    // Rows added here carry data-action instead of inline handlers
+    list.addEventListener('click', (e) => {
+      const target = e.target.closest('[data-action]');
+      if (!target || typeof window[target.dataset.action] !== 'function') return;
+      window[target.dataset.action](target.dataset.id, target.dataset.title);
+    });
+  });
+})();
@@ -0,0 +1,131 @@
+# streaming.py (Chunked response bodies for large exports)
+import csv
+import io
+import queue
+import threading
+import zlib
+
+# Bytes buffered before a chunk is handed to the WSGI server
+CHUNK_SIZE = 64 * 1024
+
+
+def csv_chunks(rows, header, format_row=None, chunk_size=CHUNK_SIZE):
+    """Encode ``rows`` as CSV, yielding UTF-8 chunks of roughly ``chunk_size`` bytes.
+
+    Lines end in ``\\n`` to match what Postgres COPY ... (FORMAT csv) emits.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(format_row(row) if format_row else row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def cursor_rows(connection, sql, params=(), itersize=2000, cursor_factory=None):
+    """Yield the rows of ``sql`` through a server-side (named) cursor.
+
+    Only ``itersize`` rows are held client-side at a time, however large the
+    result. ``connection`` is a context manager factory such as
+    ``get_db_connection``; the connection is borrowed when iteration starts
+    and returned when the generator finishes or is closed early.
+    """
+    with connection() as conn:
+        with conn.cursor(name='stream_rows', cursor_factory=cursor_factory) as cur:
+            cur.itersize = itersize
+            cur.execute(sql, params)
+            for row in cur:
+                yield row
+        conn.rollback()
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def copy_chunks(connection, copy_sql, params=(), chunk_size=CHUNK_SIZE, max_pending=8):
+    """Yield the output of ``COPY (...) TO STDOUT`` as it is produced.
+
+    psycopg2's copy_expert blocks until the COPY finishes, so it runs on a
+    helper thread writing into a bounded queue; memory stays at roughly
+    ``max_pending`` chunks. Closing the generator early (client went away)
+    stops the COPY and drops its connection rather than reusing it mid-copy.
+    """
+    pending = queue.Queue(maxsize=max_pending)
+    cancelled = threading.Event()
+    done = object()
+    errors = []
+
+    def put(item):
+        while not cancelled.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    class Sink:
+        def __init__(self):
+            self.buffer = bytearray()
+
+        def write(self, data):
+            self.buffer += data if isinstance(data, bytes) else data.encode('utf-8')
+            if len(self.buffer) >= chunk_size:
+                self.flush()
+            return len(data)
+
+        def flush(self):
+            if self.buffer:
+                if not put(bytes(self.buffer)):
+                    raise _Cancelled()
+                self.buffer = bytearray()
+
+    def run():
+        try:
+            with connection() as conn:
+                try:
+                    with conn.cursor() as cur:
+                        sink = Sink()
+                        cur.copy_expert(cur.mogrify(copy_sql, params).decode('utf-8'), sink, size=chunk_size)
+                        sink.flush()
+                    conn.rollback()
+                except BaseException:
+                    # The protocol may be left mid-COPY; never hand it back to the pool
+                    conn.close()
+                    raise
+        except _Cancelled:
+            pass
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(done)
+
+    worker = threading.Thread(target=run, name='copy-export', daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = pending.get()
+            if item is done:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        cancelled.set()
+        worker.join()
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip-compress a stream of byte chunks without buffering the whole body"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
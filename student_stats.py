@@ -0,0 +1,115 @@
+# student_stats.py (Per-student statistics rollup: dashboard reads and repair)
+"""
+Migration 12 keeps one ``student_stats`` row per student current with
+triggers on quiz_attempts: attempt and pass totals, the score sum (for the
+average) and the last attempt time, plus a ``quizzes`` JSONB map of quiz id
+to ``{attempts, passed, best, score_sum, last_at}``. The student dashboard
+reads it with a primary-key lookup instead of counting attempts.
+
+The triggers make the rollup exact as long as attempts only change through
+SQL. A restore, a bulk load with triggers disabled or a manual fix can still
+leave it behind; ``check`` lists the students whose row differs from a fresh
+rollup of quiz_attempts and ``repair`` recomputes just those (or everyone
+with ``--all``, which locks quiz_attempts against writes while it runs).
+
+    python student_stats.py check
+    python student_stats.py repair
+    python student_stats.py repair --all
+"""
+import argparse
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+STATS_SQL = """
+    SELECT attempts, passed, score_sum, last_attempt_at, quizzes FROM student_stats WHERE user_id = %s
+"""
+DRIFTED_SQL = """
+    SELECT COALESCE(r.user_id, s.user_id) AS user_id
+    FROM compute_student_stats(NULL) r
+    FULL JOIN student_stats s ON s.user_id = r.user_id
+    WHERE (r.attempts, r.passed, r.score_sum, r.last_attempt_at, r.quizzes)
+          IS DISTINCT FROM (s.attempts, s.passed, s.score_sum, s.last_attempt_at, s.quizzes)
+    ORDER BY 1
+"""
+REFRESH_SQL = "SELECT refresh_student_stats(%s::int[])"
+
+# Students recomputed per transaction by ``repair``
+REPAIR_BATCH = 1000
+
+
+def average(score_sum, attempts):
+    return round(score_sum / attempts, 1) if attempts else None
+
+
+def summary(row):
+    """Dashboard figures from a STATS_SQL row (None: no attempts yet)"""
+    if row is None:
+        return {'attempts': 0, 'passed': 0, 'average': None, 'last_attempt_at': None, 'quizzes': {}}
+    return {
+        'attempts': row['attempts'],
+        'passed': row['passed'],
+        'average': average(row['score_sum'], row['attempts']),
+        'last_attempt_at': row['last_attempt_at'],
+        'quizzes': {
+            int(quiz_id): {
+                'attempts': q['attempts'],
+                'passed': q['passed'],
+                'best': q['best'],
+                'average': average(q['score_sum'], q['attempts']),
+                'last_at': q['last_at'],
+            }
+            for quiz_id, q in row['quizzes'].items()
+        },
+    }
+
+
+def drifted(cur):
+    """Students whose rollup differs from their attempts"""
+    cur.execute(DRIFTED_SQL)
+    return [row[0] for row in cur.fetchall()]
+
+
+def repair(conn, user_ids):
+    """Recompute the given students' rollups, in batches; returns how many"""
+    with conn.cursor() as cur:
+        for start in range(0, len(user_ids), REPAIR_BATCH):
+            cur.execute(REFRESH_SQL, (user_ids[start:start + REPAIR_BATCH],))
+            conn.commit()
+    return len(user_ids)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('check', help='list students whose statistics have drifted (exit status 1 if any)')
+    repair_parser = sub.add_parser('repair', help='recompute drifted statistics')
+    repair_parser.add_argument('--all', action='store_true', help='rebuild every student, not just drifted ones')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    from app import get_db_connection
+    from migrations import rebuild_student_stats
+
+    with get_db_connection() as conn:
+        if args.command == 'repair' and args.all:
+            with conn.cursor() as cur:
+                rebuild_student_stats(cur)
+            conn.commit()
+            logger.info("Rebuilt all student statistics")
+            return 0
+        with conn.cursor() as cur:
+            user_ids = drifted(cur)
+        conn.rollback()
+        if args.command == 'check':
+            for user_id in user_ids:
+                print(user_id)
+            logger.info("%d students drifted", len(user_ids))
+            return 1 if user_ids else 0
+        logger.info("Repaired %d students", repair(conn, user_ids))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -44,7 +44,8 @@ def test_database_connection():
 def test_flask_app():
     """Test Flask app import"""
     try:
-        from app import app
+        from app import create_app
+        create_app()
         print("✅ Flask app imports successfully!")
         return True
     except Exception as e:
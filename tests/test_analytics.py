@@ -0,0 +1,63 @@
+# tests/test_analytics.py (Item statistics over complete and sampled answer matrices)
+"""
+Synthetic answer matrices: every attempt given every question, and the same
+attempts as if each had drawn a sample of the questions from a bank.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import ABSENT, item_statistics  # noqa: E402
+
+QUESTIONS = [{'id': j, 'points': 1 + j % 2, 'options': ['a', 'b', 'c'], 'correct_answer': 'a'} for j in range(8)]
+
+
+def answer_matrix(attempts=400, seed=1):
+    """Students of varying ability answering questions of varying difficulty"""
+    rng = np.random.default_rng(seed)
+    ability = rng.normal(size=(attempts, 1))
+    difficulty = np.linspace(-1, 1, len(QUESTIONS))
+    correct = rng.random((attempts, len(QUESTIONS))) < 1 / (1 + np.exp(difficulty - ability))
+    wrong = rng.integers(1, 3, size=correct.shape)
+    return np.where(correct, ord('A'), ord('a') + wrong).astype(np.uint8)
+
+
+def test_complete_matrix_matches_direct_formulas():
+    codes = answer_matrix()
+    stats = item_statistics(codes, QUESTIONS)
+    correct = (codes < ord('a')).astype(float)
+    points = np.array([q['points'] for q in QUESTIONS], dtype=float)
+    total = correct @ points
+
+    assert stats['attempts'] == stats['alpha_attempts'] == len(codes)
+    for j, question in enumerate(stats['questions']):
+        rest = total - points[j] * correct[:, j]
+        assert question['attempts'] == len(codes)
+        assert np.isclose(question['difficulty'], correct[:, j].mean())
+        assert np.isclose(question['point_biserial'], np.corrcoef(correct[:, j], rest)[0, 1])
+    k = len(QUESTIONS)
+    alpha = k / (k - 1) * (1 - (correct * points).var(axis=0).sum() / total.var())
+    assert np.isclose(stats['cronbach_alpha'], alpha)
+
+
+def test_sampled_attempts_are_analysed_per_question():
+    codes = answer_matrix()
+    rng = np.random.default_rng(2)
+    given = np.zeros(codes.shape, dtype=bool)
+    for row in given:
+        row[rng.choice(len(QUESTIONS), size=5, replace=False)] = True
+    stats = item_statistics(np.where(given, codes, ABSENT).astype(np.uint8), QUESTIONS)
+
+    # No attempt took every question, so alpha is left out rather than
+    # computed over mixed question sets
+    assert stats['alpha_attempts'] == 0 and stats['cronbach_alpha'] is None
+    for j, question in enumerate(stats['questions']):
+        assert question['attempts'] == given[:, j].sum()
+        assert np.isclose(question['difficulty'], (codes[given[:, j], j] < ord('a')).mean())
+        assert sum(option['count'] for option in question['options']) == question['attempts']
+        # Able students still do better on every item
+        assert question['discrimination'] > 0.2
+        assert question['point_biserial'] > 0.1
@@ -0,0 +1,50 @@
+# tests/test_leaderboard.py (Ranks, percentiles and bars from a score histogram)
+"""
+Hand-built histograms like the rows HISTOGRAM_SQL returns: (best score,
+students) pairs. No database needed.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import Distribution  # noqa: E402
+
+# Ten students: 100, 95, 90, 90, 75, 50, 50, 50, 0, 0
+COUNTS = [(100, 1), (95, 1), (90, 2), (75, 1), (50, 3), (0, 2)]
+
+
+def test_ties_share_the_better_competition_rank():
+    distribution = Distribution(COUNTS)
+
+    assert distribution.students == 10
+    assert [distribution.rank(score) for score in (100, 95, 90, 75, 50, 0)] == [1, 2, 3, 5, 6, 9]
+    # A score nobody has ranks where it would fall
+    assert distribution.rank(80) == 5
+
+
+def test_percentile_counts_ties_as_half():
+    distribution = Distribution(COUNTS)
+
+    assert distribution.percentile(100) == 95.0
+    assert distribution.percentile(90) == 70.0     # 6 below, 2 tied
+    assert distribution.percentile(50) == 35.0     # 2 below, 3 tied
+    assert distribution.percentile(0) == 10.0
+    assert distribution.percentile(80) == 60.0
+
+
+def test_empty_quiz():
+    distribution = Distribution([])
+
+    assert distribution.students == 0
+    assert distribution.rank(70) == 1
+    assert distribution.percentile(70) is None
+    assert [b['students'] for b in distribution.bins()] == [0] * 10
+
+
+def test_last_bar_takes_100():
+    bins = Distribution(COUNTS).bins()
+
+    assert [(b['from'], b['to']) for b in bins] == [(start, start + 9) for start in range(0, 90, 10)] + [(90, 100)]
+    assert [b['students'] for b in bins] == [2, 0, 0, 0, 0, 3, 0, 1, 0, 4]
+    assert sum(b['students'] for b in bins) == 10
@@ -0,0 +1,83 @@
+# tests/test_partitions.py (Archiving monthly attempt partitions)
+"""
+Needs the database configured in .env (or DB_*), migrated; skipped when none
+is reachable. Works on a month long before any data (1999-01), whose
+partitions it creates and archives again.
+"""
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import partitions  # noqa: E402
+
+MONTH = date(1999, 1, 1)
+
+
+@pytest.fixture
+def conn():
+    import psycopg2
+    from db import connect_from_env
+
+    try:
+        conn = connect_from_env()
+    except psycopg2.Error as e:
+        pytest.skip(f'database unavailable: {e}')
+    yield conn
+    conn.rollback()
+    with conn.cursor() as cur:
+        # Whatever a failed run left behind; answers first, as their foreign
+        # key references the attempts partition
+        state = partitions.partitions(cur).get(MONTH, {})
+        for table in reversed(partitions.PARTITIONED_TABLES):
+            name = partitions.partition_name(table, MONTH)
+            if state.get(table):
+                cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            cur.execute(f"DROP TABLE IF EXISTS {name}")
+    conn.commit()
+    conn.close()
+
+
+def test_archiving_an_empty_month_leaves_student_stats_alone(conn, tmp_path):
+    with conn.cursor() as cur:
+        assert partitions.ensure_partitions(cur, since=MONTH, ahead=0)[:2] == [
+            partitions.partition_name(table, MONTH) for table in partitions.PARTITIONED_TABLES]
+        conn.commit()
+        cur.execute("SELECT COUNT(*) FROM student_stats")
+        students = cur.fetchone()[0]
+
+    manifest = partitions.archive_month(conn, MONTH, str(tmp_path))
+
+    assert {entry['rows'] for entry in manifest['tables'].values()} == {0}
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM student_stats")
+        assert cur.fetchone()[0] == students
+        assert MONTH not in partitions.partitions(cur)
+
+
+def test_write_path_checks_partitions_once_per_month(conn, monkeypatch):
+    from contextlib import contextmanager
+
+    borrowed = []
+
+    @contextmanager
+    def connection():
+        borrowed.append(1)
+        yield conn
+
+    monkeypatch.setattr(partitions, '_checked_month', None)
+    partitions.ensure_current(connection)
+    with conn.cursor() as cur:
+        months = partitions.partitions(cur)
+    this_month = partitions.month_start(date.today())
+    assert all(months[partitions.add_months(this_month, n)] == dict.fromkeys(partitions.PARTITIONED_TABLES, True)
+               for n in range(partitions.MONTHS_AHEAD + 1))
+
+    assert partitions.ensure_current(connection) == []
+    assert len(borrowed) == 1
+    # A new month is checked again
+    partitions.ensure_current(connection, today=partitions.add_months(this_month, 1))
+    assert len(borrowed) == 2
@@ -0,0 +1,121 @@
+# tests/test_passwords.py (Password hashing admission and the 503 path)
+"""
+The hashing limit must hold across processes: with sync gunicorn workers
+each worker serves one request at a time, so only a host-wide limit can shed
+a login storm. Worker processes are simulated with forked children.
+
+The login test needs the database configured in .env (or DB_*); it is
+skipped when none is reachable.
+"""
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import HasherBusy, HostSlots, PasswordHasher, _hash  # noqa: E402
+
+ROUNDS = 12
+fork = multiprocessing.get_context('fork')
+
+
+def _hold_slot(directory, size, ready, release, results):
+    slot = HostSlots(directory, size).try_acquire()
+    results.put(slot is not None)
+    ready.wait()
+    release.wait()
+
+
+def test_slots_are_shared_across_processes(tmp_path):
+    ready = fork.Barrier(4)
+    release = fork.Event()
+    results = fork.Queue()
+    children = [fork.Process(target=_hold_slot, args=(str(tmp_path), 2, ready, release, results))
+                for _ in range(3)]
+    for child in children:
+        child.start()
+    ready.wait()
+    try:
+        assert sorted(results.get(timeout=5) for _ in children) == [False, True, True]
+        assert HostSlots(str(tmp_path), 2).try_acquire() is None
+    finally:
+        release.set()
+        for child in children:
+            child.join()
+    # The holders have exited; their slots were released with them
+    slots = HostSlots(str(tmp_path), 2)
+    assert slots.try_acquire() is not None and slots.try_acquire() is not None
+
+
+def test_slow_hash_gives_up_and_keeps_its_slot(tmp_path):
+    hasher = PasswordHasher(rounds=ROUNDS, workers=1, max_pending=1, timeout=0.01, slot_dir=str(tmp_path))
+    try:
+        with pytest.raises(HasherBusy):
+            hasher.hash('secret')
+        # The abandoned job still runs and still counts against the limit
+        with pytest.raises(HasherBusy):
+            hasher.hash('secret')
+        deadline = time.monotonic() + 10
+        while hasher.stats()['pending'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        hasher.timeout = 10
+        assert hasher.verify(hasher.hash('secret'), 'secret')[0]
+        assert hasher.stats()['rejected'] == 1 and hasher.stats()['timeouts'] == 1
+    finally:
+        hasher.close()
+
+
+def _login(username, password, settings, start, results):
+    from app import create_app
+
+    app = create_app('testing')
+    app.config.update(settings)
+    client = app.test_client()
+    start.wait()
+    response = client.post('/login', data={'username': username, 'password': password, 'portal': 'student'})
+    results.put((response.status_code, response.headers.get('Retry-After')))
+
+
+@pytest.fixture
+def student():
+    import psycopg2
+    from app import get_db_connection
+
+    username = f'hash_test_{uuid.uuid4().hex[:8]}'
+    try:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute("INSERT INTO users (username, email, password, role) VALUES (%s, %s, %s, 'student') RETURNING id",
+                        (username, f'{username}@example.com', _hash('secret', ROUNDS)))
+            user_id = cur.fetchone()[0]
+            conn.commit()
+    except psycopg2.Error as e:
+        pytest.skip(f'database unavailable: {e}')
+    yield username
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        conn.commit()
+
+
+def test_concurrent_logins_are_shed_with_503(student, tmp_path):
+    settings = {'BCRYPT_ROUNDS': ROUNDS, 'PASSWORD_HASH_WORKERS': 1, 'PASSWORD_HASH_MAX_PENDING': 1,
+                'PASSWORD_HASH_TIMEOUT': 30, 'PASSWORD_HASH_SLOT_DIR': str(tmp_path)}
+    workers = 4
+    start = fork.Barrier(workers)
+    results = fork.Queue()
+    children = [fork.Process(target=_login, args=(student, 'secret', settings, start, results))
+                for _ in range(workers)]
+    for child in children:
+        child.start()
+    outcomes = [results.get(timeout=60) for _ in children]
+    for child in children:
+        child.join()
+
+    statuses = sorted(status for status, _ in outcomes)
+    # One login holds the only slot; the rest are turned away, not queued
+    assert statuses.count(302) >= 1
+    assert statuses.count(503) >= 1
+    assert all(retry == '1' for status, retry in outcomes if status == 503)
@@ -0,0 +1,55 @@
+# tests/test_sampling.py (Stratified question draws from a bank)
+"""
+A bank of 100 questions tagged 60/30/10, as a quiz with ``sample_by = 'tag'``
+would have; no database needed.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sampling import QuestionPool  # noqa: E402
+
+TAGS = ['algebra'] * 60 + ['geometry'] * 30 + ['proofs'] * 10
+QUESTIONS = [{'id': 1000 + j, 'tag': tag, 'points': 1 + j % 3} for j, tag in enumerate(TAGS)]
+
+
+def test_sample_of_the_whole_bank_takes_every_question():
+    pool = QuestionPool(QUESTIONS, 'tag')
+    every = sorted(q['id'] for q in QUESTIONS)
+
+    assert pool.allocate(len(QUESTIONS)) == pool.allocate(500) == [60, 30, 10]
+    assert pool.draw(500, seed=7) == every
+    shuffled = pool.draw(len(QUESTIONS), seed=7, shuffle=True)
+    assert sorted(shuffled) == every and shuffled != every
+
+
+def test_counts_are_proportional_and_sum_to_the_sample_size():
+    pool = QuestionPool(QUESTIONS, 'tag')
+    tags = {q['id']: q['tag'] for q in QUESTIONS}
+
+    assert pool.allocate(20) == [12, 6, 2]
+    # 7 * (.6, .3, .1) = 4.2, 2.1, 0.7: the largest remainder takes the spare
+    assert pool.allocate(7) == [4, 2, 1]
+    for size in range(1, len(QUESTIONS)):
+        counts = pool.allocate(size)
+        assert sum(counts) == size
+        assert all(abs(count - size * len(ids) / pool.size) < 1 for count, ids in zip(counts, pool.strata))
+
+    drawn = pool.draw(20, seed=3)
+    assert len(set(drawn)) == 20
+    assert [sum(tags[i] == tag for i in drawn) for tag in ('algebra', 'geometry', 'proofs')] == [12, 6, 2]
+    # Unknown or missing sample_by: one stratum, a plain sample
+    assert QuestionPool(QUESTIONS, None).allocate(20) == [20]
+
+
+def test_same_seed_draws_the_same_questions_in_the_same_order():
+    pool = QuestionPool(QUESTIONS, 'points')
+
+    for shuffle in (False, True):
+        first = pool.draw(15, seed=42, shuffle=shuffle)
+        # A pool built afresh (another worker) from the questions in another order
+        again = QuestionPool(list(reversed(QUESTIONS)), 'points').draw(15, seed=42, shuffle=shuffle)
+        assert first == again
+    assert pool.draw(15, seed=42) == sorted(pool.draw(15, seed=42))
+    assert pool.draw(15, seed=42, shuffle=True) != pool.draw(15, seed=43, shuffle=True)
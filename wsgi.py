@@ -0,0 +1,18 @@
+# wsgi.py (WSGI entry point)
+"""
+The production app, built once by the application factory:
+
+    gunicorn wsgi:app --preload --workers 4 --bind 0.0.0.0:5000
+
+With ``--preload`` the master imports this module, builds the app and
+compiles its templates before forking, so every worker starts ready to
+serve. Database pools and the password hasher are created lazily in each
+worker, never inherited across the fork.
+
+Create or upgrade the schema first (idempotent, safe on every deploy):
+
+    flask --app app init-db
+"""
+from app import create_app
+
+app = create_app()